@@ -0,0 +1,618 @@
+"""baseline
+
+Schema of app.models before migrations were introduced, the tables create_all made
+before then.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 00:28:35.026715
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import sqlite
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('ai_model_apis',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('api_key', sa.String(), nullable=True),
+    sa.Column('api_base_url', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('ai_model_apis', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_ai_model_apis_id'), ['id'], unique=False)
+
+    op.create_table('client_applications',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('client_id', sa.String(), nullable=True),
+    sa.Column('client_secret', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('client_id')
+    )
+    with op.batch_alter_table('client_applications', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_client_applications_id'), ['id'], unique=False)
+
+    op.create_table('process_locks',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('max_duration_in_seconds', sa.Integer(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    with op.batch_alter_table('process_locks', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_process_locks_id'), ['id'], unique=False)
+
+    op.create_table('rate_limit_records',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('identifier', sa.String(), nullable=True),
+    sa.Column('slug', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('rate_limit_records', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_rate_limit_records_id'), ['id'], unique=False)
+
+    op.create_table('search_model_configs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('model_type', sa.String(), nullable=True),
+    sa.Column('bi_encoder', sa.String(), nullable=True),
+    sa.Column('bi_encoder_model_config', sqlite.JSON(), nullable=True),
+    sa.Column('bi_encoder_query_encode_config', sqlite.JSON(), nullable=True),
+    sa.Column('bi_encoder_docs_encode_config', sqlite.JSON(), nullable=True),
+    sa.Column('cross_encoder', sa.String(), nullable=True),
+    sa.Column('cross_encoder_model_config', sqlite.JSON(), nullable=True),
+    sa.Column('embeddings_inference_endpoint', sa.String(), nullable=True),
+    sa.Column('embeddings_inference_endpoint_api_key', sa.String(), nullable=True),
+    sa.Column('embeddings_inference_endpoint_type', sa.String(), nullable=True),
+    sa.Column('cross_encoder_inference_endpoint', sa.String(), nullable=True),
+    sa.Column('cross_encoder_inference_endpoint_api_key', sa.String(), nullable=True),
+    sa.Column('bi_encoder_confidence_threshold', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('search_model_configs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_search_model_configs_id'), ['id'], unique=False)
+
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('uuid', sa.String(), nullable=True),
+    sa.Column('username', sa.String(), nullable=True),
+    sa.Column('email', sa.String(), nullable=True),
+    sa.Column('phone_number', sa.String(), nullable=True),
+    sa.Column('password_hash', sa.String(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('verified_email', sa.Boolean(), nullable=True),
+    sa.Column('verified_phone_number', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_users_email'), ['email'], unique=True)
+        batch_op.create_index(batch_op.f('ix_users_id'), ['id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_users_phone_number'), ['phone_number'], unique=True)
+        batch_op.create_index(batch_op.f('ix_users_username'), ['username'], unique=True)
+        batch_op.create_index(batch_op.f('ix_users_uuid'), ['uuid'], unique=True)
+
+    op.create_table('voice_model_options',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('model_id', sa.String(), nullable=True),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('price_tier', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('voice_model_options', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_voice_model_options_id'), ['id'], unique=False)
+
+    op.create_table('web_scrapers',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('type', sa.String(), nullable=True),
+    sa.Column('api_key', sa.String(), nullable=True),
+    sa.Column('api_url', sa.String(), nullable=True),
+    sa.Column('priority', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('web_scrapers', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_web_scrapers_id'), ['id'], unique=False)
+
+    op.create_table('api_tokens',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('token', sa.String(), nullable=True),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('accessed_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('api_tokens', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_api_tokens_id'), ['id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_api_tokens_token'), ['token'], unique=True)
+
+    op.create_table('chat_models',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('ai_model_api_id', sa.Integer(), nullable=True),
+    sa.Column('max_prompt_size', sa.Integer(), nullable=True),
+    sa.Column('subscribed_max_prompt_size', sa.Integer(), nullable=True),
+    sa.Column('tokenizer', sa.String(), nullable=True),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('model_type', sa.String(), nullable=True),
+    sa.Column('price_tier', sa.String(), nullable=True),
+    sa.Column('vision_enabled', sa.Boolean(), nullable=True),
+    sa.Column('description', sa.String(), nullable=True),
+    sa.Column('strengths', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['ai_model_api_id'], ['ai_model_apis.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('chat_models', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_chat_models_id'), ['id'], unique=False)
+
+    op.create_table('data_stores',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('owner_id', sa.Integer(), nullable=True),
+    sa.Column('key', sa.String(), nullable=True),
+    sa.Column('value', sqlite.JSON(), nullable=True),
+    sa.Column('private', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('data_stores', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_data_stores_id'), ['id'], unique=False)
+
+    op.create_table('github_configs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('pat_token', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('github_configs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_github_configs_id'), ['id'], unique=False)
+
+    op.create_table('google_users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('sub', sa.String(), nullable=True),
+    sa.Column('azp', sa.String(), nullable=True),
+    sa.Column('email', sa.String(), nullable=True),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('given_name', sa.String(), nullable=True),
+    sa.Column('family_name', sa.String(), nullable=True),
+    sa.Column('picture', sa.String(), nullable=True),
+    sa.Column('locale', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('google_users', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_google_users_id'), ['id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_google_users_sub'), ['sub'], unique=True)
+
+    op.create_table('notion_configs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('token', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('notion_configs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_notion_configs_id'), ['id'], unique=False)
+
+    op.create_table('reflective_questions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('question', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('reflective_questions', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_reflective_questions_id'), ['id'], unique=False)
+
+    op.create_table('speech_to_text_model_options',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('ai_model_api_id', sa.Integer(), nullable=True),
+    sa.Column('model_name', sa.String(), nullable=True),
+    sa.Column('model_type', sa.String(), nullable=True),
+    sa.Column('price_tier', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['ai_model_api_id'], ['ai_model_apis.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('speech_to_text_model_options', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_speech_to_text_model_options_id'), ['id'], unique=False)
+
+    op.create_table('subscriptions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('type', sa.String(), nullable=True),
+    sa.Column('is_recurring', sa.Boolean(), nullable=True),
+    sa.Column('renewal_date', sa.DateTime(), nullable=True),
+    sa.Column('enabled_trial_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id')
+    )
+    with op.batch_alter_table('subscriptions', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_subscriptions_id'), ['id'], unique=False)
+
+    op.create_table('text_to_image_model_configs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('ai_model_api_id', sa.Integer(), nullable=True),
+    sa.Column('model_name', sa.String(), nullable=True),
+    sa.Column('model_type', sa.String(), nullable=True),
+    sa.Column('price_tier', sa.String(), nullable=True),
+    sa.Column('api_key', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['ai_model_api_id'], ['ai_model_apis.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('text_to_image_model_configs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_text_to_image_model_configs_id'), ['id'], unique=False)
+
+    op.create_table('user_requests',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('slug', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('user_requests', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_user_requests_id'), ['id'], unique=False)
+
+    op.create_table('user_voice_model_configs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('setting_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['setting_id'], ['voice_model_options.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id')
+    )
+    with op.batch_alter_table('user_voice_model_configs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_user_voice_model_configs_id'), ['id'], unique=False)
+
+    op.create_table('agents',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('creator_id', sa.Integer(), nullable=True),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('personality', sa.String(), nullable=True),
+    sa.Column('input_tools', sqlite.JSON(), nullable=True),
+    sa.Column('output_modes', sqlite.JSON(), nullable=True),
+    sa.Column('chat_model_id', sa.Integer(), nullable=True),
+    sa.Column('style_color', sa.String(), nullable=True),
+    sa.Column('style_icon', sa.String(), nullable=True),
+    sa.Column('privacy_level', sa.String(), nullable=True),
+    sa.Column('is_hidden', sa.Boolean(), nullable=True),
+    sa.Column('managed_by_admin', sa.Boolean(), nullable=True),
+    sa.Column('slug', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['chat_model_id'], ['chat_models.id'], ),
+    sa.ForeignKeyConstraint(['creator_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('slug')
+    )
+    with op.batch_alter_table('agents', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_agents_id'), ['id'], unique=False)
+
+    op.create_table('github_repo_configs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('github_config_id', sa.Integer(), nullable=True),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('owner', sa.String(), nullable=True),
+    sa.Column('branch', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['github_config_id'], ['github_configs.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('github_repo_configs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_github_repo_configs_id'), ['id'], unique=False)
+
+    op.create_table('server_chat_settings',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('chat_default_id', sa.Integer(), nullable=True),
+    sa.Column('chat_advanced_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['chat_advanced_id'], ['chat_models.id'], ),
+    sa.ForeignKeyConstraint(['chat_default_id'], ['chat_models.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('server_chat_settings', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_server_chat_settings_id'), ['id'], unique=False)
+
+    op.create_table('user_conversation_configs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('setting_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['setting_id'], ['chat_models.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id')
+    )
+    with op.batch_alter_table('user_conversation_configs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_user_conversation_configs_id'), ['id'], unique=False)
+
+    op.create_table('user_text_to_image_model_configs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('setting_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['setting_id'], ['text_to_image_model_configs.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id')
+    )
+    with op.batch_alter_table('user_text_to_image_model_configs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_user_text_to_image_model_configs_id'), ['id'], unique=False)
+
+    op.create_table('conversations',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('client_id', sa.Integer(), nullable=True),
+    sa.Column('agent_id', sa.Integer(), nullable=True),
+    sa.Column('conversation_log', sqlite.JSON(), nullable=True),
+    sa.Column('slug', sa.String(), nullable=True),
+    sa.Column('title', sa.String(), nullable=True),
+    sa.Column('file_filters', sqlite.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['agent_id'], ['agents.id'], ),
+    sa.ForeignKeyConstraint(['client_id'], ['client_applications.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('conversations', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_conversations_id'), ['id'], unique=False)
+
+    op.create_table('file_objects',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('agent_id', sa.Integer(), nullable=True),
+    sa.Column('file_name', sa.String(), nullable=True),
+    sa.Column('raw_text', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['agent_id'], ['agents.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('file_objects', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_file_objects_id'), ['id'], unique=False)
+
+    op.create_table('public_conversations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('source_owner_id', sa.Integer(), nullable=True),
+    sa.Column('agent_id', sa.Integer(), nullable=True),
+    sa.Column('conversation_log', sqlite.JSON(), nullable=True),
+    sa.Column('slug', sa.String(), nullable=True),
+    sa.Column('title', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['agent_id'], ['agents.id'], ),
+    sa.ForeignKeyConstraint(['source_owner_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('public_conversations', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_public_conversations_id'), ['id'], unique=False)
+
+    op.create_table('entries',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('agent_id', sa.Integer(), nullable=True),
+    sa.Column('search_model_id', sa.Integer(), nullable=True),
+    sa.Column('file_object_id', sa.Integer(), nullable=True),
+    sa.Column('embeddings', sa.Text(), nullable=True),
+    sa.Column('raw', sa.Text(), nullable=True),
+    sa.Column('compiled', sa.Text(), nullable=True),
+    sa.Column('heading', sa.String(), nullable=True),
+    sa.Column('file_source', sa.String(), nullable=True),
+    sa.Column('file_type', sa.String(), nullable=True),
+    sa.Column('file_path', sa.String(), nullable=True),
+    sa.Column('file_name', sa.String(), nullable=True),
+    sa.Column('url', sa.String(), nullable=True),
+    sa.Column('hashed_value', sa.String(), nullable=True),
+    sa.Column('corpus_id', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['agent_id'], ['agents.id'], ),
+    sa.ForeignKeyConstraint(['file_object_id'], ['file_objects.id'], ),
+    sa.ForeignKeyConstraint(['search_model_id'], ['search_model_configs.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('entries', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_entries_id'), ['id'], unique=False)
+
+    op.create_table('entry_dates',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('entry_id', sa.Integer(), nullable=True),
+    sa.Column('date', sa.Date(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['entry_id'], ['entries.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('entry_dates', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_entry_dates_id'), ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('entry_dates', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_entry_dates_id'))
+
+    op.drop_table('entry_dates')
+    with op.batch_alter_table('entries', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_entries_id'))
+
+    op.drop_table('entries')
+    with op.batch_alter_table('public_conversations', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_public_conversations_id'))
+
+    op.drop_table('public_conversations')
+    with op.batch_alter_table('file_objects', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_file_objects_id'))
+
+    op.drop_table('file_objects')
+    with op.batch_alter_table('conversations', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_conversations_id'))
+
+    op.drop_table('conversations')
+    with op.batch_alter_table('user_text_to_image_model_configs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_user_text_to_image_model_configs_id'))
+
+    op.drop_table('user_text_to_image_model_configs')
+    with op.batch_alter_table('user_conversation_configs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_user_conversation_configs_id'))
+
+    op.drop_table('user_conversation_configs')
+    with op.batch_alter_table('server_chat_settings', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_server_chat_settings_id'))
+
+    op.drop_table('server_chat_settings')
+    with op.batch_alter_table('github_repo_configs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_github_repo_configs_id'))
+
+    op.drop_table('github_repo_configs')
+    with op.batch_alter_table('agents', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_agents_id'))
+
+    op.drop_table('agents')
+    with op.batch_alter_table('user_voice_model_configs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_user_voice_model_configs_id'))
+
+    op.drop_table('user_voice_model_configs')
+    with op.batch_alter_table('user_requests', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_user_requests_id'))
+
+    op.drop_table('user_requests')
+    with op.batch_alter_table('text_to_image_model_configs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_text_to_image_model_configs_id'))
+
+    op.drop_table('text_to_image_model_configs')
+    with op.batch_alter_table('subscriptions', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_subscriptions_id'))
+
+    op.drop_table('subscriptions')
+    with op.batch_alter_table('speech_to_text_model_options', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_speech_to_text_model_options_id'))
+
+    op.drop_table('speech_to_text_model_options')
+    with op.batch_alter_table('reflective_questions', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_reflective_questions_id'))
+
+    op.drop_table('reflective_questions')
+    with op.batch_alter_table('notion_configs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_notion_configs_id'))
+
+    op.drop_table('notion_configs')
+    with op.batch_alter_table('google_users', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_google_users_sub'))
+        batch_op.drop_index(batch_op.f('ix_google_users_id'))
+
+    op.drop_table('google_users')
+    with op.batch_alter_table('github_configs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_github_configs_id'))
+
+    op.drop_table('github_configs')
+    with op.batch_alter_table('data_stores', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_data_stores_id'))
+
+    op.drop_table('data_stores')
+    with op.batch_alter_table('chat_models', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_chat_models_id'))
+
+    op.drop_table('chat_models')
+    with op.batch_alter_table('api_tokens', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_api_tokens_token'))
+        batch_op.drop_index(batch_op.f('ix_api_tokens_id'))
+
+    op.drop_table('api_tokens')
+    with op.batch_alter_table('web_scrapers', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_web_scrapers_id'))
+
+    op.drop_table('web_scrapers')
+    with op.batch_alter_table('voice_model_options', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_voice_model_options_id'))
+
+    op.drop_table('voice_model_options')
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_users_uuid'))
+        batch_op.drop_index(batch_op.f('ix_users_username'))
+        batch_op.drop_index(batch_op.f('ix_users_phone_number'))
+        batch_op.drop_index(batch_op.f('ix_users_id'))
+        batch_op.drop_index(batch_op.f('ix_users_email'))
+
+    op.drop_table('users')
+    with op.batch_alter_table('search_model_configs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_search_model_configs_id'))
+
+    op.drop_table('search_model_configs')
+    with op.batch_alter_table('rate_limit_records', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_rate_limit_records_id'))
+
+    op.drop_table('rate_limit_records')
+    with op.batch_alter_table('process_locks', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_process_locks_id'))
+
+    op.drop_table('process_locks')
+    with op.batch_alter_table('client_applications', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_client_applications_id'))
+
+    op.drop_table('client_applications')
+    with op.batch_alter_table('ai_model_apis', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ai_model_apis_id'))
+
+    op.drop_table('ai_model_apis')
@@ -0,0 +1,48 @@
+"""hot query indexes
+
+Indexes for the filters endpoints and background jobs run on every request, which
+otherwise scan their tables.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 00:28:59.449036
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (name, table, columns)
+INDEXES = [
+    ('ix_entries_user_id_file_type', 'entries', ['user_id', 'file_type']),
+    ('ix_entries_user_id_file_name', 'entries', ['user_id', 'file_name']),
+    ('ix_entries_hashed_value', 'entries', ['hashed_value']),
+    ('ix_entry_dates_entry_id', 'entry_dates', ['entry_id']),
+    ('ix_conversations_user_id_updated_at', 'conversations', ['user_id', 'updated_at']),
+    ('ix_agents_privacy_level_is_hidden', 'agents', ['privacy_level', 'is_hidden']),
+    ('ix_agents_creator_id', 'agents', ['creator_id']),
+    ('ix_github_repo_configs_github_config_id', 'github_repo_configs', ['github_config_id']),
+    ('ix_github_configs_user_id', 'github_configs', ['user_id']),
+    ('ix_notion_configs_user_id', 'notion_configs', ['user_id']),
+    ('ix_api_tokens_user_id', 'api_tokens', ['user_id']),
+    ('ix_search_model_configs_name', 'search_model_configs', ['name']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
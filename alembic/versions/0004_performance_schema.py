@@ -0,0 +1,119 @@
+"""performance schema
+
+Columns and tables added on top of the baseline: conversation versions and cold storage,
+per-agent response caching, public conversation snapshots, hashed API tokens, windowed
+rate limit counts and usage counters.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 14:06:52.318907
+
+"""
+import hashlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('usage_counters',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('slug', sa.String(), nullable=True),
+    sa.Column('bucket_seconds', sa.Integer(), nullable=True),
+    sa.Column('bucket_start', sa.DateTime(), nullable=True),
+    sa.Column('count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'slug', 'bucket_seconds', 'bucket_start', name='uq_usage_counters_bucket')
+    )
+    with op.batch_alter_table('usage_counters', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_usage_counters_id'), ['id'], unique=False)
+        batch_op.create_index('ix_usage_counters_rollup', ['bucket_seconds', 'bucket_start'], unique=False)
+
+    op.create_table('conversation_archives',
+    sa.Column('conversation_id', sa.String(), nullable=False),
+    sa.Column('log', sa.LargeBinary(), nullable=False),
+    sa.Column('raw_bytes', sa.Integer(), nullable=False),
+    sa.Column('compressed_bytes', sa.Integer(), nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['conversation_id'], ['conversations.id'], ),
+    sa.PrimaryKeyConstraint('conversation_id')
+    )
+    with op.batch_alter_table('agents', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('cache_responses', sa.Boolean(), nullable=True))
+
+    with op.batch_alter_table('api_tokens', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('token_hash', sa.String(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_api_tokens_token_hash'), ['token_hash'], unique=True)
+
+    # Tokens are looked up by hash, so hash the ones issued before
+    api_tokens = sa.table('api_tokens', sa.column('id', sa.Integer), sa.column('token', sa.String), sa.column('token_hash', sa.String))
+    connection = op.get_bind()
+    for token_id, token in connection.execute(sa.select(api_tokens.c.id, api_tokens.c.token).where(api_tokens.c.token.is_not(None))).all():
+        connection.execute(
+            api_tokens.update()
+            .where(api_tokens.c.id == token_id)
+            .values(token_hash=hashlib.sha256(token.encode('utf-8')).hexdigest())
+        )
+
+    with op.batch_alter_table('conversations', schema=None) as batch_op:
+        # Existing conversations start at the version new ones are inserted with
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+        batch_op.add_column(sa.Column('archived_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_conversations_archived_at'), ['archived_at'], unique=False)
+
+    with op.batch_alter_table('public_conversations', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('snapshot', sa.LargeBinary(), nullable=True))
+        batch_op.add_column(sa.Column('snapshot_etag', sa.String(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_public_conversations_slug'), ['slug'], unique=False)
+
+    with op.batch_alter_table('rate_limit_records', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('window_start', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.create_index(batch_op.f('ix_rate_limit_records_window_start'), ['window_start'], unique=False)
+        batch_op.create_unique_constraint('uq_rate_limit_records_window', ['identifier', 'slug', 'window_start'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('rate_limit_records', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_rate_limit_records_window', type_='unique')
+        batch_op.drop_index(batch_op.f('ix_rate_limit_records_window_start'))
+        batch_op.drop_column('count')
+        batch_op.drop_column('window_start')
+
+    with op.batch_alter_table('public_conversations', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_public_conversations_slug'))
+        batch_op.drop_column('snapshot_etag')
+        batch_op.drop_column('snapshot')
+
+    with op.batch_alter_table('conversations', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_conversations_archived_at'))
+        batch_op.drop_column('archived_at')
+        batch_op.drop_column('version')
+
+    with op.batch_alter_table('api_tokens', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_api_tokens_token_hash'))
+        batch_op.drop_column('token_hash')
+
+    with op.batch_alter_table('agents', schema=None) as batch_op:
+        batch_op.drop_column('cache_responses')
+
+    op.drop_table('conversation_archives')
+    with op.batch_alter_table('usage_counters', schema=None) as batch_op:
+        batch_op.drop_index('ix_usage_counters_rollup')
+        batch_op.drop_index(batch_op.f('ix_usage_counters_id'))
+
+    op.drop_table('usage_counters')
@@ -0,0 +1,40 @@
+"""agent and file indexes
+
+Indexes for the foreign keys followed when an agent or file is deleted, which
+otherwise scan entries, file objects and conversations.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 14:41:17.604122
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (name, table, columns)
+INDEXES = [
+    ('ix_entries_agent_id', 'entries', ['agent_id']),
+    ('ix_entries_file_object_id', 'entries', ['file_object_id']),
+    ('ix_file_objects_agent_id', 'file_objects', ['agent_id']),
+    ('ix_conversations_agent_id', 'conversations', ['agent_id']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
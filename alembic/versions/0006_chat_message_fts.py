@@ -0,0 +1,80 @@
+"""chat message fts
+
+Full-text index of chat messages, an SQLite FTS5 table that app.processor.chat_index
+keeps up to date and searches. Only the message text is tokenized. The messages already
+stored, archived ones included, are indexed here, before any worker appends more.
+
+Skipped on other databases and on SQLite builds without FTS5, where search is unavailable.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 16:02:41.257310
+
+"""
+import json
+import zlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, Sequence[str], None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INSERT_MESSAGE = sa.text(
+    "INSERT INTO chat_message_fts (message, user_id, conversation_id, turn_id, by, created) "
+    "VALUES (:message, :user_id, :conversation_id, :turn_id, :by, :created)"
+)
+
+
+def _fts5_available(connection) -> bool:
+    if connection.dialect.name != 'sqlite':
+        return False
+    return bool(connection.execute(sa.text("SELECT sqlite_compileoption_used('ENABLE_FTS5')")).scalar())
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    connection = op.get_bind()
+    if not _fts5_available(connection):
+        return
+    op.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS chat_message_fts USING fts5("
+        "message, user_id UNINDEXED, conversation_id UNINDEXED, turn_id UNINDEXED, "
+        "by UNINDEXED, created UNINDEXED, tokenize='unicode61 remove_diacritics 2')"
+    )
+
+    rows = connection.execute(sa.text(
+        "SELECT c.id, c.user_id, c.conversation_log, a.log FROM conversations c "
+        "LEFT JOIN conversation_archives a ON a.conversation_id = c.id"
+    )).all()
+    for conversation_id, user_id, log, archived_log in rows:
+        log = json.loads(zlib.decompress(archived_log)) if archived_log is not None else json.loads(log or 'null')
+        chat = log.get('chat') if isinstance(log, dict) else None
+        if not isinstance(chat, list):
+            # Logs written before the chat list format have nothing to search
+            continue
+        messages = [
+            {
+                'message': message['message'],
+                'user_id': user_id,
+                'conversation_id': conversation_id,
+                'turn_id': message.get('turnId'),
+                'by': message.get('by'),
+                'created': message.get('created'),
+            }
+            for message in chat
+            if isinstance(message, dict) and message.get('message')
+        ]
+        if messages:
+            connection.execute(INSERT_MESSAGE, messages)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if _fts5_available(op.get_bind()):
+        op.execute("DROP TABLE IF EXISTS chat_message_fts")
@@ -0,0 +1,44 @@
+"""clear api token plaintext
+
+API tokens are looked up by token_hash only, so the plaintext tokens stored before
+are hashed where needed and cleared. Downgrading cannot bring them back.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 16:48:09.531776
+
+"""
+import hashlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, Sequence[str], None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    api_tokens = sa.table('api_tokens', sa.column('id', sa.Integer), sa.column('token', sa.String), sa.column('token_hash', sa.String))
+    connection = op.get_bind()
+    unhashed = sa.select(api_tokens.c.id, api_tokens.c.token).where(
+        api_tokens.c.token.is_not(None), api_tokens.c.token_hash.is_(None)
+    )
+    for token_id, token in connection.execute(unhashed).all():
+        connection.execute(
+            api_tokens.update()
+            .where(api_tokens.c.id == token_id)
+            .values(token_hash=hashlib.sha256(token.encode('utf-8')).hexdigest())
+        )
+    connection.execute(api_tokens.update().where(api_tokens.c.token.is_not(None)).values(token=None))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Nothing to restore, tokens keep working by hash
+    pass
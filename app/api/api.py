@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.endpoints import auth, agents, chat, search, integrations, user
+from app.api.endpoints import auth, agents, chat, search, integrations, user, metrics
 
 api_router = APIRouter()
 
@@ -10,3 +10,4 @@ api_router.include_router(agents.router, prefix="/chat/options", tags=["chat-opt
 api_router.include_router(chat.router, prefix="/chat", tags=["chat"])
 api_router.include_router(search.router, prefix="/content", tags=["content"])
 api_router.include_router(integrations.router, prefix="/integrations", tags=["integrations"])
+api_router.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
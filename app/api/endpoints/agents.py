@@ -2,30 +2,32 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
-from app.core.security import get_current_user
+from app.core.config_cache import config_cache
+from app.core.security import Principal, get_current_user
 from app.db.database import get_db
+from app.db.loading import eager
 from app.models.user import KhojUser
-from app.models.conversation import Agent
+from app.models.conversation import Agent, Conversation
 from app.schemas.conversation import Agent as AgentSchema, AgentCreate
-from app.models.ai_models import ChatModel
+from app.processor.response_cache import response_cache
 
 router = APIRouter()
 
 
 @router.get("", response_model=List[AgentSchema])
 def get_agents(
-    #current_user: KhojUser = Depends(get_current_user),
+    #current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get all agents available to the current user."""
     # Get public agents
-    public_agents = db.query(Agent).filter(
+    public_agents = db.query(Agent).options(*eager()).filter(
         Agent.privacy_level == "public",
         Agent.is_hidden == False
     ).all()
     
     # Get user's private agents
-    private_agents = db.query(Agent).filter(
+    private_agents = db.query(Agent).options(*eager()).filter(
         Agent.creator_id == 1,
         Agent.is_hidden == False
     ).all()
@@ -37,11 +39,11 @@ def get_agents(
 @router.get("/{agent_id}", response_model=AgentSchema)
 def get_agent(
     agent_id: int,
-    #current_user: KhojUser = Depends(get_current_user),
+    #current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get a specific agent by ID."""
-    agent = db.query(Agent).filter(Agent.id == agent_id).first()
+    agent = db.query(Agent).options(*eager()).filter(Agent.id == agent_id).first()
     
     if not agent:
         raise HTTPException(
@@ -62,13 +64,12 @@ def get_agent(
 @router.post("", response_model=AgentSchema)
 def create_agent(
     agent_in: AgentCreate,
-    #current_user: KhojUser = Depends(get_current_user),
+    #current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Create a new agent."""
     # Verify chat model exists
-    chat_model = db.query(ChatModel).filter(ChatModel.id == agent_in.chat_model_id).first()
-    if not chat_model:
+    if agent_in.chat_model_id not in config_cache.get().chat_models:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Chat model not found"
@@ -86,6 +87,7 @@ def create_agent(
         style_icon=agent_in.style_icon,
         privacy_level=agent_in.privacy_level,
         is_hidden=agent_in.is_hidden,
+        cache_responses=agent_in.cache_responses,
         managed_by_admin=False,
         slug=f"{agent_in.name.lower().replace(' ', '-')}-{1}"
     )
@@ -101,12 +103,12 @@ def create_agent(
 def update_agent(
     agent_id: int,
     agent_in: AgentCreate,
-    #current_user: KhojUser = Depends(get_current_user),
+    #current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Update an existing agent."""
     # Get the agent
-    agent = db.query(Agent).filter(Agent.id == agent_id).first()
+    agent = db.query(Agent).options(*eager()).filter(Agent.id == agent_id).first()
     
     if not agent:
         raise HTTPException(
@@ -122,13 +124,21 @@ def update_agent(
         )
     
     # Verify chat model exists
-    chat_model = db.query(ChatModel).filter(ChatModel.id == agent_in.chat_model_id).first()
-    if not chat_model:
+    if agent_in.chat_model_id not in config_cache.get().chat_models:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Chat model not found"
         )
     
+    # Invalidate cached responses when the agent's name, personality or model changes
+    if (
+        agent.name != agent_in.name
+        or agent.personality != agent_in.personality
+        or agent.chat_model_id != agent_in.chat_model_id
+        or not agent_in.cache_responses
+    ):
+        response_cache.invalidate_agent(agent.id)
+    
     # Update agent
     agent.name = agent_in.name
     agent.personality = agent_in.personality
@@ -139,6 +149,7 @@ def update_agent(
     agent.style_icon = agent_in.style_icon
     agent.privacy_level = agent_in.privacy_level
     agent.is_hidden = agent_in.is_hidden
+    agent.cache_responses = agent_in.cache_responses
     
     db.commit()
     db.refresh(agent)
@@ -149,12 +160,13 @@ def update_agent(
 @router.delete("/{agent_id}", response_model=AgentSchema)
 def delete_agent(
     agent_id: int,
-    #current_user: KhojUser = Depends(get_current_user),
+    #current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Delete an agent."""
     # Get the agent
-    agent = db.query(Agent).filter(Agent.id == agent_id).first()
+    # Its files and entries are unlinked on delete
+    agent = db.query(Agent).options(*eager(Agent.file_objects, Agent.entries)).filter(Agent.id == agent_id).first()
     
     if not agent:
         raise HTTPException(
@@ -169,6 +181,12 @@ def delete_agent(
             detail="Not authorized to delete this agent"
         )
     
+    response_cache.invalidate_agent(agent.id)
+    
+    # Unlink its conversations in one statement rather than one versioned UPDATE each
+    db.query(Conversation).filter(Conversation.agent_id == agent.id).update(
+        {Conversation.agent_id: None, Conversation.version: Conversation.version + 1}, synchronize_session=False
+    )
     db.delete(agent)
     db.commit()
     
@@ -1,17 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import timedelta
 import uuid
 
 from app.core.config import settings
+from app.core.api_tokens import hash_api_token, token_access_recorder, token_revocations
+from app.core.password_hashing import PasswordHashingBusyError, password_hasher
 from app.core.security import (
     authenticate_user, 
     create_access_token, 
-    get_password_hash,
-    get_current_user
+    Principal,
+    get_current_user,
+    invalidate_api_token
 )
-from app.db.database import get_db
+from app.db.database import get_async_db, get_db
 from app.models.user import KhojUser, KhojApiUser, Subscription
 from app.schemas.user import (
     User, 
@@ -24,11 +29,24 @@ from app.schemas.user import (
 router = APIRouter()
 
 
+def _password_hashing_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many sign-in attempts, please retry",
+        headers={"Retry-After": "1"},
+    )
+
+
 @router.post("/register", response_model=User)
-def register_user(user_in: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user_in: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Register a new user."""
+    try:
+        password_hasher.check_capacity()
+    except PasswordHashingBusyError:
+        raise _password_hashing_busy()
+    
     # Check if username already exists
-    db_user = db.query(KhojUser).filter(KhojUser.username == user_in.username).first()
+    db_user = (await db.execute(select(KhojUser).filter(KhojUser.username == user_in.username))).scalars().first()
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -37,15 +55,21 @@ def register_user(user_in: UserCreate, db: Session = Depends(get_db)):
     
     # Check if email already exists
     if user_in.email:
-        db_user = db.query(KhojUser).filter(KhojUser.email == user_in.email).first()
+        db_user = (await db.execute(select(KhojUser).filter(KhojUser.email == user_in.email))).scalars().first()
         if db_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email already registered"
             )
     
+    # Hash in the password hashing pool, off the shared threadpool and without holding a connection
+    await db.commit()
+    try:
+        hashed_password = await password_hasher.hash(user_in.password)
+    except PasswordHashingBusyError:
+        raise _password_hashing_busy()
+    
     # Create new user
-    hashed_password = get_password_hash(user_in.password)
     db_user = KhojUser(
         username=user_in.username,
         email=user_in.email,
@@ -54,8 +78,8 @@ def register_user(user_in: UserCreate, db: Session = Depends(get_db)):
         uuid=str(uuid.uuid4())
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     # Create default subscription
     subscription = Subscription(
@@ -64,18 +88,22 @@ def register_user(user_in: UserCreate, db: Session = Depends(get_db)):
         is_recurring=False
     )
     db.add(subscription)
-    db.commit()
+    await db.commit()
     
     return db_user
 
 
 @router.post("/login", response_model=Token)
-def login_for_access_token(
+async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Login and get access token."""
-    user = authenticate_user(db, form_data.username, form_data.password)
+    try:
+        password_hasher.check_capacity()
+        user = await authenticate_user(db, form_data.username, form_data.password)
+    except PasswordHashingBusyError:
+        raise _password_hashing_busy()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -94,29 +122,30 @@ def login_for_access_token(
 @router.post("/api-token", response_model=ApiToken)
 def create_api_token(
     token_in: ApiTokenCreate,
-    #current_user: KhojUser = Depends(get_current_user),
+    #current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Create a new API token for the current user."""
     # Generate a unique token
     token = str(uuid.uuid4())
     
-    # Create new API token
+    # Create new API token, storing only its hash
     db_token = KhojApiUser(
         user_id=1,
-        token=token,
+        token_hash=hash_api_token(token),
         name=token_in.name
     )
     db.add(db_token)
     db.commit()
     db.refresh(db_token)
     
-    return db_token
+    # The only time the token itself is returned
+    return ApiToken(id=db_token.id, token=token, name=db_token.name, accessed_at=db_token.accessed_at)
 
 
 @router.get("/api-tokens", response_model=list[ApiToken])
 def get_api_tokens(
-    #current_user: KhojUser = Depends(get_current_user),
+    #current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get all API tokens for the current user."""
@@ -127,7 +156,7 @@ def get_api_tokens(
 @router.delete("/api-token/{token_id}", response_model=ApiToken)
 def delete_api_token(
     token_id: int,
-    #current_user: KhojUser = Depends(get_current_user),
+    #current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Delete an API token."""
@@ -142,7 +171,11 @@ def delete_api_token(
             detail="Token not found"
         )
     
-    db.delete(token)
+    token_revocations.revoke(db, token)
     db.commit()
     
+    # Revoke immediately rather than when the cached token expires
+    invalidate_api_token(token.token_hash)
+    token_access_recorder.forget(token.id)
+    
     return token
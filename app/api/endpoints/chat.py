@@ -1,47 +1,149 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm.exc import StaleDataError
 from typing import List, Optional
+import copy
 import uuid
 import json
 
-from app.core.security import get_current_user
-from app.db.database import get_db
+from app.core.config_cache import CachedChatModel, config_cache
+from app.core.security import Principal, get_current_user
+from app.db.database import get_async_db, get_async_read_db, get_db, get_write_db
+from app.db.loading import eager
 from app.models.user import KhojUser
-from app.models.conversation import Conversation, Agent
+from app.models.conversation import Conversation, Agent, PublicConversation
+from app.models.ai_models import ChatModel
 from app.schemas.conversation import (
     Conversation as ConversationSchema,
     ConversationCreate,
     MessageCreate,
-    ChatMessage
+    ChatMessage,
+    ChatSearchResult,
+    ImportReport,
+    PublicConversationSnapshot
 )
+from app.processor.conversation import (
+    ConversationConflictError,
+    append_chat_messages,
+    build_prompt,
+    format_chat_history,
+    generate_response,
+)
+from app.processor.model_clients import ModelApiError
+from app.processor.model_router import RoutingDecision, chat_model_router, get_user_tier
+from app.processor.scheduler import SchedulerOverloadedError
+from app.processor.embeddings import aembed_query
+from app.processor.response_cache import response_cache
+from app.processor.archive import conversation_archiver
+from app.processor.chat_index import chat_indexer
+from app.processor.conversation_transfer import export_conversations, import_conversations
+from app.processor.public_snapshots import materialize_snapshot, public_snapshots
+from app.processor.titles import TitleRequest, title_generator
+from app.processor.tools import ToolResults, run_tools
+from app.core.config import settings
+from app.core.singleflight import SingleFlight
+from app.core.usage import usage_accountant
 
 router = APIRouter()
 
+_generation_flight = SingleFlight("chat_generation")
+
+
+async def _generate_and_cache(
+    prompt: str,
+    agent: Optional[Agent],
+    chat_model: Optional[CachedChatModel],
+    query: str,
+    chat_history: str,
+    query_embedding: Optional[List[float]] = None,
+    user_tier: str = "free",
+    references: str = "",
+) -> str:
+    """Generate a response and store it in the response cache."""
+    ai_response = await generate_response(prompt, agent, chat_model, 1, user_tier)
+    response_cache.store(
+        agent.id if agent else None, chat_model.id if chat_model else None, agent.personality if agent else None,
+        prompt, query, ai_response, chat_history, query_embedding, references
+    )
+    return ai_response
+
 
 @router.get("/sessions", response_model=List[ConversationSchema])
 def get_conversations(
-    #current_user: KhojUser = Depends(get_current_user),
+    #current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get all conversations for the current user."""
-    conversations = db.query(Conversation).filter(
+    conversations = db.query(Conversation).options(*eager()).filter(
         Conversation.user_id == 1
     ).all()
     
     return conversations
 
 
+@router.get("/export")
+def export_chat_history(
+    compress: bool = Query(False),
+    #current_user: Principal = Depends(get_current_user),
+):
+    """Stream all conversations of the current user as NDJSON, optionally gzip-compressed."""
+    filename = "khoj-conversations.ndjson.gz" if compress else "khoj-conversations.ndjson"
+    return StreamingResponse(
+        export_conversations(1, compress),
+        media_type="application/gzip" if compress else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.post("/import", response_model=ImportReport)
+async def import_chat_history(
+    request: Request,
+    #current_user: Principal = Depends(get_current_user),
+):
+    """Import conversations from an NDJSON export (plain or gzip) in batched transactions."""
+    try:
+        return await import_conversations(1, request.stream())
+    except (ValueError, KeyError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid import file: {e}"
+        )
+
+
+@router.get("/search", response_model=List[ChatSearchResult])
+async def search_chat_history(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=100),
+    #current_user: Principal = Depends(get_current_user),
+):
+    """Search messages across the current user's conversations."""
+    if not chat_indexer.available:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Chat history search is unavailable"
+        )
+    
+    return await run_in_threadpool(chat_indexer.search, 1, q, limit)
+
+
 @router.get("/sessions/{conversation_id}", response_model=ConversationSchema)
 def get_conversation(
     conversation_id: str,
-    #current_user: KhojUser = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    #current_user: Principal = Depends(get_current_user),
+    # On the writer, since opening an archived conversation rehydrates it
+    db: Session = Depends(get_write_db)
 ):
     """Get a specific conversation by ID."""
-    conversation = db.query(Conversation).filter(
+    # The archive is read when rehydrating
+    conversation = db.query(Conversation).options(*eager(Conversation.archive)).filter(
         Conversation.id == conversation_id,
         Conversation.user_id == 1
     ).first()
+    conversation = conversation_archiver.rehydrate(db, conversation)
     
     if not conversation:
         raise HTTPException(
@@ -55,13 +157,13 @@ def get_conversation(
 @router.post("/sessions", response_model=ConversationSchema)
 def create_conversation(
     conversation_in: ConversationCreate,
-    #current_user: KhojUser = Depends(get_current_user),
+    #current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Create a new conversation."""
     # Check if agent exists if agent_id is provided
     if conversation_in.agent_id:
-        agent = db.query(Agent).filter(Agent.id == conversation_in.agent_id).first()
+        agent = db.query(Agent).options(*eager()).filter(Agent.id == conversation_in.agent_id).first()
         if not agent:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -97,16 +199,19 @@ def create_conversation(
 def update_conversation(
     conversation_id: str,
     conversation_in: ConversationCreate,
-    #current_user: KhojUser = Depends(get_current_user),
+    #current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Update an existing conversation."""
-    # Get the conversation
-    conversation = db.query(Conversation).filter(
+    # Get the conversation, with the archive that rehydrating reads
+    conversation = db.query(Conversation).options(*eager(Conversation.archive)).filter(
         Conversation.id == conversation_id,
         Conversation.user_id == 1
     ).first()
     
+    # Bring the log back from cold storage before using it
+    conversation = conversation_archiver.rehydrate(db, conversation)
+    
     if not conversation:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -115,7 +220,7 @@ def update_conversation(
     
     # Check if agent exists if agent_id is provided
     if conversation_in.agent_id:
-        agent = db.query(Agent).filter(Agent.id == conversation_in.agent_id).first()
+        agent = db.query(Agent).options(*eager()).filter(Agent.id == conversation_in.agent_id).first()
         if not agent:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -136,50 +241,80 @@ def update_conversation(
     conversation.agent_id = conversation_in.agent_id
     conversation.file_filters = conversation_in.file_filters
     
-    db.commit()
+    # The new log replaces the one read above, so a concurrent append or archive must not be overwritten
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Conversation is being updated concurrently, please retry"
+        )
     db.refresh(conversation)
     
+    # The log was replaced, so search must stop finding the old messages
+    chat_indexer.replace_conversation(1, conversation_id, (conversation.conversation_log or {}).get("chat", []))
+    
     return conversation
 
 
 @router.delete("/sessions/{conversation_id}", response_model=ConversationSchema)
 def delete_conversation(
     conversation_id: str,
-    #current_user: KhojUser = Depends(get_current_user),
+    #current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Delete a conversation."""
-    # Get the conversation
-    conversation = db.query(Conversation).filter(
-        Conversation.id == conversation_id,
-        Conversation.user_id == 1
-    ).first()
-    
-    if not conversation:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Conversation not found"
-        )
-    
-    db.delete(conversation)
-    db.commit()
+    # Reload and delete again if the conversation changed since it was read
+    for _ in range(settings.CONVERSATION_APPEND_MAX_RETRIES + 1):
+        # Get the conversation
+        # The archive is deleted with it
+        conversation = db.query(Conversation).options(*eager(Conversation.archive)).filter(
+            Conversation.id == conversation_id,
+            Conversation.user_id == 1
+        ).first()
+        
+        if not conversation:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Conversation not found"
+            )
+        
+        db.delete(conversation)
+        try:
+            db.commit()
+        except StaleDataError:
+            db.rollback()
+            continue
+        chat_indexer.delete_conversation(conversation_id)
+        return conversation
     
-    return conversation
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Conversation is being updated concurrently, please retry"
+    )
 
 
 @router.post("/sessions/{conversation_id}/message", response_model=ChatMessage)
 async def send_message(
     conversation_id: str,
     message_in: MessageCreate,
-    #current_user: KhojUser = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    #current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    read_db: AsyncSession = Depends(get_async_read_db)
 ):
     """Send a message in a conversation and get AI response."""
-    # Get the conversation
-    conversation = db.query(Conversation).filter(
-        Conversation.id == conversation_id,
-        Conversation.user_id == 1
-    ).first()
+    # Reads go to a reader, so only the rehydration and the append queue for the writer
+    get_conversation = select(Conversation).options(*eager(Conversation.archive)).where(
+        Conversation.id == conversation_id, Conversation.user_id == 1
+    )
+    conversation = (await read_db.execute(get_conversation)).scalars().first()
+    
+    # Bring the log back from cold storage before using it
+    if conversation and conversation.archived_at:
+        conversation = (await db.execute(get_conversation)).scalars().first()
+        conversation = await db.run_sync(conversation_archiver.rehydrate, conversation)
+        await db.close()
     
     if not conversation:
         raise HTTPException(
@@ -187,14 +322,50 @@ async def send_message(
             detail="Conversation not found"
         )
     
-    # Initialize conversation_log.chat if it doesn't exist
-    if "chat" not in conversation.conversation_log:
-        conversation.conversation_log["chat"] = []
+    # Get agent if specified
+    agent = None
+    if conversation.agent_id:
+        agent = (await read_db.execute(
+            select(Agent).options(
+                *eager(joinedload(Agent.chat_model).joinedload(ChatModel.ai_model_api))
+            ).where(Agent.id == conversation.agent_id)
+        )).scalars().first()
+    
+    agent_id = agent.id if agent else None
+    agent_personality = agent.personality if agent else None
+    
+    chat_history = format_chat_history(conversation.conversation_log.get("chat", []))
+    needs_title = not conversation.title and not conversation.conversation_log.get("chat")
+    user_tier = await read_db.run_sync(get_user_tier, 1)
+    remaining = await read_db.run_sync(usage_accountant.remaining_quota, 1, user_tier, "chat")
+    if remaining == 0:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Daily chat quota reached"
+        )
+    
+    # A regenerated turn keeps its id, and with it the tool results of the first answer
+    turn_id = message_in.turn_id or str(uuid.uuid4())
+    
+    # Release the database connections while tools run and the response is generated
+    await read_db.close()
+    await db.close()
+    tool_results = ToolResults(outputs=[])
+    if agent and agent.input_tools:
+        tool_results = await run_tools(agent.input_tools, message_in.message, 1, (conversation_id, turn_id))
+    
+    # Assemble prompt from chat history before appending the new message
+    references = tool_results.as_prompt_context()
+    prompt = build_prompt(message_in.message, chat_history, agent_personality, references)
+    
+    # Pick the chat model for this request
+    routing = chat_model_router.route(await config_cache.aget(), prompt, user_tier, agent)
+    chat_model = routing.chat_model if routing else None
+    chat_model_id = chat_model.id if chat_model else None
     
     # Create user message
     import datetime
     current_time = datetime.datetime.utcnow().isoformat()
-    turn_id = str(uuid.uuid4())
     
     user_message = {
         "message": message_in.message,
@@ -203,24 +374,60 @@ async def send_message(
         "turnId": turn_id
     }
     
-    # Add user message to conversation
-    conversation.conversation_log["chat"].append(user_message)
-    
-    # Get agent if specified
-    agent_personality = None
-    if conversation.agent_id:
-        agent = db.query(Agent).filter(Agent.id == conversation.agent_id).first()
-        if agent:
-            agent_personality = agent.personality
-    
     # Process command if specified
     command = message_in.command or "default"
     
-    # Create AI message (simplified for lightweight version)
-    ai_response = "This is a lightweight version of Khoj. For full AI chat functionality, please install the complete version with Gemini API integration."
+    # Serve from response cache unless the agent opted out
+    ai_response, cache_level, query_embedding = None, None, None
+    cacheable = response_cache.is_cacheable(agent)
+    if cacheable:
+        if response_cache.semantic_enabled:
+            query_embedding = await aembed_query(message_in.message)
+        ai_response, cache_level = response_cache.lookup(
+            agent_id, chat_model_id, agent_personality, prompt, message_in.message, chat_history, query_embedding, references
+        )
+    else:
+        response_cache.record_bypass()
+    
+    if ai_response is None:
+        try:
+            try:
+                if cacheable:
+                    # Coalesce identical in-flight generations for cacheable agents
+                    ai_response = await _generation_flight.do(
+                        response_cache.key(agent_id, chat_model_id, agent_personality, prompt),
+                        lambda: _generate_and_cache(
+                            prompt, agent, chat_model, message_in.message, chat_history, query_embedding, user_tier,
+                            references
+                        ),
+                    )
+                else:
+                    ai_response = await generate_response(prompt, agent, chat_model, 1, user_tier)
+            except SchedulerOverloadedError:
+                # Downgrade free-tier requests to a fallback model on another provider before shedding them
+                fallback = routing.fallback_elsewhere() if routing else None
+                if user_tier != "free" or not fallback:
+                    raise
+                routing = RoutingDecision(fallback, "queue time over SLO, downgraded")
+                ai_response = await generate_response(prompt, agent, routing.chat_model, 1, user_tier)
+        except SchedulerOverloadedError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Chat model is busy, please retry",
+                headers={"Retry-After": "5"},
+            )
+        except ModelApiError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Chat model is unavailable"
+            )
     
-    if agent_personality:
-        ai_response = f"Agent ({agent.name}): {ai_response}"
+    train_of_thought = [{"type": "thinking", "data": "Lightweight mode - no AI processing"}]
+    train_of_thought.extend(tool_results.as_train_of_thought())
+    if routing:
+        train_of_thought.append(routing.as_train_of_thought())
+    if cache_level:
+        train_of_thought.append({"type": "cache", "data": f"Served from {cache_level} response cache"})
     
     # Create AI message
     ai_message = {
@@ -228,14 +435,154 @@ async def send_message(
         "by": "assistant",
         "created": datetime.datetime.utcnow().isoformat(),
         "turnId": turn_id,
-        "trainOfThought": [{"type": "thinking", "data": "Lightweight mode - no AI processing"}],
-        "context": []
+        "trainOfThought": train_of_thought,
+        "context": tool_results.context,
+        "onlineContext": tool_results.online_context,
+        "codeContext": tool_results.code_context
     }
     
-    # Add AI message to conversation
-    conversation.conversation_log["chat"].append(ai_message)
+    # Append the exchange, retrying on concurrent writes to the same conversation
+    try:
+        conversation = await db.run_sync(append_chat_messages, conversation_id, [user_message, ai_message])
+    except ConversationConflictError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Conversation is being updated concurrently, please retry"
+        )
+    
+    if not conversation:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Conversation not found"
+        )
+    
+    usage_accountant.record(1, "chat")
+    
+    # Index the exchange for chat history search in the background
+    chat_indexer.add_messages(1, conversation_id, [user_message, ai_message])
+    
+    # Title the conversation after its first exchange, off the request path
+    if needs_title:
+        title_generator.enqueue(TitleRequest(conversation_id, message_in.message, ai_response))
+    
+    return ai_message
+
+
+def _accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    for coding in (accept_encoding or "").split(","):
+        name, _, params = coding.partition(";")
+        if name.strip().lower() in ("gzip", "*"):
+            quality = params.strip().removeprefix("q=")
+            try:
+                return not quality or float(quality) > 0
+            except ValueError:
+                return True
+    return False
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+@router.post("/share", response_model=PublicConversationSnapshot)
+def share_conversation(
+    conversation_id: str = Query(...),
+    #current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Publish a conversation as a public snapshot."""
+    conversation = db.query(Conversation).options(*eager(Conversation.archive)).filter(
+        Conversation.id == conversation_id,
+        Conversation.user_id == 1
+    ).first()
+    
+    # Bring the log back from cold storage before using it
+    conversation = conversation_archiver.rehydrate(db, conversation)
+    
+    if not conversation:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Conversation not found"
+        )
+    
+    public_conversation = PublicConversation(
+        source_owner_id=1,
+        agent_id=conversation.agent_id,
+        conversation_log=copy.deepcopy(conversation.conversation_log),
+        slug=f"{conversation.slug or 'conversation'}-{uuid.uuid4().hex[:8]}",
+        title=conversation.title
+    )
+    
+    # Render the snapshot once at publish time, so views never re-serialize the log
+    materialize_snapshot(public_conversation)
+    db.add(public_conversation)
+    db.commit()
+    db.refresh(public_conversation)
+    
+    return public_conversation
+
+
+@router.get("/share/{slug}", response_model=PublicConversationSnapshot)
+async def get_shared_conversation(
+    slug: str,
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None)
+):
+    """Get a public conversation snapshot, served from memory with ETag revalidation."""
+    snapshot = await public_snapshots.get(slug)
+    
+    if not snapshot:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Shared conversation not found"
+        )
+    
+    gzipped = _accepts_gzip(accept_encoding)
+    etag = snapshot.gzip_etag if gzipped else snapshot.etag
+    headers = {
+        "ETag": etag,
+        "Cache-Control": (
+            f"public, max-age={settings.PUBLIC_SNAPSHOT_MAX_AGE_SECONDS}, "
+            f"stale-while-revalidate={settings.PUBLIC_SNAPSHOT_STALE_WHILE_REVALIDATE_SECONDS}"
+        ),
+        "Vary": "Accept-Encoding"
+    }
+    
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    if gzipped:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=snapshot.body, media_type="application/json", headers=headers)
+    
+    return Response(content=snapshot.decompressed(), media_type="application/json", headers=headers)
+
+
+@router.delete("/share/{slug}", response_model=PublicConversationSnapshot)
+def unshare_conversation(
+    slug: str,
+    #current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Delete a public conversation snapshot."""
+    public_conversation = db.query(PublicConversation).options(*eager()).filter(
+        PublicConversation.slug == slug,
+        PublicConversation.source_owner_id == 1
+    ).first()
+    
+    if not public_conversation:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Shared conversation not found"
+        )
     
-    # Update conversation in database
+    db.delete(public_conversation)
     db.commit()
+    public_snapshots.invalidate(slug)
     
-    return ai_message 
\ No newline at end of file
+    return public_conversation
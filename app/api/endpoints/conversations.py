@@ -4,7 +4,7 @@ from typing import List, Optional
 import uuid
 import json
 
-from app.core.security import get_current_user
+from app.core.security import Principal, get_current_user
 from app.db.database import get_db
 from app.models.user import KhojUser
 from app.models.conversation import Conversation, Agent
@@ -20,7 +20,7 @@ router = APIRouter()
 
 @router.get("/sessions", response_model=List[ConversationSchema])
 def get_conversations(
-    #current_user: KhojUser = Depends(get_current_user),
+    #current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get all conversations for the current user."""
@@ -34,7 +34,7 @@ def get_conversations(
 @router.get("/sessions/{conversation_id}", response_model=ConversationSchema)
 def get_conversation(
     conversation_id: str,
-    #current_user: KhojUser = Depends(get_current_user),
+    #current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get a specific conversation by ID."""
@@ -55,7 +55,7 @@ def get_conversation(
 @router.post("/sessions", response_model=ConversationSchema)
 def create_conversation(
     conversation_in: ConversationCreate,
-    #current_user: KhojUser = Depends(get_current_user),
+    #current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Create a new conversation."""
@@ -97,7 +97,7 @@ def create_conversation(
 def update_conversation(
     conversation_id: str,
     conversation_in: ConversationCreate,
-    #current_user: KhojUser = Depends(get_current_user),
+    #current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Update an existing conversation."""
@@ -145,7 +145,7 @@ def update_conversation(
 @router.delete("/sessions/{conversation_id}", response_model=ConversationSchema)
 def delete_conversation(
     conversation_id: str,
-    #current_user: KhojUser = Depends(get_current_user),
+    #current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Delete a conversation."""
@@ -171,7 +171,7 @@ def delete_conversation(
 async def send_message(
     conversation_id: str,
     message_in: MessageCreate,
-    #current_user: KhojUser = Depends(get_current_user),
+    #current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Send a message in a conversation and get AI response."""
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
-from app.core.security import get_current_user
+from app.core.security import Principal, get_current_user
 from app.db.database import get_db
 from app.models.user import KhojUser
 from app.models.integration import NotionConfig, GithubConfig, GithubRepoConfig, WebScraper
@@ -22,7 +22,7 @@ router = APIRouter()
 @router.post("/notion", response_model=NotionConfigSchema)
 def configure_notion(
     config_in: NotionConfigCreate,
-    #current_user: KhojUser = Depends(get_current_user),
+    #current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Configure Notion integration."""
@@ -52,7 +52,7 @@ def configure_notion(
 
 @router.get("/notion", response_model=NotionConfigSchema)
 def get_notion_config(
-    #current_user: KhojUser = Depends(get_current_user),
+    #current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get Notion integration configuration."""
@@ -71,7 +71,7 @@ def get_notion_config(
 
 @router.delete("/notion", status_code=status.HTTP_204_NO_CONTENT)
 def delete_notion_config(
-    #current_user: KhojUser = Depends(get_current_user),
+    #current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Delete Notion integration configuration."""
@@ -94,7 +94,7 @@ def delete_notion_config(
 @router.post("/github", response_model=GithubConfigSchema)
 def configure_github(
     config_in: GithubConfigCreate,
-    #current_user: KhojUser = Depends(get_current_user),
+    #current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Configure GitHub integration."""
@@ -124,7 +124,7 @@ def configure_github(
 
 @router.get("/github", response_model=GithubConfigSchema)
 def get_github_config(
-    #current_user: KhojUser = Depends(get_current_user),
+    #current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get GitHub integration configuration."""
@@ -143,7 +143,7 @@ def get_github_config(
 
 @router.delete("/github", status_code=status.HTTP_204_NO_CONTENT)
 def delete_github_config(
-    #current_user: KhojUser = Depends(get_current_user),
+    #current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Delete GitHub integration configuration."""
@@ -166,7 +166,7 @@ def delete_github_config(
 @router.post("/github/repo", response_model=GithubRepoConfigSchema)
 def add_github_repo(
     repo_in: GithubRepoConfigCreate,
-    #current_user: KhojUser = Depends(get_current_user),
+    #current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Add GitHub repository configuration."""
@@ -198,7 +198,7 @@ def add_github_repo(
 
 @router.get("/github/repos", response_model=List[GithubRepoConfigSchema])
 def get_github_repos(
-    #current_user: KhojUser = Depends(get_current_user),
+    #current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get all GitHub repository configurations."""
@@ -224,7 +224,7 @@ def get_github_repos(
 @router.delete("/github/repo/{repo_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_github_repo(
     repo_id: int,
-    #current_user: KhojUser = Depends(get_current_user),
+    #current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Delete GitHub repository configuration."""
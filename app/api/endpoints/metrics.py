@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from typing import Any, Dict
+
+from app.core import metrics
+from app.db.database import get_db
+from app.processor.archive import conversation_archiver
+from app.processor.scheduler import llm_scheduler
+
+router = APIRouter()
+
+
+@router.get("", response_model=Dict[str, Dict[str, Any]])
+def get_metrics():
+    """Get in-process counters for caches, pools and queues."""
+    return metrics.collect()
+
+
+@router.get("/queue", response_model=Dict[str, Any])
+async def get_queue_depth():
+    """Get live queue depth and admission counters of the model call scheduler."""
+    return llm_scheduler.stats()
+
+
+@router.get("/storage", response_model=Dict[str, Any])
+def get_storage(db: Session = Depends(get_db)):
+    """Get sizes of the hot and cold conversation storage tiers and rehydration latency."""
+    return conversation_archiver.storage_stats(db)
@@ -1,4 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import hashlib
@@ -7,61 +9,47 @@ import os
 import tempfile
 import uuid
 
-from app.core.security import get_current_user
-from app.db.database import get_db
+from app.core.config_cache import config_cache
+from app.core.security import Principal, get_current_user
+from app.db.database import get_async_db, get_db
+from app.db.loading import eager
 from app.models.user import KhojUser
 from app.models.content import Entry, FileObject, EntryDates
 from app.models.ai_models import SearchModelConfig
 from app.schemas.content import Entry as EntrySchema, EntryCreate
+from app.processor.content_search import asearch_entries
 
 router = APIRouter()
 
 
-@router.post("/search")
-def search_content(
+@router.post("/search", response_model=List[EntrySchema])
+async def search_content(
     query: str,
     limit: int = 10,
     file_type: Optional[str] = None,
-    #current_user: KhojUser = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    #current_user: Principal = Depends(get_current_user),
 ):
     """Search for content (lightweight version without vector search)."""
-    # Get all entries for the user
-    query_obj = db.query(Entry).filter(Entry.user_id == 1)
-    
-    # Filter by file type if specified
-    if file_type:
-        query_obj = query_obj.filter(Entry.file_type == file_type)
-    
-    entries = query_obj.all()
-    
-    # Simple keyword search (for lightweight version)
-    results = []
-    for entry in entries:
-        if query.lower() in entry.raw.lower() or query.lower() in entry.compiled.lower():
-            results.append(entry)
-    
-    # Return top results
-    return results[:limit]
+    return await asearch_entries(1, query, limit, file_type)
 
 
 @router.post("/index", response_model=List[EntrySchema])
 async def index_content(
     files: List[UploadFile] = File(...),
-    #current_user: KhojUser = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    #current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Index content from uploaded files (lightweight version without embeddings)."""
     indexed_entries = []
     
     # Get default search model
-    search_model = db.query(SearchModelConfig).filter(SearchModelConfig.name == "default").first()
+    search_model = (await config_cache.aget()).search_model("default")
     if not search_model:
         # Create default search model if it doesn't exist
         search_model = SearchModelConfig(name="default")
         db.add(search_model)
-        db.commit()
-        db.refresh(search_model)
+        await db.commit()
+        await db.refresh(search_model)
     
     for file in files:
         # Create temporary file
@@ -87,8 +75,8 @@ async def index_content(
                     user_id=1
                 )
                 db.add(file_object)
-                db.commit()
-                db.refresh(file_object)
+                await db.commit()
+                await db.refresh(file_object)
                 
                 # Split content into chunks (simple implementation)
                 chunks = [text_content[i:i+1000] for i in range(0, len(text_content), 1000)]
@@ -119,26 +107,29 @@ async def index_content(
             
             # Add support for other file types (PDF, DOCX, etc.) here
             
-            db.commit()
-            for entry in indexed_entries:
-                db.refresh(entry)
+            await db.commit()
             
         finally:
             # Clean up temporary file
             os.unlink(temp_file_path)
     
-    return indexed_entries
+    # Reload with dates, since relationships cannot lazy load in async sessions
+    result = await db.execute(
+        select(Entry).options(*eager(Entry.dates)).where(Entry.id.in_([entry.id for entry in indexed_entries]))
+    )
+    return result.scalars().all()
 
 
 @router.delete("/index", status_code=status.HTTP_204_NO_CONTENT)
 def delete_index(
     file_name: Optional[str] = None,
     file_type: Optional[str] = None,
-    #current_user: KhojUser = Depends(get_current_user),
+    #current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Delete indexed content."""
-    query = db.query(Entry).filter(Entry.user_id == 1)
+    # Dates are deleted with their entries
+    query = db.query(Entry).options(*eager(Entry.dates)).filter(Entry.user_id == 1)
     
     if file_name:
         query = query.filter(Entry.file_name == file_name)
@@ -148,11 +139,13 @@ def delete_index(
     
     entries = query.all()
     
-    # Delete associated file objects
+    # Delete associated file objects, whose entries are unlinked on delete
     file_object_ids = set(entry.file_object_id for entry in entries if entry.file_object_id)
-    for file_object_id in file_object_ids:
-        file_object = db.query(FileObject).filter(FileObject.id == file_object_id).first()
-        if file_object:
+    if file_object_ids:
+        file_objects = db.query(FileObject).options(*eager(FileObject.entries)).filter(
+            FileObject.id.in_(file_object_ids)
+        ).all()
+        for file_object in file_objects:
             db.delete(file_object)
     
     # Delete entries
@@ -1,25 +1,45 @@
+import datetime
+
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 
-from app.core.security import get_current_user
+from app.core.config import settings
+from app.core.security import Principal, get_current_user, get_current_user_row
+from app.core.usage import usage_accountant
 from app.db.database import get_db
 from app.models.user import KhojUser
+from app.processor.model_router import get_user_tier
 from app.schemas.user import User as UserSchema
+from app.schemas.utility import UsageSummary
 
 router = APIRouter()
 
 
 @router.get("", response_model=UserSchema)
 def read_current_user(
-    #current_user: KhojUser = Depends(get_current_user),
+    #current_user: KhojUser = Depends(get_current_user_row),
     db: Session = Depends(get_db) # Added db session dependency
 ):
     """
     Get current authenticated user.
     """
-    # The current_user object is already a KhojUser SQLAlchemy model instance
-    # and can be directly returned if UserSchema is compatible.
-    # If UserSchema expects a Pydantic model, ensure current_user is converted or is one.
-    # For now, assuming direct compatibility or that UserSchema can handle the ORM model.
+    # get_current_user returns a cached Principal, not a KhojUser row. The response needs
+    # the row's fields, so get_current_user_row loads it by the principal's id.
     current_user = db.query(KhojUser).filter(KhojUser.username == "testuser").first()
-    return current_user 
\ No newline at end of file
+    return current_user 
+
+
+@router.get("/usage", response_model=UsageSummary)
+def read_usage(
+    #current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get the current user's requests per slug over the last 24 hours, with their daily quotas.
+    """
+    since = datetime.datetime.utcnow() - datetime.timedelta(days=1)
+    return UsageSummary(
+        since=since,
+        usage=usage_accountant.usage(db, 1, since),
+        quotas=settings.USAGE_DAILY_QUOTAS.get(get_user_tier(db, 1), {}),
+    )
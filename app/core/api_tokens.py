@@ -0,0 +1,227 @@
+import asyncio
+import datetime
+import hashlib
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import case, func, select, update
+from sqlalchemy.orm import Session
+
+from app.core import metrics
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db.database import ReadSessionLocal, SessionLocal, upsert_insert
+from app.models.user import KhojApiUser
+from app.models.utility import ConfigVersion
+
+# Row of config_versions counting API token revocations
+REVOCATIONS_VERSION_ID = 2
+
+# API token ids and principals by token hash, see app.core.security.validate_api_token
+api_token_cache = TTLCache(maxsize=settings.API_TOKEN_CACHE_MAX_ENTRIES, ttl=settings.API_TOKEN_CACHE_TTL_SECONDS)
+
+
+def hash_api_token(token: str) -> str:
+    """Stored lookup key of an API token."""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class TokenAccessRecorder:
+    """Buffers API token accessed_at updates and writes them in one batched UPDATE.
+
+    Each token is recorded at most once per interval, so token-authenticated requests
+    do not each open a write transaction.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._pending: Dict[int, datetime.datetime] = {}
+        self._last_recorded: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        self._task: Optional["asyncio.Task[None]"] = None
+        self.recorded = 0
+        self.skipped = 0
+        self.flushes = 0
+        self.failed = 0
+
+    def record(self, token_id: int) -> None:
+        now = time.monotonic()
+        with self._lock:
+            last = self._last_recorded.get(token_id)
+            if last is not None and now - last < self.interval:
+                self.skipped += 1
+                return
+            self._last_recorded[token_id] = now
+            self._pending[token_id] = datetime.datetime.utcnow()
+            self.recorded += 1
+
+    def forget(self, token_id: int) -> None:
+        """Drop buffered state of a deleted token."""
+        with self._lock:
+            self._pending.pop(token_id, None)
+            self._last_recorded.pop(token_id, None)
+
+    def flush(self) -> int:
+        """Write buffered access times. Returns the number of tokens updated."""
+        now = time.monotonic()
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            # Tokens not recorded for an interval would be recorded again anyway
+            self._last_recorded = {
+                token_id: last for token_id, last in self._last_recorded.items() if now - last < self.interval
+            }
+        if not pending:
+            return 0
+        db = SessionLocal()
+        try:
+            result = db.execute(
+                update(KhojApiUser)
+                .where(KhojApiUser.id.in_(pending))
+                .values(
+                    accessed_at=case(pending, value=KhojApiUser.id),
+                    updated_at=KhojApiUser.updated_at,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            self.flushes += 1
+            return result.rowcount
+        except Exception:
+            # Keep newer access times recorded meanwhile, retry on the next flush
+            with self._lock:
+                for token_id, accessed_at in pending.items():
+                    self._pending.setdefault(token_id, accessed_at)
+            self.failed += 1
+            raise
+        finally:
+            db.close()
+
+    def start(self) -> None:
+        if self._task:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        # Write what is left before shutting down
+        await run_in_threadpool(self.flush)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await run_in_threadpool(self.flush)
+            except Exception:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._pending),
+            "tracked": len(self._last_recorded),
+            "recorded": self.recorded,
+            "skipped": self.skipped,
+            "flushes": self.flushes,
+            "failed": self.failed,
+        }
+
+
+class TokenRevocations:
+    """Drops this worker's cached API tokens when a token is revoked on any worker.
+
+    Revoking bumps a version row in the revoking transaction. Every worker polls it each
+    check interval and clears its token cache when it moved, so a revoked token stops
+    working everywhere within the interval rather than the cache TTL.
+    """
+
+    def __init__(self, check_interval: float, cache: TTLCache):
+        self.check_interval = check_interval
+        self._cache = cache
+        self._version: Optional[int] = None
+        self._task: Optional["asyncio.Task[None]"] = None
+        self.revoked = 0
+        self.checks = 0
+        self.clears = 0
+        self.failed = 0
+
+    @staticmethod
+    def revoke(db: Session, api_token: KhojApiUser) -> None:
+        """Delete a token and bump the revocation version, in the caller's transaction. The caller commits."""
+        db.delete(api_token)
+        insert = upsert_insert(db.get_bind().dialect.name)
+        statement = insert(ConfigVersion).values(id=REVOCATIONS_VERSION_ID, version=1)
+        db.connection().execute(statement.on_conflict_do_update(
+            index_elements=["id"],
+            set_={"version": ConfigVersion.version + 1, "updated_at": func.now()},
+        ))
+
+    def revoked_locally(self, token_hash: str) -> None:
+        """Drop a token revoked by this worker at once, after the commit."""
+        self._cache.pop(token_hash)
+        self.revoked += 1
+
+    def check(self) -> bool:
+        """Clear the cache when a token was revoked since the last check. Returns whether it cleared."""
+        self.checks += 1
+        db = ReadSessionLocal()
+        try:
+            version = db.execute(
+                select(ConfigVersion.version).where(ConfigVersion.id == REVOCATIONS_VERSION_ID)
+            ).scalar() or 0
+        finally:
+            db.close()
+        if version == self._version:
+            return False
+        # Also on the first check, since tokens may have been cached before it
+        self._version = version
+        self._cache.clear()
+        self.clears += 1
+        return True
+
+    def start(self) -> None:
+        if self._task:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await run_in_threadpool(self.check)
+            except Exception:
+                self.failed += 1
+            await asyncio.sleep(self.check_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self._version,
+            "revoked": self.revoked,
+            "checks": self.checks,
+            "clears": self.clears,
+            "failed": self.failed,
+        }
+
+
+token_access_recorder = TokenAccessRecorder(interval=settings.API_TOKEN_ACCESS_FLUSH_SECONDS)
+token_revocations = TokenRevocations(check_interval=settings.API_TOKEN_REVOCATION_CHECK_SECONDS, cache=api_token_cache)
+
+metrics.register("api_token_access", token_access_recorder.stats)
+metrics.register("api_token_cache", api_token_cache.stats)
+metrics.register("api_token_revocations", token_revocations.stats)
@@ -1,6 +1,6 @@
 import os
 from pydantic_settings import BaseSettings
-from typing import Optional, List
+from typing import Dict, Optional, List
 
 
 class Settings(BaseSettings):
@@ -9,9 +9,57 @@ class Settings(BaseSettings):
     SECRET_KEY: str = os.getenv("SECRET_KEY", "supersecretkey")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
     ALGORITHM: str = "HS256"
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 5 * 60  # 5 minutes, capped at the token's expiry
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+    PASSWORD_BCRYPT_ROUNDS: int = 12  # Hashes with fewer rounds are upgraded on login
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_QUEUE: int = 16
+    PASSWORD_HASH_WORKER_NICENESS: int = 10
+    API_TOKEN_CACHE_TTL_SECONDS: int = 5 * 60  # 5 minutes
+    API_TOKEN_CACHE_MAX_ENTRIES: int = 10000
+    API_TOKEN_ACCESS_FLUSH_SECONDS: int = 60  # Also the most often accessed_at is written per token
+    API_TOKEN_REVOCATION_CHECK_SECONDS: int = 2  # How soon other workers stop accepting a revoked token
+    
+    # Rate limiting, requests per window by subscription tier and slug
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"  # memory, or database to share limits between workers
+    RATE_LIMIT_WINDOW_SECONDS: int = 60
+    RATE_LIMITS: Dict[str, Dict[str, int]] = {
+        "free": {"chat:write": 30, "auth:write": 20, "default": 600},
+        "standard": {"chat:write": 300, "auth:write": 60, "default": 3000},
+    }
+    RATE_LIMIT_SNAPSHOT_SECONDS: int = 30
+    RATE_LIMIT_RETENTION_DAYS: int = 7
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    
+    # Usage accounting, counted per user and slug in time buckets and written behind
+    USAGE_BUCKET_SECONDS: int = 60  # Minute buckets, 3600 for hourly
+    USAGE_FLUSH_SECONDS: int = 10
+    USAGE_FLUSH_BATCH_SIZE: int = 500
+    USAGE_BUCKET_RETENTION_HOURS: int = 48  # Then rolled up into day buckets
+    USAGE_ROLLUP_INTERVAL_SECONDS: int = 60 * 60  # 1 hour
+    USAGE_DAILY_QUOTAS: Dict[str, Dict[str, int]] = {
+        "free": {"chat": 500},
+        "standard": {},
+    }
     
     # Database
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./khoj.db")
+    # SQLite file databases: WAL, tuned pragmas, one writer connection and a pool of read-only ones
+    SQLITE_PRODUCTION_MODE: bool = True
+    SQLITE_CACHE_SIZE_KB: int = 64 * 1024  # 64 MB per connection
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024  # 256 MB
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_READ_POOL_SIZE: int = 8
+    SQLITE_WRITE_QUEUE_TIMEOUT_SECONDS: int = 30  # Longest wait for the writer connection
+    # Tables are created and migrated by python -m app.db.migrate, or in the lifespan when set
+    DATABASE_MIGRATE_ON_STARTUP: bool = False
+    # Start worker pools, open pooled connections and configure ORM mappers in the background after startup
+    STARTUP_WARM_UP: bool = True
+    
+    # Configuration cache of the model, search and scraper tables, reloaded when their version changes
+    CONFIG_CACHE_CHECK_SECONDS: float = 2.0  # How often workers poll the version
+    CONFIG_CACHE_MAX_AGE_SECONDS: int = 300  # Reload anyway after this long
     
     # CORS
     BACKEND_CORS_ORIGINS: List[str] = ["*"]
@@ -24,6 +72,125 @@ class Settings(BaseSettings):
     MAX_UPLOAD_SIZE: int = 50 * 1024 * 1024  # 50 MB
     ALLOWED_EXTENSIONS: List[str] = ["txt", "pdf", "md", "org", "docx"]
     
+    # Flag sync database queries on the event loop: "warn", "raise" or "off"
+    SYNC_DB_GUARD: str = "warn"
+    # Flag requests issuing more than SQL_STATEMENT_BUDGET statements: "warn", "raise" or "off".
+    # tests/conftest.py sets it to "raise" to catch N+1 lazy loads, see app.db.loading
+    SQL_STATEMENT_GUARD: str = "off"
+    SQL_STATEMENT_BUDGET: int = 25
+    
+    # Chat response cache
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_TTL_SECONDS: int = 60 * 60  # 1 hour
+    RESPONSE_CACHE_MAX_ENTRIES: int = 2048
+    RESPONSE_CACHE_SEMANTIC_ENABLED: bool = False
+    RESPONSE_CACHE_SEMANTIC_THRESHOLD: float = 0.95
+    RESPONSE_CACHE_SEMANTIC_MAX_ENTRIES: int = 512
+    
+    # Conversations
+    CONVERSATION_APPEND_MAX_RETRIES: int = 20
+    
+    # Public conversation snapshots
+    PUBLIC_SNAPSHOT_CACHE_MAX_ENTRIES: int = 256
+    PUBLIC_SNAPSHOT_CACHE_TTL_SECONDS: int = 10 * 60  # 10 minutes
+    PUBLIC_SNAPSHOT_MAX_AGE_SECONDS: int = 60
+    PUBLIC_SNAPSHOT_STALE_WHILE_REVALIDATE_SECONDS: int = 30
+    
+    # Conversation export and import
+    CONVERSATION_EXPORT_BATCH_SIZE: int = 100
+    CONVERSATION_EXPORT_CHUNK_BYTES: int = 64 * 1024  # 64 KB
+    CONVERSATION_IMPORT_BATCH_SIZE: int = 500
+    CONVERSATION_IMPORT_BATCH_MESSAGES: int = 10000
+    CONVERSATION_IMPORT_MAX_LINE_BYTES: int = 16 * 1024 * 1024  # 16 MB
+    
+    # Chat history search
+    CHAT_INDEX_BATCH_SIZE: int = 200
+    CHAT_INDEX_MAX_QUEUE: int = 10000
+    CHAT_SEARCH_SNIPPET_TOKENS: int = 16
+    CHAT_SEARCH_HIGHLIGHT_OPEN: str = "<b>"
+    CHAT_SEARCH_HIGHLIGHT_CLOSE: str = "</b>"
+    
+    # Conversation cold storage
+    CONVERSATION_ARCHIVE_ENABLED: bool = True
+    CONVERSATION_ARCHIVE_IDLE_DAYS: int = 7
+    CONVERSATION_ARCHIVE_BATCH_SIZE: int = 200
+    CONVERSATION_ARCHIVE_INTERVAL_SECONDS: int = 60 * 60  # 1 hour
+    CONVERSATION_ARCHIVE_COMPRESSION_LEVEL: int = 6
+    
+    # Conversation titles
+    TITLE_GENERATION_ENABLED: bool = True
+    TITLE_BATCH_SIZE: int = 8
+    TITLE_BATCH_LINGER_SECONDS: float = 2.0
+    TITLE_QUEUE_MAX_SIZE: int = 1000
+    TITLE_MAX_WORDS: int = 6
+    TITLE_EXCERPT_CHARS: int = 500
+    
+    # Chat tools
+    TOOLS_DEADLINE_SECONDS: float = 8.0
+    TOOL_TIMEOUT_SECONDS: float = 5.0
+    TOOL_RESULTS_CACHE_TTL_SECONDS: int = 30 * 60  # 30 minutes
+    TOOL_RESULTS_CACHE_MAX_ENTRIES: int = 512
+    NOTES_TOOL_MAX_RESULTS: int = 5
+    WEBPAGE_TOOL_MAX_URLS: int = 3
+    WEBPAGE_TOOL_MAX_CHARS: int = 4000
+    CODE_TOOL_MAX_SNIPPETS: int = 3
+    
+    # Web scraping
+    WEB_SCRAPER_TIMEOUT_SECONDS: float = 4.0
+    WEB_SCRAPER_HEDGE_DELAY_SECONDS: float = 1.5
+    WEB_SCRAPER_MAX_REDIRECTS: int = 5
+    WEB_SCRAPER_ALLOW_PRIVATE_URLS: bool = False
+    WEB_PAGE_CACHE_TTL_SECONDS: int = 60 * 60  # 1 hour
+    WEB_PAGE_CACHE_MAX_ENTRIES: int = 1024
+    WEB_PAGE_MAX_BYTES: int = 5 * 1024 * 1024  # 5 MB
+    WEB_PAGE_MAX_CHARS: int = 20000
+    WEB_EXTRACT_WORKERS: int = 2  # Processes for HTML extraction, 0 to use the thread pool
+    WEB_SEARCH_MAX_RESULTS: int = 5
+    WEB_SEARCH_MAX_PAGES: int = 3
+    
+    # Code sandbox
+    CODE_SANDBOX_WORKERS: int = 2  # 0 disables the code tool
+    CODE_SANDBOX_MAX_EXECUTIONS: int = 50  # Snippets per worker before it is replaced
+    CODE_SANDBOX_TIMEOUT_SECONDS: float = 3.0  # Wall clock, per snippet
+    CODE_SANDBOX_CPU_SECONDS: int = 2
+    CODE_SANDBOX_MEMORY_MB: int = 512
+    CODE_SANDBOX_MAX_OUTPUT_CHARS: int = 4000
+    CODE_SANDBOX_START_TIMEOUT_SECONDS: float = 10.0
+    
+    # AI model API clients
+    MODEL_API_HTTP2: bool = True
+    MODEL_API_TIMEOUT_SECONDS: float = 60.0
+    MODEL_API_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    MODEL_API_MAX_CONNECTIONS: int = 100
+    MODEL_API_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    MODEL_API_KEEPALIVE_EXPIRY_SECONDS: float = 60.0
+    MODEL_API_MAX_RETRIES: int = 2
+    MODEL_API_BACKOFF_BASE_SECONDS: float = 0.25
+    MODEL_API_BACKOFF_MAX_SECONDS: float = 4.0
+    MODEL_API_HEDGING_ENABLED: bool = False
+    MODEL_API_HEDGING_MIN_SAMPLES: int = 20
+    MODEL_API_HEDGING_MIN_DELAY_SECONDS: float = 0.5
+    MODEL_API_BREAKER_FAILURE_THRESHOLD: int = 5
+    MODEL_API_BREAKER_RESET_SECONDS: float = 30.0
+    
+    # Chat model routing
+    CHAT_ROUTER_CHARS_PER_TOKEN: int = 4
+    CHAT_ROUTER_LATENCY_SLO_SECONDS: float = 20.0
+    CHAT_ROUTER_MAX_ERROR_RATE: float = 0.25
+    CHAT_ROUTER_MIN_SAMPLES: int = 10
+    CHAT_ROUTER_MAX_IN_FLIGHT: int = 50
+    CHAT_ROUTER_PROBE_RATE: float = 0.05
+    
+    # Model call scheduling
+    LLM_SCHEDULER_PROVIDER_CONCURRENCY: int = 32
+    LLM_SCHEDULER_FREE_CONCURRENCY: int = 8
+    LLM_SCHEDULER_STANDARD_CONCURRENCY: int = 32
+    LLM_SCHEDULER_STANDARD_WEIGHT: float = 3.0
+    LLM_SCHEDULER_FREE_QUEUE_SLO_SECONDS: float = 10.0
+    LLM_SCHEDULER_STANDARD_QUEUE_SLO_SECONDS: float = 30.0
+    LLM_SCHEDULER_FREE_MAX_QUEUE: int = 50
+    LLM_SCHEDULER_STANDARD_MAX_QUEUE: int = 200
+    
     class Config:
         case_sensitive = True
 
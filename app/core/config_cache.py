@@ -0,0 +1,410 @@
+import asyncio
+import threading
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.singleflight import SingleFlight
+from app.db.database import ReadSessionLocal, upsert_insert
+from app.models.ai_models import (
+    AiModelApi, ChatModel, SearchModelConfig, ServerChatSettings, SpeechToTextModelOptions, TextToImageModelConfig,
+    VoiceModelOption,
+)
+from app.models.integration import WebScraper
+from app.models.utility import ConfigVersion
+
+# Tables whose writes bump the configuration version
+CONFIG_MODELS = (
+    AiModelApi, ChatModel, SearchModelConfig, ServerChatSettings, SpeechToTextModelOptions, TextToImageModelConfig,
+    VoiceModelOption, WebScraper,
+)
+_config_tables = frozenset(model.__table__ for model in CONFIG_MODELS)
+
+
+@dataclass(frozen=True)
+class CachedAiModelApi:
+    id: int
+    name: Optional[str]
+    api_key: Optional[str]
+    api_base_url: Optional[str]
+
+
+@dataclass(frozen=True)
+class CachedChatModel:
+    """Chat model with its API, attribute compatible with the ChatModel rows it replaces."""
+    id: int
+    name: str
+    model_type: str
+    price_tier: str
+    ai_model_api_id: Optional[int] = None
+    ai_model_api: Optional[CachedAiModelApi] = None
+    max_prompt_size: Optional[int] = None
+    subscribed_max_prompt_size: Optional[int] = None
+    tokenizer: Optional[str] = None
+    vision_enabled: bool = False
+    description: Optional[str] = None
+    strengths: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class CachedServerChatSettings:
+    chat_default: Optional[CachedChatModel]
+    chat_advanced: Optional[CachedChatModel]
+
+
+@dataclass(frozen=True)
+class CachedSearchModel:
+    id: int
+    name: str
+    model_type: str
+    bi_encoder: str
+    cross_encoder: str
+    bi_encoder_model_config: Mapping[str, Any] = field(default_factory=dict)
+    bi_encoder_query_encode_config: Mapping[str, Any] = field(default_factory=dict)
+    bi_encoder_docs_encode_config: Mapping[str, Any] = field(default_factory=dict)
+    cross_encoder_model_config: Mapping[str, Any] = field(default_factory=dict)
+    embeddings_inference_endpoint: Optional[str] = None
+    embeddings_inference_endpoint_api_key: Optional[str] = None
+    embeddings_inference_endpoint_type: str = "local"
+    cross_encoder_inference_endpoint: Optional[str] = None
+    cross_encoder_inference_endpoint_api_key: Optional[str] = None
+    bi_encoder_confidence_threshold: Optional[float] = None
+
+
+@dataclass(frozen=True)
+class CachedTextToImageModel:
+    id: int
+    model_name: str
+    model_type: str
+    price_tier: str
+    api_key: Optional[str] = None
+    ai_model_api: Optional[CachedAiModelApi] = None
+
+
+@dataclass(frozen=True)
+class CachedSpeechToTextModel:
+    id: int
+    model_name: str
+    model_type: str
+    price_tier: str
+    ai_model_api: Optional[CachedAiModelApi] = None
+
+
+@dataclass(frozen=True)
+class CachedVoiceModel:
+    id: int
+    model_id: str
+    name: str
+    price_tier: str
+
+
+@dataclass(frozen=True)
+class CachedWebScraper:
+    id: int
+    name: Optional[str]
+    type: str
+    api_key: Optional[str] = None
+    api_url: Optional[str] = None
+    priority: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """Configuration tables as of one version, read in a single transaction."""
+    version: int
+    loaded_at: float
+    ai_model_apis: Mapping[int, CachedAiModelApi]
+    chat_models: Mapping[int, CachedChatModel]
+    server_chat_settings: Optional[CachedServerChatSettings]
+    search_models: Mapping[str, CachedSearchModel]
+    text_to_image_models: Mapping[int, CachedTextToImageModel]
+    speech_to_text_models: Mapping[int, CachedSpeechToTextModel]
+    voice_models: Mapping[int, CachedVoiceModel]
+    # Lowest priority number first
+    web_scrapers: Tuple[CachedWebScraper, ...]
+
+    def search_model(self, name: str = "default") -> Optional[CachedSearchModel]:
+        return self.search_models.get(name)
+
+
+def _frozen(value: Optional[Dict[str, Any]]) -> Mapping[str, Any]:
+    return MappingProxyType(dict(value or {}))
+
+
+def current_version(db: Session) -> int:
+    return db.execute(select(ConfigVersion.version).where(ConfigVersion.id == 1)).scalar() or 0
+
+
+def load_snapshot() -> ConfigSnapshot:
+    """Read the configuration tables, the version first so a concurrent write makes the snapshot look stale."""
+    db = ReadSessionLocal()
+    try:
+        version = current_version(db)
+        apis = {
+            row.id: CachedAiModelApi(id=row.id, name=row.name, api_key=row.api_key, api_base_url=row.api_base_url)
+            for row in db.scalars(select(AiModelApi))
+        }
+        chat_models = {
+            row.id: CachedChatModel(
+                id=row.id,
+                name=row.name,
+                model_type=row.model_type,
+                price_tier=row.price_tier,
+                ai_model_api_id=row.ai_model_api_id,
+                ai_model_api=apis.get(row.ai_model_api_id),
+                max_prompt_size=row.max_prompt_size,
+                subscribed_max_prompt_size=row.subscribed_max_prompt_size,
+                tokenizer=row.tokenizer,
+                vision_enabled=bool(row.vision_enabled),
+                description=row.description,
+                strengths=row.strengths,
+            )
+            for row in db.scalars(select(ChatModel))
+        }
+        server_chat_settings = db.scalars(select(ServerChatSettings).order_by(ServerChatSettings.id).limit(1)).first()
+        search_models: Dict[str, CachedSearchModel] = {}
+        for row in db.scalars(select(SearchModelConfig).order_by(SearchModelConfig.id)):
+            # Queries by name take the first row, so does the cache
+            search_models.setdefault(row.name, CachedSearchModel(
+                id=row.id,
+                name=row.name,
+                model_type=row.model_type,
+                bi_encoder=row.bi_encoder,
+                cross_encoder=row.cross_encoder,
+                bi_encoder_model_config=_frozen(row.bi_encoder_model_config),
+                bi_encoder_query_encode_config=_frozen(row.bi_encoder_query_encode_config),
+                bi_encoder_docs_encode_config=_frozen(row.bi_encoder_docs_encode_config),
+                cross_encoder_model_config=_frozen(row.cross_encoder_model_config),
+                embeddings_inference_endpoint=row.embeddings_inference_endpoint,
+                embeddings_inference_endpoint_api_key=row.embeddings_inference_endpoint_api_key,
+                embeddings_inference_endpoint_type=row.embeddings_inference_endpoint_type,
+                cross_encoder_inference_endpoint=row.cross_encoder_inference_endpoint,
+                cross_encoder_inference_endpoint_api_key=row.cross_encoder_inference_endpoint_api_key,
+                bi_encoder_confidence_threshold=row.bi_encoder_confidence_threshold,
+            ))
+        text_to_image_models = {
+            row.id: CachedTextToImageModel(
+                id=row.id, model_name=row.model_name, model_type=row.model_type, price_tier=row.price_tier,
+                api_key=row.api_key, ai_model_api=apis.get(row.ai_model_api_id),
+            )
+            for row in db.scalars(select(TextToImageModelConfig))
+        }
+        speech_to_text_models = {
+            row.id: CachedSpeechToTextModel(
+                id=row.id, model_name=row.model_name, model_type=row.model_type, price_tier=row.price_tier,
+                ai_model_api=apis.get(row.ai_model_api_id),
+            )
+            for row in db.scalars(select(SpeechToTextModelOptions))
+        }
+        voice_models = {
+            row.id: CachedVoiceModel(id=row.id, model_id=row.model_id, name=row.name, price_tier=row.price_tier)
+            for row in db.scalars(select(VoiceModelOption))
+        }
+        scrapers = sorted(db.scalars(select(WebScraper)), key=lambda row: (row.priority is None, row.priority or 0, row.id))
+        web_scrapers = tuple(
+            CachedWebScraper(
+                id=row.id, name=row.name, type=row.type, api_key=row.api_key, api_url=row.api_url, priority=row.priority
+            )
+            for row in scrapers
+        )
+    finally:
+        db.close()
+
+    return ConfigSnapshot(
+        version=version,
+        loaded_at=time.monotonic(),
+        ai_model_apis=MappingProxyType(apis),
+        chat_models=MappingProxyType(chat_models),
+        server_chat_settings=CachedServerChatSettings(
+            chat_default=chat_models.get(server_chat_settings.chat_default_id),
+            chat_advanced=chat_models.get(server_chat_settings.chat_advanced_id),
+        ) if server_chat_settings else None,
+        search_models=MappingProxyType(search_models),
+        text_to_image_models=MappingProxyType(text_to_image_models),
+        speech_to_text_models=MappingProxyType(speech_to_text_models),
+        voice_models=MappingProxyType(voice_models),
+        web_scrapers=web_scrapers,
+    )
+
+
+def bump_version(session: Session) -> None:
+    """Increment the configuration version in the session's transaction."""
+    insert = upsert_insert(session.get_bind().dialect.name)
+    statement = insert(ConfigVersion).values(id=1, version=1)
+    session.connection().execute(statement.on_conflict_do_update(
+        index_elements=["id"],
+        set_={"version": ConfigVersion.version + 1, "updated_at": func.now()},
+    ))
+
+
+class ConfigCache:
+    """In-process, read-through cache of the configuration tables.
+
+    Lookups return an immutable ConfigSnapshot without touching the database. Writes to
+    the tables through the ORM bump the version row in the same transaction and drop this
+    worker's snapshot on commit. Other workers poll the version every check interval and
+    reload when it changed, so they converge within seconds. Snapshots are also reloaded
+    after the max age, covering writes made outside the ORM.
+    """
+
+    def __init__(self, check_interval: float, max_age: float):
+        self.check_interval = check_interval
+        self.max_age = max_age
+        self._snapshot: Optional[ConfigSnapshot] = None
+        self._stale = False
+        self._lock = threading.Lock()
+        self._flight = SingleFlight("config_cache")
+        self._task: Optional["asyncio.Task[None]"] = None
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.invalidations = 0
+        self.checks = 0
+        self.failed = 0
+
+    def _fresh(self) -> Optional[ConfigSnapshot]:
+        snapshot = self._snapshot
+        if snapshot is None or self._stale or time.monotonic() - snapshot.loaded_at > self.max_age:
+            return None
+        return snapshot
+
+    def _reload(self) -> ConfigSnapshot:
+        with self._lock:
+            snapshot = self._fresh()
+            if snapshot is not None:
+                return snapshot
+            self._stale = False
+            try:
+                snapshot = load_snapshot()
+            except Exception:
+                self._stale = True
+                self.failed += 1
+                raise
+            self._snapshot = snapshot
+            self.loads += 1
+            return snapshot
+
+    def get(self) -> ConfigSnapshot:
+        """Current snapshot, loading it on a miss. Blocks, so async code calls aget()."""
+        snapshot = self._fresh()
+        if snapshot is not None:
+            self.hits += 1
+            return snapshot
+        self.misses += 1
+        return self._reload()
+
+    async def aget(self) -> ConfigSnapshot:
+        snapshot = self._fresh()
+        if snapshot is not None:
+            self.hits += 1
+            return snapshot
+        self.misses += 1
+        return await self._flight.do("snapshot", lambda: run_in_threadpool(self._reload))
+
+    def invalidate(self) -> None:
+        self._stale = True
+        self.invalidations += 1
+
+    def check(self) -> bool:
+        """Reload when the stored version moved past the snapshot's. Returns whether it reloaded."""
+        self.checks += 1
+        snapshot = self._snapshot
+        if snapshot is None:
+            return False
+        db = ReadSessionLocal()
+        try:
+            version = current_version(db)
+        finally:
+            db.close()
+        if version == snapshot.version and self._fresh() is not None:
+            return False
+        self._stale = self._stale or version != snapshot.version
+        self._reload()
+        return True
+
+    def start(self) -> None:
+        if self._task:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                await run_in_threadpool(self.check)
+            except Exception:
+                self.failed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        lookups = self.hits + self.misses
+        return {
+            "version": snapshot.version if snapshot else None,
+            "age_seconds": round(time.monotonic() - snapshot.loaded_at, 1) if snapshot else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "loads": self.loads,
+            "invalidations": self.invalidations,
+            "checks": self.checks,
+            "failed": self.failed,
+        }
+
+
+config_cache = ConfigCache(
+    check_interval=settings.CONFIG_CACHE_CHECK_SECONDS,
+    max_age=settings.CONFIG_CACHE_MAX_AGE_SECONDS,
+)
+
+metrics.register("config_cache", config_cache.stats)
+
+
+def _touches_config(objects) -> bool:
+    return any(type(obj).__table__ in _config_tables for obj in objects if hasattr(type(obj), "__table__"))
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_on_flush(session: Session, flush_context) -> None:
+    if session.info.get("config_changed"):
+        return
+    if _touches_config(session.new) or _touches_config(session.dirty) or _touches_config(session.deleted):
+        bump_version(session)
+        session.info["config_changed"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _bump_on_bulk_write(orm_execute_state) -> None:
+    session = orm_execute_state.session
+    if orm_execute_state.is_select or session.info.get("config_changed"):
+        return
+    if any(mapper.local_table in _config_tables for mapper in orm_execute_state.all_mappers):
+        bump_version(session)
+        session.info["config_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session: Session) -> None:
+    if session.info.pop("config_changed", False):
+        config_cache.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_on_rollback(session: Session) -> None:
+    session.info.pop("config_changed", None)
@@ -0,0 +1,14 @@
+from typing import Any, Callable, Dict
+
+# Subsystems register a callable returning a dict of their current counters
+_collectors: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+
+def register(name: str, collector: Callable[[], Dict[str, Any]]) -> None:
+    """Register a metrics collector under a name."""
+    _collectors[name] = collector
+
+
+def collect() -> Dict[str, Dict[str, Any]]:
+    """Collect current metrics from every registered subsystem."""
+    return {name: collector() for name, collector in _collectors.items()}
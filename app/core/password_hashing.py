@@ -0,0 +1,141 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from passlib.context import CryptContext
+
+from app.core import metrics
+from app.core.config import settings
+from app.processor.model_clients import LatencyTracker
+
+# Hashes below the configured rounds count as deprecated and are upgraded on login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+)
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_and_update_password(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password, returning a new hash too if the stored one is deprecated."""
+    if not hashed_password:
+        return False, None
+    try:
+        return pwd_context.verify_and_update(password, hashed_password)
+    except ValueError:
+        # Not a hash passlib recognises, e.g. a placeholder
+        return False, None
+
+
+def _init_worker() -> None:
+    # Yield the CPU to request handling when they compete
+    os.nice(settings.PASSWORD_HASH_WORKER_NICENESS)
+
+
+def _warm_up() -> None:
+    pass
+
+
+class PasswordHashingBusyError(Exception):
+    """Raised when the password hashing queue is full."""
+
+
+class PasswordHasher:
+    """Runs password hashing in a small process pool with a bounded wait queue.
+
+    bcrypt costs hundreds of milliseconds of CPU per call. Keeping it off the shared
+    threadpool and capping how much of it can queue means a login flood is turned away
+    with PasswordHashingBusyError instead of slowing down every other endpoint.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._in_flight = 0
+        self.rejected = 0
+        self.latency = LatencyTracker()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker
+            )
+        return self._executor
+
+    def _discard(self, executor: ProcessPoolExecutor) -> None:
+        # Concurrent calls may all see the same broken pool, only the first replaces it
+        if self._executor is executor:
+            self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def start(self) -> None:
+        """Start the worker processes ahead of the first login."""
+        executor = self._get_executor()
+        for _ in range(self.workers):
+            executor.submit(_warm_up)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            # Wait for the workers to exit, ones still starting up would be left running otherwise
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def check_capacity(self) -> None:
+        """Fail fast when the queue is full, before doing any other work for the request."""
+        if self._in_flight >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise PasswordHashingBusyError("Password hashing queue is full")
+
+    async def _submit(self, fn: Callable[..., Any], *args: Any) -> Any:
+        self.check_capacity()
+        self._in_flight += 1
+        start = time.perf_counter()
+        ok = False
+        loop = asyncio.get_running_loop()
+        try:
+            executor = self._get_executor()
+            try:
+                result = await loop.run_in_executor(executor, fn, *args)
+            except BrokenProcessPool:
+                # A worker died, e.g. to the OOM killer, and the pool refuses all further work. Hashing
+                # has no side effects, so retry once on a new pool
+                self._discard(executor)
+                result = await loop.run_in_executor(self._get_executor(), fn, *args)
+            ok = True
+            return result
+        finally:
+            self._in_flight -= 1
+            self.latency.record(time.perf_counter() - start, ok)
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(hash_password, password)
+
+    async def verify(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Verify a password. Returns a new hash to store when the old one is deprecated."""
+        return await self._submit(verify_and_update_password, password, hashed_password)
+
+    def stats(self) -> Dict[str, Any]:
+        latency = self.latency.stats()
+        return {
+            "workers": self.workers,
+            "in_flight": self._in_flight,
+            "queued": max(0, self._in_flight - self.workers),
+            "max_queue": self.max_queue,
+            "rejected": self.rejected,
+            **{key: latency[key] for key in ("requests", "errors", "p50_ms", "p95_ms", "p99_ms")},
+        }
+
+
+password_hasher = PasswordHasher(workers=settings.PASSWORD_HASH_WORKERS, max_queue=settings.PASSWORD_HASH_MAX_QUEUE)
+
+metrics.register("password_hashing", password_hasher.stats)
@@ -0,0 +1,337 @@
+import asyncio
+import datetime
+import json
+import math
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, func, select
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.security import api_token_cache, principal_cache, token_fingerprint
+from app.db.database import AsyncSessionLocal, ReadSessionLocal, SessionLocal, engine, upsert_insert
+from app.models.utility import RateLimitRecord
+
+# Counter per (identifier, slug): [window index, count in that window, count in the window before]
+Counter = List[int]
+
+
+@dataclass(frozen=True)
+class RateLimitDecision:
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: int = 0
+
+
+def window_start(index: int, window: int) -> datetime.datetime:
+    return datetime.datetime.utcfromtimestamp(index * window)
+
+
+def sliding_count(current: int, previous: int, elapsed: float) -> float:
+    """Requests in the last window, weighting the previous fixed window by how much of it still overlaps."""
+    return previous * (1 - elapsed) + current
+
+
+def decide(current: int, previous: int, limit: int, elapsed: float, window: int) -> RateLimitDecision:
+    """Whether one more request fits, given fixed window counts and the elapsed fraction of the current window."""
+    used = sliding_count(current, previous, elapsed)
+    if used + 1 <= limit:
+        return RateLimitDecision(True, limit, int(limit - used - 1))
+    if current + 1 <= limit and previous:
+        # Wait until enough of the previous window has slid out
+        wait = (used + 1 - limit) / previous * window
+    else:
+        wait = (1 - elapsed) * window
+    return RateLimitDecision(False, limit, 0, max(1, math.ceil(wait)))
+
+
+class RateLimiter:
+    """Sliding window rate limits per identifier and slug, with limits set per subscription tier.
+
+    Counters live in memory, so a check costs a dict lookup. They are snapshotted to
+    rate_limit_records periodically, one row per identifier, slug and window, and reloaded
+    on startup. With the database backend, counters are kept in that table with atomic
+    upserts instead, so several workers share one limit.
+    """
+
+    def __init__(self, window: int, limits: Dict[str, Dict[str, int]], backend: str):
+        self.window = window
+        self.limits = limits
+        self.backend = backend
+        self._counters: Dict[Tuple[str, str], Counter] = {}
+        # Counters changed since the last snapshot, by identifier, slug and window index
+        self._dirty: Dict[Tuple[str, str, int], Counter] = {}
+        self._task: Optional["asyncio.Task[None]"] = None
+        self.allowed = 0
+        self.limited = 0
+        self.snapshots = 0
+        self.failed = 0
+
+    def limit_for(self, tier: str, slug: str) -> int:
+        tier_limits = self.limits.get(tier) or self.limits.get("free", {})
+        return tier_limits.get(slug, tier_limits.get("default", 0))
+
+    def _position(self, now: float) -> Tuple[int, float]:
+        index = int(now // self.window)
+        return index, (now - index * self.window) / self.window
+
+    def hit(self, identifier: str, slug: str, limit: int, now: Optional[float] = None) -> RateLimitDecision:
+        """Count a request against the in-memory counters if it fits the limit."""
+        index, elapsed = self._position(time.time() if now is None else now)
+        key = (identifier, slug)
+        counter = self._counters.get(key)
+        if counter is None or counter[0] < index - 1:
+            counter = [index, 0, 0]
+        elif counter[0] == index - 1:
+            counter = [index, 0, counter[1]]
+        decision = decide(counter[1], counter[2], limit, elapsed, self.window)
+        if decision.allowed:
+            counter[1] += 1
+            self._dirty[(identifier, slug, index)] = counter
+        if len(self._counters) >= settings.RATE_LIMIT_MAX_KEYS and key not in self._counters:
+            self.prune(index)
+        self._counters[key] = counter
+        return decision
+
+    async def ahit(self, identifier: str, slug: str, limit: int, now: Optional[float] = None) -> RateLimitDecision:
+        """Count a request against counters shared through the database, atomically."""
+        index, elapsed = self._position(time.time() if now is None else now)
+        current_start, previous_start = window_start(index, self.window), window_start(index - 1, self.window)
+        async with AsyncSessionLocal() as db:
+            def count_in(start: datetime.datetime):
+                return select(RateLimitRecord.count).where(
+                    RateLimitRecord.identifier == identifier,
+                    RateLimitRecord.slug == slug,
+                    RateLimitRecord.window_start == start,
+                )
+
+            previous = (await db.execute(count_in(previous_start))).scalar() or 0
+            # The previous window is closed, so the current one may take whatever it leaves
+            allowance = limit - previous * (1 - elapsed)
+            current = None
+            if allowance >= 1:
+                insert = upsert_insert(db.bind.dialect.name)
+                statement = insert(RateLimitRecord).values(
+                    identifier=identifier, slug=slug, window_start=current_start, count=1
+                )
+                statement = statement.on_conflict_do_update(
+                    index_elements=["identifier", "slug", "window_start"],
+                    set_={"count": RateLimitRecord.count + 1, "updated_at": func.now()},
+                    where=RateLimitRecord.count + 1 <= allowance,
+                ).returning(RateLimitRecord.count)
+                current = (await db.execute(statement)).scalar()
+            if current is None:
+                # Over the limit, nothing was counted
+                rejected_count = (await db.execute(count_in(current_start))).scalar() or 0
+            await db.commit()
+        if current is None:
+            return decide(rejected_count, previous, limit, elapsed, self.window)
+        return RateLimitDecision(True, limit, max(0, int(limit - sliding_count(current, previous, elapsed))))
+
+    async def check(self, identifier: str, tier: str, slug: str) -> Optional[RateLimitDecision]:
+        """Decide a request. Returns None when the slug is not limited for the tier."""
+        limit = self.limit_for(tier, slug)
+        if limit <= 0:
+            return None
+        if self.backend == "database":
+            decision = await self.ahit(identifier, slug, limit)
+        else:
+            decision = self.hit(identifier, slug, limit)
+        if decision.allowed:
+            self.allowed += 1
+        else:
+            self.limited += 1
+        return decision
+
+    def prune(self, index: Optional[int] = None) -> int:
+        """Forget counters with no requests in the current or previous window."""
+        if index is None:
+            index, _ = self._position(time.time())
+        stale = [key for key, counter in self._counters.items() if counter[0] < index - 1]
+        for key in stale:
+            del self._counters[key]
+        return len(stale)
+
+    def snapshot(self, dirty: Dict[Tuple[str, str, int], Counter]) -> int:
+        """Write counters to rate_limit_records and drop expired rows. Returns rows written."""
+        db = SessionLocal()
+        try:
+            if dirty:
+                insert = upsert_insert(engine.dialect.name)
+                rows = [
+                    {"identifier": identifier, "slug": slug, "window_start": window_start(index, self.window), "count": counter[1]}
+                    for (identifier, slug, index), counter in dirty.items()
+                ]
+                statement = insert(RateLimitRecord).values(rows)
+                db.execute(statement.on_conflict_do_update(
+                    index_elements=["identifier", "slug", "window_start"],
+                    set_={"count": statement.excluded.count, "updated_at": func.now()},
+                ))
+            cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=settings.RATE_LIMIT_RETENTION_DAYS)
+            db.execute(delete(RateLimitRecord).where(RateLimitRecord.window_start < cutoff))
+            db.commit()
+            self.snapshots += 1
+            return len(dirty)
+        finally:
+            db.close()
+
+    def _recent_records(self, index: int) -> List[RateLimitRecord]:
+        db = ReadSessionLocal()
+        try:
+            return db.query(RateLimitRecord).filter(
+                RateLimitRecord.window_start >= window_start(index - 1, self.window)
+            ).all()
+        finally:
+            db.close()
+
+    def _merge(self, index: int, records: List[RateLimitRecord]) -> int:
+        for record in records:
+            record_index = int(record.window_start.replace(tzinfo=datetime.timezone.utc).timestamp() // self.window)
+            counter = self._counters.setdefault((record.identifier, record.slug), [index, 0, 0])
+            if record_index == index:
+                counter[1] = max(counter[1], record.count)
+            else:
+                counter[2] = max(counter[2], record.count)
+        return len(records)
+
+    def restore(self) -> int:
+        """Reload counters of the current and previous window, so a restart does not reset limits."""
+        index, _ = self._position(time.time())
+        return self._merge(index, self._recent_records(index))
+
+    async def flush(self) -> None:
+        self.prune()
+        dirty = {key: list(counter) for key, counter in self._dirty.items()}
+        self._dirty.clear()
+        try:
+            await run_in_threadpool(self.snapshot, dirty)
+        except Exception:
+            # Keep them for the next snapshot
+            for key, counter in dirty.items():
+                self._dirty.setdefault(key, counter)
+            self.failed += 1
+
+    def start(self) -> None:
+        if self._task or not settings.RATE_LIMIT_ENABLED:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self.backend == "memory":
+            await self.flush()
+
+    async def _run(self) -> None:
+        if self.backend == "memory":
+            # Restore in the background so startup does not wait on it, merging into counts made meanwhile
+            index, _ = self._position(time.time())
+            try:
+                self._merge(index, await run_in_threadpool(self._recent_records, index))
+            except Exception:
+                self.failed += 1
+        while True:
+            await asyncio.sleep(settings.RATE_LIMIT_SNAPSHOT_SECONDS)
+            if self.backend == "memory":
+                await self.flush()
+            else:
+                try:
+                    await run_in_threadpool(self.snapshot, {})
+                except Exception:
+                    self.failed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "keys": len(self._counters),
+            "allowed": self.allowed,
+            "limited": self.limited,
+            "snapshots": self.snapshots,
+            "failed": self.failed,
+        }
+
+
+def identify(scope) -> Tuple[str, str]:
+    """Identifier and subscription tier of a request, from cached credentials only."""
+    for name, value in scope["headers"]:
+        if name == b"authorization" and value[:7].lower() == b"bearer ":
+            fingerprint = token_fingerprint(value[7:].decode("latin-1"))
+            # Peek, so the limiter's lookups do not skew the caches' LRU order and hit rates
+            principal = principal_cache.peek(fingerprint) or (api_token_cache.peek(fingerprint) or (None, None))[1]
+            if principal is not None:
+                return f"user:{principal.id}", principal.tier
+            # Unknown until authenticated, so charge the address, or every new token would get a fresh limit
+            break
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}", "free"
+
+
+def request_slug(method: str, path: str) -> Optional[str]:
+    """Slug a request counts against, e.g. chat for reads and chat:write for writes under /api/chat."""
+    if not path.startswith(settings.API_V1_STR + "/"):
+        return None
+    base = path[len(settings.API_V1_STR) + 1:].split("/", 1)[0] or "root"
+    return base if method in ("GET", "HEAD", "OPTIONS") else f"{base}:write"
+
+
+class RateLimitMiddleware:
+    """Reject requests over their rate limit with 429, without touching the database."""
+
+    def __init__(self, app, limiter: Optional[RateLimiter] = None):
+        self.app = app
+        self.limiter = limiter or rate_limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.RATE_LIMIT_ENABLED:
+            return await self.app(scope, receive, send)
+        slug = request_slug(scope["method"], scope["path"])
+        if slug is None:
+            return await self.app(scope, receive, send)
+        identifier, tier = identify(scope)
+        decision = await self.limiter.check(identifier, tier, slug)
+        if decision is None:
+            return await self.app(scope, receive, send)
+
+        headers = [
+            (b"x-ratelimit-limit", str(decision.limit).encode()),
+            (b"x-ratelimit-remaining", str(decision.remaining).encode()),
+        ]
+        if not decision.allowed:
+            body = json.dumps({"detail": "Rate limit exceeded, please retry later"}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": headers + [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(decision.retry_after).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": list(message.get("headers", [])) + headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+rate_limiter = RateLimiter(
+    window=settings.RATE_LIMIT_WINDOW_SECONDS,
+    limits=settings.RATE_LIMITS,
+    backend=settings.RATE_LIMIT_BACKEND,
+)
+
+metrics.register("rate_limiter", rate_limiter.stats)
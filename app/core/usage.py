@@ -0,0 +1,224 @@
+import asyncio
+import datetime
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from app.core import metrics
+from app.core.config import settings
+from app.db.database import SessionLocal, engine, upsert_insert
+from app.models.utility import UsageCounter
+
+logger = logging.getLogger(__name__)
+
+DAY_SECONDS = 24 * 60 * 60
+
+
+def bucket_start(index: int, bucket_seconds: int) -> datetime.datetime:
+    return datetime.datetime.utcfromtimestamp(index * bucket_seconds)
+
+
+def _add_counts(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """Upsert counter rows, adding to the count of rows that exist."""
+    insert = upsert_insert(engine.dialect.name)
+    statement = insert(UsageCounter).values(rows)
+    db.execute(statement.on_conflict_do_update(
+        index_elements=["user_id", "slug", "bucket_seconds", "bucket_start"],
+        set_={"count": UsageCounter.count + statement.excluded.count, "updated_at": func.now()},
+    ))
+
+
+class UsageAccountant:
+    """Counts requests per user and slug in memory and writes them behind, in batches.
+
+    Counts are kept per time bucket of bucket_seconds and added to usage_counters with
+    upserts every flush interval, so a request costs a dict update instead of an INSERT.
+    Buckets older than the retention are rolled up into day buckets. Usage lookups sum
+    the stored buckets and the counts not flushed yet, including those of a flush in progress.
+    """
+
+    def __init__(self, bucket_seconds: int, flush_interval: float, batch_size: int):
+        self.bucket_seconds = bucket_seconds
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._pending: Dict[Tuple[int, str, int], int] = {}
+        # Counts being written by the flush in progress, until its commit lands
+        self._flushing: Dict[Tuple[int, str, int], int] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._next_rollup = 0.0
+        self.recorded = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self.rolled_up = 0
+        self.failed = 0
+
+    def record(self, user_id: int, slug: str, count: int = 1, now: Optional[float] = None) -> None:
+        index = int((time.time() if now is None else now) // self.bucket_seconds)
+        key = (user_id, slug, index)
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + count
+            self.recorded += count
+
+    def _pending_usage(self, user_id: int, since: datetime.datetime, slug: Optional[str]) -> Dict[str, int]:
+        usage: Dict[str, int] = {}
+        with self._lock:
+            pending = list(self._pending.items()) + list(self._flushing.items())
+        for (pending_user_id, pending_slug, index), count in pending:
+            if pending_user_id != user_id or (slug is not None and pending_slug != slug):
+                continue
+            if bucket_start(index, self.bucket_seconds) >= since:
+                usage[pending_slug] = usage.get(pending_slug, 0) + count
+        return usage
+
+    def usage(self, db: Session, user_id: int, since: datetime.datetime, slug: Optional[str] = None) -> Dict[str, int]:
+        """Requests per slug in buckets starting at or after since, including unflushed counts.
+
+        Exact to the bucket within the retention period, to the day before it. Unflushed counts
+        are read first, so a flush committing meanwhile may be counted twice but never missed.
+        """
+        pending = self._pending_usage(user_id, since, slug)
+        query = select(UsageCounter.slug, func.sum(UsageCounter.count)).where(
+            UsageCounter.user_id == user_id, UsageCounter.bucket_start >= since
+        )
+        if slug is not None:
+            query = query.where(UsageCounter.slug == slug)
+        usage = {row_slug: int(count) for row_slug, count in db.execute(query.group_by(UsageCounter.slug))}
+        for pending_slug, count in pending.items():
+            usage[pending_slug] = usage.get(pending_slug, 0) + count
+        return usage
+
+    def remaining_quota(self, db: Session, user_id: int, tier: str, slug: str) -> Optional[int]:
+        """Requests left of the tier's daily quota for slug, over the last 24 hours. None when unlimited."""
+        quota = settings.USAGE_DAILY_QUOTAS.get(tier, {}).get(slug)
+        if quota is None:
+            return None
+        since = datetime.datetime.utcnow() - datetime.timedelta(days=1)
+        return max(0, quota - self.usage(db, user_id, since, slug).get(slug, 0))
+
+    def flush(self) -> int:
+        """Add buffered counts to usage_counters. Returns the number of rows written."""
+        with self._flush_lock:
+            return self._flush()
+
+    def _flush(self) -> int:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flushing = pending
+        if not pending:
+            return 0
+        rows = [
+            {
+                "user_id": user_id,
+                "slug": slug,
+                "bucket_seconds": self.bucket_seconds,
+                "bucket_start": bucket_start(index, self.bucket_seconds),
+                "count": count,
+            }
+            for (user_id, slug, index), count in pending.items()
+        ]
+        db = SessionLocal()
+        try:
+            for offset in range(0, len(rows), self.batch_size):
+                _add_counts(db, rows[offset:offset + self.batch_size])
+            db.commit()
+            with self._lock:
+                self._flushing = {}
+            self.flushes += 1
+            self.rows_written += len(rows)
+            return len(rows)
+        except Exception:
+            # Add them back to counts recorded meanwhile, retry on the next flush
+            with self._lock:
+                for key, count in pending.items():
+                    self._pending[key] = self._pending.get(key, 0) + count
+                self._flushing = {}
+            self.failed += 1
+            raise
+        finally:
+            db.close()
+
+    def rollup(self, retention_hours: int) -> int:
+        """Fold buckets of days wholly older than the retention into day buckets. Returns buckets folded."""
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(hours=retention_hours)
+        cutoff = cutoff.replace(hour=0, minute=0, second=0, microsecond=0)
+        total = 0
+        db = SessionLocal()
+        try:
+            while True:
+                buckets = db.execute(
+                    select(UsageCounter.id, UsageCounter.user_id, UsageCounter.slug, UsageCounter.bucket_start, UsageCounter.count)
+                    .where(UsageCounter.bucket_seconds < DAY_SECONDS, UsageCounter.bucket_start < cutoff)
+                    .limit(self.batch_size)
+                ).all()
+                if not buckets:
+                    return total
+                days: Dict[Tuple[int, str, datetime.datetime], int] = {}
+                for _, user_id, slug, start, count in buckets:
+                    key = (user_id, slug, start.replace(hour=0, minute=0, second=0, microsecond=0))
+                    days[key] = days.get(key, 0) + count
+                # Add the day buckets and drop the folded ones in one transaction
+                _add_counts(db, [
+                    {"user_id": user_id, "slug": slug, "bucket_seconds": DAY_SECONDS, "bucket_start": day, "count": count}
+                    for (user_id, slug, day), count in days.items()
+                ])
+                db.execute(delete(UsageCounter).where(UsageCounter.id.in_([bucket[0] for bucket in buckets])))
+                db.commit()
+                total += len(buckets)
+                self.rolled_up += len(buckets)
+        finally:
+            db.close()
+
+    def start(self) -> None:
+        if self._task:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        # Write what is left before shutting down
+        await run_in_threadpool(self.flush)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await run_in_threadpool(self.flush)
+                if time.monotonic() >= self._next_rollup:
+                    self._next_rollup = time.monotonic() + settings.USAGE_ROLLUP_INTERVAL_SECONDS
+                    await run_in_threadpool(self.rollup, settings.USAGE_BUCKET_RETENTION_HOURS)
+            except Exception:
+                # Counts stay buffered, retry on the next interval
+                logger.exception("Failed to write usage counts")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._pending),
+            "recorded": self.recorded,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "rolled_up": self.rolled_up,
+            "failed": self.failed,
+        }
+
+
+usage_accountant = UsageAccountant(
+    bucket_seconds=settings.USAGE_BUCKET_SECONDS,
+    flush_interval=settings.USAGE_FLUSH_SECONDS,
+    batch_size=settings.USAGE_FLUSH_BATCH_SIZE,
+)
+
+metrics.register("usage", usage_accountant.stats)
@@ -1,23 +1,401 @@
-from sqlalchemy import create_engine
+import asyncio
+import contextvars
+import threading
+import warnings
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Tuple, Union
+
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import configure_mappers, sessionmaker
+from sqlalchemy.util import await_only
 
+from app.core import metrics
 from app.core.config import settings
 
-# Create SQLite engine
-engine = create_engine(settings.DATABASE_URL, connect_args={"check_same_thread": False})
+# Async drivers for database URLs that name a sync driver (or none)
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+
+def async_database_url(database_url: str) -> str:
+    """The async equivalent of a database URL, e.g. sqlite:// -> sqlite+aiosqlite://."""
+    url = make_url(database_url)
+    if url.get_dialect().is_async:
+        return database_url
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver configured for {url.get_backend_name()} databases")
+    return url.set(drivername=driver).render_as_string(hide_password=False)
+
+
+def upsert_insert(dialect: str):
+    """insert() of a dialect with on_conflict_do_update, for postgresql or sqlite."""
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+def is_sqlite_file(database_url: str) -> bool:
+    url = make_url(database_url)
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+
+
+def _sqlite_pragmas(read_only: bool):
+    """Connect hook tuning SQLite connections for concurrent readers and a single writer."""
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # Readers see the last commit instead of waiting on the writer
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KB}")
+        cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+    return on_connect
+
+
+def _grant(future: "asyncio.Future[None]") -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class WriterQueue:
+    """Turns at the SQLite write lock, first come first served, for threads and coroutines alike.
+
+    The sync and the async writer engine each have one connection, which holds the turn from
+    checkout to checkin, so their writers queue here together instead of contending for the
+    database lock.
+    """
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._held = False
+        self._waiters: Deque[Union[threading.Event, Tuple[asyncio.AbstractEventLoop, "asyncio.Future[None]"]]] = deque()
+        self.turns = 0
+        self.waits = 0
+        self.timeouts = 0
+
+    def _try_take(self) -> bool:
+        if self._held:
+            return False
+        self._held = True
+        self.turns += 1
+        return True
+
+    def _give_up(self, waiter) -> bool:
+        """Leave the queue after a timeout or cancellation. False if the turn was handed over meanwhile."""
+        with self._lock:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+                return True
+        return False
+
+    def _timed_out(self) -> PoolTimeoutError:
+        self.timeouts += 1
+        return PoolTimeoutError(f"Waited over {self.timeout}s for the SQLite writer")
+
+    def acquire(self) -> None:
+        """Wait for the turn in a thread."""
+        with self._lock:
+            if self._try_take():
+                return
+            waiter = threading.Event()
+            self._waiters.append(waiter)
+            self.waits += 1
+        if not waiter.wait(self.timeout) and self._give_up(waiter):
+            raise self._timed_out()
+
+    async def acquire_async(self) -> None:
+        """Wait for the turn on the event loop, without blocking it."""
+        with self._lock:
+            if self._try_take():
+                return
+            loop = asyncio.get_running_loop()
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+            self.waits += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter[1]), self.timeout)
+        except asyncio.TimeoutError:
+            if self._give_up(waiter):
+                raise self._timed_out()
+        except BaseException:
+            # Cancelled. A turn handed over meanwhile goes to the next writer
+            if not self._give_up(waiter):
+                self.release()
+            raise
 
-# Create session factory
+    def release(self) -> None:
+        """Hand the turn to the next writer waiting, if any."""
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                self.turns += 1
+                if isinstance(waiter, threading.Event):
+                    waiter.set()
+                    return
+                loop, future = waiter
+                try:
+                    loop.call_soon_threadsafe(_grant, future)
+                    return
+                except RuntimeError:
+                    # Its event loop is closed
+                    continue
+            self._held = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {"held": self._held, "waiting": len(self._waiters), "turns": self.turns, "waits": self.waits, "timeouts": self.timeouts}
+
+
+def _queue_writes(writer_engine: Engine, queue: WriterQueue, is_async: bool) -> None:
+    """Take a turn in the writer queue when the engine's connection is checked out, give it back at checkin."""
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        if is_async:
+            await_only(queue.acquire_async())
+        else:
+            queue.acquire()
+        connection_record.info["writer_turn"] = True
+
+    def on_checkin(dbapi_connection, connection_record):
+        # Not set when the checkout failed waiting
+        if connection_record.info.pop("writer_turn", False):
+            queue.release()
+
+    event.listen(writer_engine, "checkout", on_checkout)
+    event.listen(writer_engine, "checkin", on_checkin)
+
+
+sqlite_production = settings.SQLITE_PRODUCTION_MODE and is_sqlite_file(settings.DATABASE_URL)
+
+if sqlite_production:
+    # One writer connection. Writers queue for it in the pool instead of contending for the
+    # database lock, and reads go to a separate pool of read-only connections.
+    engine = create_engine(
+        settings.DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=settings.SQLITE_WRITE_QUEUE_TIMEOUT_SECONDS,
+    )
+    read_engine = create_engine(
+        settings.DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        pool_size=settings.SQLITE_READ_POOL_SIZE,
+        max_overflow=0,
+    )
+    event.listen(engine, "connect", _sqlite_pragmas(read_only=False))
+    event.listen(read_engine, "connect", _sqlite_pragmas(read_only=True))
+else:
+    # Create SQLite engine
+    engine = create_engine(settings.DATABASE_URL, connect_args={"check_same_thread": False})
+    read_engine = engine
+
+# Create session factories, ReadSessionLocal for queries that never write
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# Async engines and session factories for async endpoints. Objects stay usable after commit,
+# since lazy loading is not available outside the session's greenlet.
+if sqlite_production:
+    # One async writer connection too, which queues with the sync one for the write lock
+    async_engine = create_async_engine(
+        async_database_url(settings.DATABASE_URL),
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=settings.SQLITE_WRITE_QUEUE_TIMEOUT_SECONDS,
+    )
+    async_read_engine = create_async_engine(
+        async_database_url(settings.DATABASE_URL),
+        pool_size=settings.SQLITE_READ_POOL_SIZE,
+        max_overflow=0,
+    )
+    event.listen(async_engine.sync_engine, "connect", _sqlite_pragmas(read_only=False))
+    event.listen(async_read_engine.sync_engine, "connect", _sqlite_pragmas(read_only=True))
+    writer_queue: Optional[WriterQueue] = WriterQueue(settings.SQLITE_WRITE_QUEUE_TIMEOUT_SECONDS)
+    _queue_writes(engine, writer_queue, is_async=False)
+    _queue_writes(async_engine.sync_engine, writer_queue, is_async=True)
+    metrics.register("sqlite_writer_queue", writer_queue.stats)
+else:
+    async_engine = create_async_engine(async_database_url(settings.DATABASE_URL))
+    async_read_engine = async_engine
+    writer_queue = None
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
 
 # Create base class for models
 Base = declarative_base()
 
 
-def get_db():
-    """Get database session."""
+# Requests whose get_db session is read-only
+READ_METHODS = ("GET", "HEAD")
+
+
+def get_db(request: Request):
+    """Get database session. GET and HEAD requests get a read-only one, see get_write_db."""
+    db = ReadSessionLocal() if request.method in READ_METHODS else SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_write_db():
+    """Get database session on the writer, for GET endpoints that write."""
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """Get async database session, on the writer from its first statement until commit or close."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_async_read_db() -> AsyncIterator[AsyncSession]:
+    """Get read-only async database session."""
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+
+def warm_up_connections() -> None:
+    """Configure the ORM mappers and open the pooled connections, so the first requests skip both."""
+    configure_mappers()
+    with engine.connect():
+        pass
+    if read_engine is not engine:
+        connections = [read_engine.connect() for _ in range(settings.SQLITE_READ_POOL_SIZE)]
+        for connection in connections:
+            connection.close()
+
+
+async def async_warm_up_connections() -> None:
+    async with async_engine.connect():
+        pass
+    if async_read_engine is not async_engine:
+        connections = [await async_read_engine.connect() for _ in range(settings.SQLITE_READ_POOL_SIZE)]
+        for connection in connections:
+            await connection.close()
+
+
+class SyncDatabaseGuardWarning(RuntimeWarning):
+    """Sync database query run on the event loop while serving a request."""
+
+
+class SyncDatabaseGuardError(RuntimeError):
+    """Raised instead of warning when the guard mode is "raise"."""
+
+
+class SqlStatementBudgetWarning(RuntimeWarning):
+    """Request issued more SQL statements than SQL_STATEMENT_BUDGET, e.g. lazy loads per row."""
+
+
+class SqlStatementBudgetError(RuntimeError):
+    """Raised instead of warning when the statement guard mode is "raise"."""
+
+
+# Set while a request is served, see app.main
+in_request: contextvars.ContextVar[bool] = contextvars.ContextVar("in_request", default=False)
+
+sync_db_guard_stats: Dict[str, Any] = {"violations": 0, "last_statement": None}
+
+
+class _RequestStatements:
+    """SQL statements issued while serving one request."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+
+
+request_statements: contextvars.ContextVar[Optional[_RequestStatements]] = contextvars.ContextVar(
+    "request_statements", default=None
+)
+
+sql_statement_guard_stats: Dict[str, Any] = {"over_budget": 0, "last_path": None, "last_statement": None}
+
+
+def _guard_sync_db_on_event_loop(conn, cursor, statement, parameters, context, executemany):
+    """Flag sync engine queries issued from the event loop thread, which stall every request."""
+    if settings.SYNC_DB_GUARD == "off" or not in_request.get():
+        return
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        # Worker thread, e.g. a sync endpoint or run_in_threadpool
+        return
+    sync_db_guard_stats["violations"] += 1
+    sync_db_guard_stats["last_statement"] = statement[:200]
+    message = f"Sync database query on the event loop: {statement[:200]}"
+    if settings.SYNC_DB_GUARD == "raise":
+        raise SyncDatabaseGuardError(message)
+    warnings.warn(message, SyncDatabaseGuardWarning, stacklevel=2)
+
+
+def _guard_request_statements(conn, cursor, statement, parameters, context, executemany):
+    """Flag requests issuing more statements than the budget, typically an N+1 of lazy loads."""
+    statements = request_statements.get()
+    if statements is None or settings.SQL_STATEMENT_GUARD == "off":
+        return
+    statements.count += 1
+    if statements.count <= settings.SQL_STATEMENT_BUDGET:
+        return
+    message = (
+        f"{statements.path} issued more than {settings.SQL_STATEMENT_BUDGET} SQL statements, "
+        f"the last one: {statement[:200]}"
+    )
+    first = statements.count == settings.SQL_STATEMENT_BUDGET + 1
+    if first:
+        sql_statement_guard_stats["over_budget"] += 1
+        sql_statement_guard_stats["last_path"] = statements.path
+        sql_statement_guard_stats["last_statement"] = statement[:200]
+    if settings.SQL_STATEMENT_GUARD == "raise":
+        raise SqlStatementBudgetError(message)
+    if first:
+        # Warn once per request
+        warnings.warn(message, SqlStatementBudgetWarning, stacklevel=2)
+
+
+event.listen(engine, "before_cursor_execute", _guard_sync_db_on_event_loop)
+if read_engine is not engine:
+    event.listen(read_engine, "before_cursor_execute", _guard_sync_db_on_event_loop)
+for guarded_engine in {engine, read_engine, async_engine.sync_engine, async_read_engine.sync_engine}:
+    event.listen(guarded_engine, "before_cursor_execute", _guard_request_statements)
+
+
+class SyncDatabaseGuardMiddleware:
+    """Mark requests so the guards can tell request handling from startup work, and count their statements."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        token = in_request.set(True)
+        statements_token = request_statements.set(_RequestStatements(f"{scope['method']} {scope['path']}"))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_statements.reset(statements_token)
+            in_request.reset(token)
+
+
+metrics.register("sync_db_guard", lambda: dict(sync_db_guard_stats))
+metrics.register("sql_statement_guard", lambda: dict(sql_statement_guard_stats))
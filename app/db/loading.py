@@ -0,0 +1,31 @@
+"""Eager loading policy for queries whose objects end up in responses.
+
+Response schemas read relationships as attributes, so serializing N objects lazy loads
+each relationship N times. Endpoints pass the relationships they serialize or touch to
+eager(), which loads them up front and makes any other lazy load raise, so a
+relationship added to a schema fails loudly instead of adding N queries:
+
+    db.query(Entry).options(*eager(Entry.dates))
+    select(Agent).options(*eager(joinedload(Agent.chat_model).joinedload(ChatModel.ai_model_api)))
+"""
+from typing import List, Union
+
+from sqlalchemy.orm import joinedload, raiseload, selectinload
+from sqlalchemy.orm.attributes import QueryableAttribute
+from sqlalchemy.orm.interfaces import LoaderOption
+
+
+def eager(*loads: Union[QueryableAttribute, LoaderOption]) -> List[LoaderOption]:
+    """Loader options for the given relationships, raising on any other lazy load.
+
+    Collections are loaded with selectinload, one extra query for all rows, and single
+    objects with joinedload. Loader options are passed through, e.g. for nested paths.
+    Lazy loads that find their object in the session without a query are still allowed.
+    """
+    options: List[LoaderOption] = []
+    for load in loads:
+        if isinstance(load, QueryableAttribute):
+            load = selectinload(load) if load.property.uselist else joinedload(load)
+        options.append(load)
+    options.append(raiseload("*", sql_only=True))
+    return options
@@ -0,0 +1,65 @@
+"""Create or upgrade the database schema to the latest migration.
+
+The app no longer creates tables when it is imported, so run this on deploy, before
+starting the workers:
+
+    python -m app.db.migrate
+
+Databases created by create_all before migrations existed are stamped first, at the
+latest revision create_all reproduces when they already match the models and at the
+baseline otherwise, and then upgraded.
+"""
+from pathlib import Path
+
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import inspect
+
+import app.models  # noqa: F401, registers the models on Base.metadata
+from app.db.database import Base, engine
+
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+
+# Revision matching the tables create_all made before migrations existed
+BASELINE_REVISION = "0001"
+# Latest revision whose schema create_all makes from the models. Later ones, like the chat
+# search index, create tables the models do not describe
+MODELS_REVISION = "0005"
+
+
+def include_name(name, type_, parent_names) -> bool:
+    # The chat search index is an FTS5 table, which autogenerate cannot compare
+    if type_ == "table":
+        return not (name or "").startswith("chat_message_fts")
+    return True
+
+
+def alembic_config(configure_logger: bool = False) -> Config:
+    config = Config(str(ALEMBIC_INI))
+    # Keep the app's logging setup unless run from the command line
+    config.attributes["configure_logger"] = configure_logger
+    return config
+
+
+def unversioned_revision() -> str:
+    """Revision to stamp a database with no alembic_version table, or "" when it is versioned or empty."""
+    with engine.connect() as connection:
+        tables = [name for name in inspect(connection).get_table_names() if include_name(name, "table", {})]
+        if not tables or "alembic_version" in tables:
+            return ""
+        context = MigrationContext.configure(connection, opts={"include_name": include_name})
+        return MODELS_REVISION if not compare_metadata(context, Base.metadata) else BASELINE_REVISION
+
+
+def migrate(revision: str = "head", configure_logger: bool = False) -> None:
+    config = alembic_config(configure_logger)
+    stamp = unversioned_revision()
+    if stamp:
+        command.stamp(config, stamp)
+    command.upgrade(config, revision)
+
+
+if __name__ == "__main__":
+    migrate(configure_logger=True)
@@ -0,0 +1,142 @@
+"""Check that the queries endpoints and background jobs run use indexes.
+
+Runs EXPLAIN QUERY PLAN for each query in HOT_QUERIES against the configured SQLite
+database and reports the ones that scan a whole table. Migrate the database first:
+
+    alembic upgrade head && python -m app.db.query_plans
+
+Exits with status 1 when any query scans. tests/test_query_plans.py checks these and,
+so the list cannot drift from the code, the statements the endpoints and jobs actually
+run, recorded with capture_statements().
+"""
+import datetime
+import re
+import sys
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Tuple, Union
+
+from sqlalchemy import event, func, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.sql import Executable
+
+from app.db.database import engine
+from app.models import (
+    Agent, ConfigVersion, Conversation, Entry, EntryDates, FileObject, GithubConfig, GithubRepoConfig, KhojApiUser, KhojUser, NotionConfig,
+    PublicConversation, RateLimitRecord, SearchModelConfig, Subscription, UsageCounter,
+)
+
+_now = datetime.datetime(2026, 1, 1)
+
+# Filters as the endpoints and jobs issue them, with placeholder values
+HOT_QUERIES = {
+    "agents: public agents": select(Agent).where(Agent.privacy_level == "public", Agent.is_hidden == False),
+    "agents: private agents": select(Agent).where(Agent.creator_id == 1, Agent.is_hidden == False),
+    "agents: agent": select(Agent).where(Agent.id == 1),
+    "agents: conversations of agent": select(Conversation.id).where(Conversation.agent_id == 1),
+    "agents: entries of agent": select(Entry).where(Entry.agent_id == 1),
+    "agents: files of agent": select(FileObject).where(FileObject.agent_id == 1),
+    "auth: user by username": select(KhojUser).where(KhojUser.username == "user"),
+    "auth: user by email": select(KhojUser).where(KhojUser.email == "user@example.com"),
+    "auth: api tokens of user": select(KhojApiUser).where(KhojApiUser.user_id == 1),
+    "auth: api token by hash": select(KhojApiUser).where(KhojApiUser.token_hash == "hash"),
+    "auth: subscription": select(Subscription).where(Subscription.user_id == 1),
+    "chat: conversations of user": select(Conversation).where(Conversation.user_id == 1),
+    "chat: recent conversations": select(Conversation).where(Conversation.user_id == 1).order_by(Conversation.updated_at.desc()),
+    "chat: conversation": select(Conversation).where(Conversation.id == "id", Conversation.user_id == 1),
+    "chat: shared conversation": select(PublicConversation).where(PublicConversation.slug == "slug"),
+    "chat: export": select(Conversation).where(Conversation.user_id == 1).order_by(Conversation.created_at, Conversation.id),
+    "archive: idle conversations": select(Conversation.id).where(
+        Conversation.archived_at.is_(None), Conversation.updated_at < _now
+    ).order_by(Conversation.updated_at).limit(200),
+    "config: version": select(ConfigVersion.version).where(ConfigVersion.id == 1),
+    "content: search model": select(SearchModelConfig).where(SearchModelConfig.name == "default"),
+    "content: entries of user": select(Entry).where(Entry.user_id == 1),
+    "content: entries by file type": select(Entry).where(Entry.user_id == 1, Entry.file_type == "markdown"),
+    "content: entries by file name": select(Entry).where(Entry.user_id == 1, Entry.file_name == "notes.md"),
+    "content: entry by hash": select(Entry).where(Entry.hashed_value == "hash"),
+    "content: entries of file": select(Entry).where(Entry.file_object_id == 1),
+    "content: entry dates": select(EntryDates).where(EntryDates.entry_id.in_([1, 2, 3])),
+    "integrations: notion config": select(NotionConfig).where(NotionConfig.user_id == 1),
+    "integrations: github config": select(GithubConfig).where(GithubConfig.user_id == 1),
+    "integrations: github repos": select(GithubRepoConfig).where(GithubRepoConfig.github_config_id == 1),
+    "rate limit: window count": select(RateLimitRecord.count).where(
+        RateLimitRecord.identifier == "ip:127.0.0.1", RateLimitRecord.slug == "chat", RateLimitRecord.window_start == _now
+    ),
+    "rate limit: restore": select(RateLimitRecord).where(RateLimitRecord.window_start >= _now),
+    "usage: usage of user": select(UsageCounter.slug, func.sum(UsageCounter.count)).where(
+        UsageCounter.user_id == 1, UsageCounter.bucket_start >= _now
+    ).group_by(UsageCounter.slug),
+    "usage: rollup": select(UsageCounter.id).where(
+        UsageCounter.bucket_seconds < 86400, UsageCounter.bucket_start < _now
+    ).limit(500),
+}
+
+
+_WHERE = re.compile(r"\bWHERE\b")
+
+# SQL with its driver parameters, as recorded by capture_statements()
+RecordedStatement = Tuple[str, Any]
+
+
+def explain(connection: Connection, statement: Union[Executable, RecordedStatement]) -> List[str]:
+    """Steps of a statement's query plan, e.g. "SEARCH entries USING INDEX ..."."""
+    if isinstance(statement, tuple):
+        sql, parameters = statement
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", parameters)
+    else:
+        sql = str(statement.compile(connection, compile_kwargs={"literal_binds": True}))
+        rows = connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"))
+    return [row[-1] for row in rows]
+
+
+def _is_scan(step: str) -> bool:
+    # Full-text search walks its own index, reported as a scan of the virtual table
+    return step.startswith("SCAN ") and "CONSTANT ROW" not in step and "VIRTUAL TABLE" not in step
+
+
+def full_scans(
+    connection: Connection, queries: Dict[str, Union[Executable, RecordedStatement]] = HOT_QUERIES
+) -> Dict[str, List[str]]:
+    """Queries that scan a whole table, with the offending plan steps.
+
+    "SCAN t USING INDEX i" walks every row in index order, so it counts as a scan too.
+    """
+    scans = {}
+    for name, statement in queries.items():
+        steps = [step for step in explain(connection, statement) if _is_scan(step)]
+        if steps:
+            scans[name] = steps
+    return scans
+
+
+@contextmanager
+def capture_statements(*engines: Engine) -> Iterator[Dict[str, RecordedStatement]]:
+    """Record the distinct filtered statements run on the engines, keyed and deduplicated by SQL.
+
+    Statements without a WHERE clause read their whole table by design, like loading the
+    configuration, so only filtered SELECT, UPDATE and DELETE statements are kept.
+    """
+    statements: Dict[str, RecordedStatement] = {}
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().split(" ", 1)[0].upper() in ("SELECT", "UPDATE", "DELETE") and _WHERE.search(statement):
+            statements.setdefault(statement, (statement, parameters[0] if executemany else parameters))
+
+    for recorded_engine in engines:
+        event.listen(recorded_engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        for recorded_engine in engines:
+            event.remove(recorded_engine, "before_cursor_execute", record)
+
+
+if __name__ == "__main__":
+    if engine.dialect.name != "sqlite":
+        sys.exit("Query plan checks need a SQLite database")
+    with engine.connect() as connection:
+        scans = full_scans(connection)
+    for name, steps in scans.items():
+        print(f"{name}: {'; '.join(steps)}")
+    print(f"{len(HOT_QUERIES) - len(scans)}/{len(HOT_QUERIES)} queries use indexes")
+    sys.exit(1 if scans else 0)
@@ -1,19 +1,82 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.docs import get_swagger_ui_html
 from fastapi.openapi.utils import get_openapi
 
 from app.api.api import api_router
+from app.core.api_tokens import token_access_recorder, token_revocations
 from app.core.config import settings
-from app.db.database import Base, engine
+from app.core.config_cache import config_cache
+from app.core.password_hashing import password_hasher
+from app.core.rate_limit import RateLimitMiddleware, rate_limiter
+from app.core.usage import usage_accountant
+from app.db.database import SyncDatabaseGuardMiddleware, async_warm_up_connections, warm_up_connections
+from app.processor import tools
+from app.processor.archive import conversation_archiver
+from app.processor.chat_index import chat_indexer
+from app.processor.code_sandbox import code_sandbox
+from app.processor.model_clients import model_clients
+from app.processor.titles import title_generator
+
+
+async def warm_up() -> None:
+    """Start worker processes, open pooled connections and load the config cache while the first requests are served.
+
+    Each of these also starts on first use, so warming up is optional.
+    """
+    password_hasher.start()
+    code_sandbox.start()
+    try:
+        await run_in_threadpool(warm_up_connections)
+        await async_warm_up_connections()
+        await config_cache.aget()
+    except Exception:
+        # Best effort, requests connect on demand anyway
+        pass
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.DATABASE_MIGRATE_ON_STARTUP:
+        # Imported here, so workers of a deploy that migrates separately never load Alembic
+        from app.db.migrate import migrate
+        await run_in_threadpool(migrate)
+    chat_indexer.start()
+    title_generator.start()
+    conversation_archiver.start()
+    token_access_recorder.start()
+    token_revocations.start()
+    usage_accountant.start()
+    rate_limiter.start()
+    config_cache.start()
+    warm_up_task = asyncio.create_task(warm_up()) if settings.STARTUP_WARM_UP else None
+    yield
+    if warm_up_task is not None:
+        warm_up_task.cancel()
+    await config_cache.stop()
+    await rate_limiter.stop()
+    await usage_accountant.stop()
+    await token_revocations.stop()
+    await token_access_recorder.stop()
+    password_hasher.shutdown()
+    await code_sandbox.stop()
+    await conversation_archiver.stop()
+    await title_generator.stop()
+    chat_indexer.stop()
+    # Close pooled HTTP connections
+    await model_clients.aclose()
+    await tools.aclose()
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     docs_url=None,  # Disable default docs
+    lifespan=lifespan,
 )
 
 # Set up CORS middleware
@@ -26,6 +89,12 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_headers=["*"],
     )
 
+# Flag sync database queries made from async endpoints
+app.add_middleware(SyncDatabaseGuardMiddleware)
+
+# Reject requests over their rate limit before they reach an endpoint
+app.add_middleware(RateLimitMiddleware)
+
 # Include API router
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
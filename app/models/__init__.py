@@ -5,10 +5,12 @@ from app.models.ai_models import (
 )
 from app.models.conversation import (
     Agent, UserConversationConfig, UserVoiceModelConfig, 
-    UserTextToImageModelConfig, Conversation, PublicConversation, ReflectiveQuestion
+    UserTextToImageModelConfig, Conversation, ConversationArchive, PublicConversation, ReflectiveQuestion
 )
 from app.models.content import FileObject, Entry, EntryDates
 from app.models.integration import NotionConfig, GithubConfig, GithubRepoConfig, WebScraper
-from app.models.utility import ClientApplication, ProcessLock, UserRequests, RateLimitRecord, DataStore
+from app.models.utility import (
+    ClientApplication, ProcessLock, UserRequests, UsageCounter, RateLimitRecord, DataStore, ConfigVersion
+)
 
 # Import all models here to make them available for Alembic migrations
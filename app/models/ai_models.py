@@ -53,7 +53,7 @@ class SearchModelConfig(Base):
     __tablename__ = "search_model_configs"
 
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, default="default")
+    name = Column(String, default="default", index=True)
     model_type = Column(String, default="text")
     bi_encoder = Column(String, default="thenlper/gte-small")
     bi_encoder_model_config = Column(SQLiteJSON, default=dict)
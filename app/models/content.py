@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime, date
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON, Text, Date
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON, Text, Date, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from sqlalchemy.dialects.sqlite import JSON as SQLiteJSON
@@ -14,7 +14,7 @@ class FileObject(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
-    agent_id = Column(Integer, ForeignKey("agents.id"), nullable=True)
+    agent_id = Column(Integer, ForeignKey("agents.id"), nullable=True, index=True)
     file_name = Column(String, nullable=True)
     raw_text = Column(Text)
     created_at = Column(DateTime, default=func.now())
@@ -29,12 +29,16 @@ class FileObject(Base):
 class Entry(Base):
     """Entry model for search index."""
     __tablename__ = "entries"
+    __table_args__ = (
+        Index("ix_entries_user_id_file_type", "user_id", "file_type"),
+        Index("ix_entries_user_id_file_name", "user_id", "file_name"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
-    agent_id = Column(Integer, ForeignKey("agents.id"), nullable=True)
+    agent_id = Column(Integer, ForeignKey("agents.id"), nullable=True, index=True)
     search_model_id = Column(Integer, ForeignKey("search_model_configs.id"), nullable=True)
-    file_object_id = Column(Integer, ForeignKey("file_objects.id"), nullable=True)
+    file_object_id = Column(Integer, ForeignKey("file_objects.id"), nullable=True, index=True)
     embeddings = Column(Text)  # Serialized vector embeddings
     raw = Column(Text)
     compiled = Column(Text)
@@ -44,7 +48,7 @@ class Entry(Base):
     file_path = Column(String, nullable=True)
     file_name = Column(String, nullable=True)
     url = Column(String, nullable=True)
-    hashed_value = Column(String)
+    hashed_value = Column(String, index=True)
     corpus_id = Column(String)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
@@ -62,7 +66,7 @@ class EntryDates(Base):
     __tablename__ = "entry_dates"
 
     id = Column(Integer, primary_key=True, index=True)
-    entry_id = Column(Integer, ForeignKey("entries.id"))
+    entry_id = Column(Integer, ForeignKey("entries.id"), index=True)
     date = Column(Date)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON, ARRAY
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON, ARRAY, LargeBinary, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from sqlalchemy.dialects.sqlite import JSON as SQLiteJSON
@@ -11,9 +11,10 @@ from app.db.database import Base
 class Agent(Base):
     """Agent model."""
     __tablename__ = "agents"
+    __table_args__ = (Index("ix_agents_privacy_level_is_hidden", "privacy_level", "is_hidden"),)
 
     id = Column(Integer, primary_key=True, index=True)
-    creator_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    creator_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
     name = Column(String)
     personality = Column(String, nullable=True)
     input_tools = Column(SQLiteJSON, default=list)
@@ -24,6 +25,7 @@ class Agent(Base):
     privacy_level = Column(String, default="private")
     is_hidden = Column(Boolean, default=False)
     managed_by_admin = Column(Boolean, default=False)
+    cache_responses = Column(Boolean, default=True)  # Opt out for personalized agents
     slug = Column(String, unique=True)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
@@ -31,28 +33,46 @@ class Agent(Base):
     # Relationships
     creator = relationship("KhojUser", backref="created_agents")
     chat_model = relationship("ChatModel")
-    conversations = relationship("Conversation", back_populates="agent")
+    # Not loaded on delete, delete_agent unlinks them in one UPDATE
+    conversations = relationship("Conversation", back_populates="agent", passive_deletes=True)
 
 
 class Conversation(Base):
     """Conversation model."""
     __tablename__ = "conversations"
+    __table_args__ = (Index("ix_conversations_user_id_updated_at", "user_id", "updated_at"),)
 
     id = Column(String, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     client_id = Column(Integer, ForeignKey("client_applications.id"), nullable=True)
-    agent_id = Column(Integer, ForeignKey("agents.id"), nullable=True)
+    agent_id = Column(Integer, ForeignKey("agents.id"), nullable=True, index=True)
     conversation_log = Column(SQLiteJSON, default=lambda: {"chat": []})
     slug = Column(String, nullable=True)
     title = Column(String, nullable=True)
     file_filters = Column(SQLiteJSON, default=list)
+    version = Column(Integer, nullable=False, default=0)  # Optimistic concurrency counter
+    archived_at = Column(DateTime, nullable=True, index=True)  # Set while the log is in cold storage
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
 
+    __mapper_args__ = {"version_id_col": version}
+
     # Relationships
     user = relationship("KhojUser", backref="conversations")
     agent = relationship("Agent", back_populates="conversations")
     client = relationship("ClientApplication", backref="conversations")
+    archive = relationship("ConversationArchive", uselist=False, cascade="all, delete-orphan")
+
+
+class ConversationArchive(Base):
+    """Compressed conversation log of an inactive conversation."""
+    __tablename__ = "conversation_archives"
+
+    conversation_id = Column(String, ForeignKey("conversations.id"), primary_key=True)
+    log = Column(LargeBinary, nullable=False)  # zlib-compressed JSON
+    raw_bytes = Column(Integer, nullable=False)
+    compressed_bytes = Column(Integer, nullable=False)
+    archived_at = Column(DateTime, default=func.now())
 
 
 class PublicConversation(Base):
@@ -63,8 +83,11 @@ class PublicConversation(Base):
     source_owner_id = Column(Integer, ForeignKey("users.id"))
     agent_id = Column(Integer, ForeignKey("agents.id"), nullable=True)
     conversation_log = Column(SQLiteJSON, default=lambda: {"chat": []})
-    slug = Column(String, nullable=True)
+    slug = Column(String, nullable=True, index=True)
     title = Column(String, nullable=True)
+    # Pre-rendered, gzip-compressed JSON served to viewers
+    snapshot = Column(LargeBinary, nullable=True)
+    snapshot_etag = Column(String, nullable=True)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
 
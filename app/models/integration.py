@@ -12,7 +12,7 @@ class NotionConfig(Base):
     __tablename__ = "notion_configs"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     token = Column(String)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
@@ -26,7 +26,7 @@ class GithubConfig(Base):
     __tablename__ = "github_configs"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     pat_token = Column(String)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
@@ -41,7 +41,7 @@ class GithubRepoConfig(Base):
     __tablename__ = "github_repo_configs"
 
     id = Column(Integer, primary_key=True, index=True)
-    github_config_id = Column(Integer, ForeignKey("github_configs.id"))
+    github_config_id = Column(Integer, ForeignKey("github_configs.id"), index=True)
     name = Column(String)
     owner = Column(String)
     branch = Column(String)
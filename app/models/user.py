@@ -55,8 +55,9 @@ class KhojApiUser(Base):
     __tablename__ = "api_tokens"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
-    token = Column(String, unique=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    token = Column(String, unique=True, index=True)  # No longer stored, cleared by migration 0007
+    token_hash = Column(String, unique=True, index=True, nullable=True)  # SHA-256 of the token, used for lookups
     name = Column(String)
     accessed_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=func.now())
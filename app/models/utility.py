@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON, Text, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from sqlalchemy.dialects.sqlite import JSON as SQLiteJSON
@@ -32,7 +32,7 @@ class ProcessLock(Base):
 
 
 class UserRequests(Base):
-    """User requests model."""
+    """User requests model. Legacy per-request log, usage is counted in UsageCounter."""
     __tablename__ = "user_requests"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -45,13 +45,34 @@ class UserRequests(Base):
     user = relationship("KhojUser", backref="requests")
 
 
+class UsageCounter(Base):
+    """Usage counter model. Requests per user, slug and time bucket of bucket_seconds."""
+    __tablename__ = "usage_counters"
+    __table_args__ = (
+        UniqueConstraint("user_id", "slug", "bucket_seconds", "bucket_start", name="uq_usage_counters_bucket"),
+        Index("ix_usage_counters_rollup", "bucket_seconds", "bucket_start"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    slug = Column(String)
+    bucket_seconds = Column(Integer)
+    bucket_start = Column(DateTime)
+    count = Column(Integer, default=0, nullable=False, server_default="0")
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+
 class RateLimitRecord(Base):
-    """Rate limit record model."""
+    """Rate limit record model. One row per identifier, slug and window, holding the request count."""
     __tablename__ = "rate_limit_records"
+    __table_args__ = (UniqueConstraint("identifier", "slug", "window_start", name="uq_rate_limit_records_window"),)
 
     id = Column(Integer, primary_key=True, index=True)
     identifier = Column(String)
     slug = Column(String)
+    window_start = Column(DateTime, nullable=True, index=True)
+    count = Column(Integer, default=0, nullable=False, server_default="0")
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
 
@@ -70,3 +91,16 @@ class DataStore(Base):
 
     # Relationships
     owner = relationship("KhojUser", backref="data_stores")
+
+
+class ConfigVersion(Base):
+    """Versions bumped with every write workers must notice.
+
+    Row 1 versions the configuration tables, see app.core.config_cache. Row 2 counts API token
+    revocations, see app.core.api_tokens.
+    """
+    __tablename__ = "config_versions"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, default=0, nullable=False, server_default="0")
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
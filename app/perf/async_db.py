@@ -0,0 +1,102 @@
+"""Async database benchmark: concurrent query throughput and event loop lag.
+
+    python -m app.perf.async_db --requests 2000 --concurrency 64
+
+Runs the conversation lookup send_message starts with from concurrent coroutines, once
+through a sync session called on the event loop, as async endpoints did before the async
+database layer, and once through AsyncReadSessionLocal. A probe coroutine measures how late
+the event loop wakes it meanwhile, which is the stall every other request on the worker
+sees. Run it against a migrated database, it adds and then removes its conversations.
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from typing import Awaitable, Callable, List
+
+from sqlalchemy import delete, select
+
+from app.db.database import AsyncReadSessionLocal, SessionLocal
+from app.models.conversation import Conversation
+
+PROBE_INTERVAL_SECONDS = 0.005
+
+
+async def lookup_sync_on_loop(conversation_id: str) -> None:
+    db = SessionLocal()
+    try:
+        db.execute(select(Conversation).where(Conversation.id == conversation_id)).scalars().first()
+    finally:
+        db.close()
+
+
+async def lookup_async(conversation_id: str) -> None:
+    async with AsyncReadSessionLocal() as db:
+        (await db.execute(select(Conversation).where(Conversation.id == conversation_id))).scalars().first()
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[max(0, int(len(values) * fraction) - 1)] * 1000
+
+
+async def run(
+    name: str, lookup: Callable[[str], Awaitable[None]], conversation_ids: List[str], requests: int
+) -> None:
+    remaining = requests
+    latencies: List[float] = []
+    lags: List[float] = []
+    stopped = asyncio.Event()
+
+    async def worker(conversation_id: str) -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            await lookup(conversation_id)
+            latencies.append(time.perf_counter() - start)
+
+    async def probe() -> None:
+        while not stopped.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(PROBE_INTERVAL_SECONDS)
+            lags.append(max(0.0, time.perf_counter() - start - PROBE_INTERVAL_SECONDS))
+
+    prober = asyncio.create_task(probe())
+    start = time.perf_counter()
+    await asyncio.gather(*[worker(conversation_id) for conversation_id in conversation_ids])
+    elapsed = time.perf_counter() - start
+    stopped.set()
+    await prober
+    print(
+        f"{name}: {len(latencies) / elapsed:.0f} lookups/s, "
+        f"p50 {_percentile(latencies, 0.5):.1f} ms, p99 {_percentile(latencies, 0.99):.1f} ms | "
+        f"event loop lag p50 {_percentile(lags, 0.5):.1f} ms, p99 {_percentile(lags, 0.99):.1f} ms, "
+        f"max {max(lags) * 1000:.1f} ms"
+    )
+
+
+async def main(requests: int, concurrency: int) -> None:
+    prefix = f"perf-{uuid.uuid4().hex[:8]}"
+    conversation_ids = [f"{prefix}-{index}" for index in range(concurrency)]
+    db = SessionLocal()
+    try:
+        db.add_all(
+            Conversation(id=conversation_id, user_id=1, slug=conversation_id, conversation_log={"chat": []})
+            for conversation_id in conversation_ids
+        )
+        db.commit()
+        await run("sync session on the event loop", lookup_sync_on_loop, conversation_ids, requests)
+        await run("async session", lookup_async, conversation_ids, requests)
+    finally:
+        db.execute(delete(Conversation).where(Conversation.id.in_(conversation_ids)))
+        db.commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
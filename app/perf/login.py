@@ -0,0 +1,133 @@
+"""Login benchmark: login throughput under a flood, and what the flood costs other endpoints.
+
+    python -m app.perf.login --clients 64 --seconds 15
+
+Starts a server and registers a user. Probes then request GET /api/chat/options, a sync
+endpoint on the shared threadpool, every 20 ms: first idle, then while a separate process
+floods POST /api/auth/login with that user's credentials. Reports logins per second by
+status, 503 being logins the password hashing queue turned away, and the probe latency each
+time, which is what every other request sees during the flood. Run it against a migrated
+database, DATABASE_URL is passed through to the server and each run registers a new user.
+The rate limiter is off unless RATE_LIMIT_ENABLED is set.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter
+from typing import Dict, List
+
+import httpx
+
+from app.perf.startup import _free_port
+
+PROBE_PATH = "/api/chat/options"
+PROBE_CLIENTS = 4
+PROBE_INTERVAL_SECONDS = 0.02
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[max(0, int(len(values) * fraction) - 1)] * 1000
+
+
+async def _flood(url: str, username: str, password: str, clients: int, seconds: float) -> Dict[str, int]:
+    codes: Counter = Counter()
+    stop = time.perf_counter() + seconds
+    limits = httpx.Limits(max_connections=clients)
+    async with httpx.AsyncClient(base_url=url, timeout=60, limits=limits) as client:
+
+        async def login() -> None:
+            while time.perf_counter() < stop:
+                try:
+                    response = await client.post("/api/auth/login", data={"username": username, "password": password})
+                    codes[str(response.status_code)] += 1
+                except httpx.HTTPError as e:
+                    codes[type(e).__name__] += 1
+
+        await asyncio.gather(*[login() for _ in range(clients)])
+    return dict(codes)
+
+
+def flood(url: str, username: str, password: str, clients: int, seconds: float, results) -> None:
+    """Flood the login endpoint from its own process, so the probes are not slowed by the flood's client."""
+    results.put(asyncio.run(_flood(url, username, password, clients, seconds)))
+
+
+async def probe(url: str, seconds: float) -> List[float]:
+    latencies: List[float] = []
+    stop = time.perf_counter() + seconds
+    async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+
+        async def run() -> None:
+            while time.perf_counter() < stop:
+                start = time.perf_counter()
+                await client.get(PROBE_PATH)
+                latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(PROBE_INTERVAL_SECONDS)
+
+        await asyncio.gather(*[run() for _ in range(PROBE_CLIENTS)])
+    return latencies
+
+
+def _probe_summary(latencies: List[float]) -> str:
+    return (
+        f"probe p50 {_percentile(latencies, 0.5):.0f} ms, p99 {_percentile(latencies, 0.99):.0f} ms, "
+        f"max {max(latencies) * 1000:.0f} ms"
+    )
+
+
+def _wait_until_ready(server: subprocess.Popen, url: str, timeout: float) -> None:
+    start = time.perf_counter()
+    with httpx.Client(base_url=url, timeout=1.0) as client:
+        while time.perf_counter() - start < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"Server exited with status {server.returncode}")
+            try:
+                if client.get(PROBE_PATH).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.05)
+    raise TimeoutError(f"No 200 response from {PROBE_PATH} within {timeout}s")
+
+
+def main(clients: int, seconds: float) -> None:
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}"
+    env = {"RATE_LIMIT_ENABLED": "false", **os.environ}
+    server = subprocess.Popen(
+        [sys.executable, "-W", "ignore", "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        _wait_until_ready(server, url, timeout=60)
+        username, password = f"perf-{uuid.uuid4().hex[:8]}", uuid.uuid4().hex
+        httpx.post(f"{url}/api/auth/register", json={"username": username, "password": password}).raise_for_status()
+
+        print(f"idle: {_probe_summary(asyncio.run(probe(url, min(seconds, 5))))}")
+
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        flooder = context.Process(target=flood, args=(url, username, password, clients, seconds, results))
+        flooder.start()
+        latencies = asyncio.run(probe(url, seconds))
+        codes = results.get()
+        flooder.join()
+        rates = ", ".join(f"{code}: {count / seconds:.1f}/s" for code, count in sorted(codes.items()))
+        print(f"login flood, {clients} clients: {rates} | {_probe_summary(latencies)}")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=15.0)
+    args = parser.parse_args()
+    main(args.clients, args.seconds)
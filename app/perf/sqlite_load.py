@@ -0,0 +1,144 @@
+"""SQLite mixed load benchmark: read and write latency while a bulk writer commits.
+
+    python -m app.perf.sqlite_load --seconds 10 --readers 8 --writers 4
+
+Runs once with SQLITE_PRODUCTION_MODE off and once on, each in a fresh interpreter since
+the engines are built at import. Reader threads look up conversations through
+ReadSessionLocal and writer threads rename them through SessionLocal, while a separate
+process commits INDEXER_ROWS-row transactions every INDEXER_INTERVAL_SECONDS, as content
+indexing does. Run it against a migrated SQLite file database with the server stopped, it
+adds and then removes its conversations and scratch table.
+"""
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from typing import List
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.engine import make_url
+
+from app.core.config import settings
+from app.db.database import ReadSessionLocal, SessionLocal
+from app.models.conversation import Conversation
+
+INDEXER_ROWS = 20000
+INDEXER_INTERVAL_SECONDS = 0.3
+SCRATCH_TABLE = "perf_indexer_rows"
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[max(0, int(len(values) * fraction) - 1)] * 1000
+
+
+def index(path: str, stop_at: float) -> None:
+    """Commit large transactions on a connection of its own, like the content indexer."""
+    connection = sqlite3.connect(path, timeout=60)
+    connection.execute(f"CREATE TABLE IF NOT EXISTS {SCRATCH_TABLE} (id INTEGER PRIMARY KEY, body TEXT)")
+    while time.time() < stop_at:
+        with connection:
+            connection.executemany(f"INSERT INTO {SCRATCH_TABLE} (body) VALUES (?)", [("x" * 200,)] * INDEXER_ROWS)
+        time.sleep(INDEXER_INTERVAL_SECONDS)
+    connection.execute(f"DROP TABLE {SCRATCH_TABLE}")
+    connection.close()
+
+
+def read(conversation_id: str) -> None:
+    db = ReadSessionLocal()
+    try:
+        db.execute(select(Conversation).where(Conversation.id == conversation_id)).scalars().first()
+    finally:
+        db.close()
+
+
+def write(conversation_id: str) -> None:
+    db = SessionLocal()
+    try:
+        db.execute(update(Conversation).where(Conversation.id == conversation_id).values(title=uuid.uuid4().hex))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _summary(name: str, latencies: List[float], seconds: float) -> str:
+    return (
+        f"{name} {len(latencies) / seconds:.0f}/s, p50 {_percentile(latencies, 0.5):.1f} ms, "
+        f"p99 {_percentile(latencies, 0.99):.1f} ms, max {max(latencies) * 1000:.0f} ms"
+    )
+
+
+def run(seconds: float, readers: int, writers: int) -> None:
+    """Measure one mode, the one the current process's settings select."""
+    prefix = f"perf-{uuid.uuid4().hex[:8]}"
+    conversation_ids = [f"{prefix}-{index}" for index in range(readers + writers)]
+    db = SessionLocal()
+    db.add_all(
+        Conversation(id=conversation_id, user_id=1, slug=conversation_id, conversation_log={"chat": []})
+        for conversation_id in conversation_ids
+    )
+    db.commit()
+    db.close()
+
+    stop_at = time.time() + seconds
+    indexer = multiprocessing.get_context("spawn").Process(
+        target=index, args=(make_url(settings.DATABASE_URL).database, stop_at)
+    )
+    indexer.start()
+    latencies = {"reads": [], "writes": []}
+
+    def load(kind: str, operation, conversation_id: str) -> None:
+        while time.time() < stop_at:
+            start = time.perf_counter()
+            operation(conversation_id)
+            latencies[kind].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=load, args=("reads", read, conversation_id)) for conversation_id in conversation_ids[:readers]]
+    threads += [threading.Thread(target=load, args=("writes", write, conversation_id)) for conversation_id in conversation_ids[readers:]]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        indexer.join()
+        db = SessionLocal()
+        db.execute(delete(Conversation).where(Conversation.id.in_(conversation_ids)))
+        db.commit()
+        db.close()
+    mode = "production" if settings.SQLITE_PRODUCTION_MODE else "default"
+    print(f"{mode}: {_summary('reads', latencies['reads'], seconds)} | {_summary('writes', latencies['writes'], seconds)}")
+
+
+def main(seconds: float, readers: int, writers: int) -> None:
+    for production in ("false", "true"):
+        if production == "false":
+            # The journal mode persists in the file, production mode switches it back to WAL
+            connection = sqlite3.connect(make_url(settings.DATABASE_URL).database)
+            connection.execute("PRAGMA journal_mode=DELETE")
+            connection.close()
+        env = {**os.environ, "SQLITE_PRODUCTION_MODE": production}
+        subprocess.run(
+            [sys.executable, "-W", "ignore", "-m", "app.perf.sqlite_load", "--run",
+             "--seconds", str(seconds), "--readers", str(readers), "--writers", str(writers)],
+            env=env,
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--run", action="store_true", help="Measure the mode the environment selects, once")
+    args = parser.parse_args()
+    if args.run:
+        run(args.seconds, args.readers, args.writers)
+    else:
+        main(args.seconds, args.readers, args.writers)
@@ -0,0 +1,75 @@
+"""Startup benchmark: time from starting a server process to its first 200 response.
+
+    python -m app.perf.startup --runs 5
+
+Also reports how long importing app.main takes on its own. Run it against a migrated
+database, DATABASE_URL is passed through to the server. With --budget-ms, exits with
+status 1 when the median time to the first 200 response is over the budget.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import List
+
+import httpx
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_import() -> float:
+    """Seconds to import app.main in a fresh interpreter."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-W", "ignore", "-c", "import app.main"], check=True, env=os.environ.copy())
+    return time.perf_counter() - start
+
+
+def time_first_response(path: str, timeout: float) -> float:
+    """Seconds from starting uvicorn to the first 200 response for path."""
+    port = _free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-W", "ignore", "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=os.environ.copy(),
+    )
+    try:
+        with httpx.Client(timeout=1.0) as client:
+            while time.perf_counter() - start < timeout:
+                if server.poll() is not None:
+                    raise RuntimeError(f"Server exited with status {server.returncode}")
+                try:
+                    if client.get(f"http://127.0.0.1:{port}{path}").status_code == 200:
+                        return time.perf_counter() - start
+                except httpx.HTTPError:
+                    pass
+                time.sleep(0.005)
+        raise TimeoutError(f"No 200 response from {path} within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def _summary(name: str, seconds: List[float]) -> str:
+    ms = sorted(second * 1000 for second in seconds)
+    return f"{name}: min {ms[0]:.0f} ms, median {statistics.median(ms):.0f} ms, max {ms[-1]:.0f} ms"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/api/chat/options")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--budget-ms", type=float, default=None)
+    args = parser.parse_args()
+    print(_summary("import app.main", [time_import() for _ in range(args.runs)]))
+    first_responses = [time_first_response(args.path, args.timeout) for _ in range(args.runs)]
+    print(_summary(f"start to first 200 on {args.path}", first_responses))
+    if args.budget_ms is not None and statistics.median(first_responses) * 1000 > args.budget_ms:
+        sys.exit(f"Median time to first 200 is over the {args.budget_ms:.0f} ms budget")
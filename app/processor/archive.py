@@ -0,0 +1,187 @@
+import asyncio
+import datetime
+import json
+import time
+import zlib
+from typing import Any, Dict, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.core import metrics
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.conversation import Conversation, ConversationArchive
+from app.processor.model_clients import LatencyTracker
+
+# Placeholder log kept in the hot table while the real log is archived
+ARCHIVED_LOG_PLACEHOLDER: Dict[str, Any] = {"chat": []}
+
+
+def encode_log(conversation_log: Dict[str, Any]) -> bytes:
+    return json.dumps(conversation_log, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def compress_log(raw: bytes) -> bytes:
+    return zlib.compress(raw, settings.CONVERSATION_ARCHIVE_COMPRESSION_LEVEL)
+
+
+def decompress_log(blob: bytes) -> Dict[str, Any]:
+    return json.loads(zlib.decompress(blob))
+
+
+def load_archived_log(db: Session, conversation_id: str) -> Optional[Dict[str, Any]]:
+    """Read an archived log without moving it back to the hot table."""
+    blob = db.query(ConversationArchive.log).filter(ConversationArchive.conversation_id == conversation_id).scalar()
+    return decompress_log(blob) if blob is not None else None
+
+
+class ConversationArchiver:
+    """Moves logs of idle conversations to compressed cold storage and back on access.
+
+    Listings keep reading the hot conversations table, where archived conversations keep
+    their metadata and a placeholder log. Opening or writing to an archived conversation
+    rehydrates its log first.
+    """
+
+    def __init__(self):
+        self._task: Optional["asyncio.Task[None]"] = None
+        self.rehydration = LatencyTracker()
+        self.archived = 0
+        self.rehydrated = 0
+        self.conflicts = 0
+
+    def archive_batch(self, idle_days: int, batch_size: int) -> int:
+        """Archive one batch of conversations idle for idle_days. Returns the number archived."""
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=idle_days)
+        db = SessionLocal()
+        try:
+            conversations = db.query(Conversation.id, Conversation.version, Conversation.conversation_log).filter(
+                Conversation.archived_at.is_(None),
+                Conversation.updated_at < cutoff,
+            ).order_by(Conversation.updated_at).limit(batch_size).all()
+
+            archived = 0
+            now = datetime.datetime.utcnow()
+            for conversation_id, version, conversation_log in conversations:
+                raw = encode_log(conversation_log or ARCHIVED_LOG_PLACEHOLDER)
+                blob = compress_log(raw)
+                # Compare-and-swap on the version, and keep updated_at since archiving is not activity
+                result = db.execute(
+                    update(Conversation)
+                    .where(Conversation.id == conversation_id, Conversation.version == version)
+                    .values(
+                        conversation_log=ARCHIVED_LOG_PLACEHOLDER,
+                        archived_at=now,
+                        updated_at=Conversation.updated_at,
+                        version=version + 1,
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                if result.rowcount != 1:
+                    self.conflicts += 1
+                    continue
+                db.add(ConversationArchive(
+                    conversation_id=conversation_id, log=blob, raw_bytes=len(raw), compressed_bytes=len(blob), archived_at=now
+                ))
+                archived += 1
+            db.commit()
+            self.archived += archived
+            return archived
+        finally:
+            db.close()
+
+    def archive_idle(self) -> int:
+        """Archive idle conversations batch by batch until none are left."""
+        total = 0
+        while True:
+            archived = self.archive_batch(settings.CONVERSATION_ARCHIVE_IDLE_DAYS, settings.CONVERSATION_ARCHIVE_BATCH_SIZE)
+            total += archived
+            if archived < settings.CONVERSATION_ARCHIVE_BATCH_SIZE:
+                return total
+
+    def rehydrate(self, db: Session, conversation: Optional[Conversation]) -> Optional[Conversation]:
+        """Move an archived conversation's log back into the hot table. Returns None if it was deleted."""
+        if conversation is None or conversation.archived_at is None:
+            return conversation
+
+        start = time.perf_counter()
+        conversation_id = conversation.id
+        archive = conversation.archive
+        if archive is not None:
+            conversation.conversation_log = decompress_log(archive.log)
+            db.delete(archive)
+        conversation.archived_at = None
+        try:
+            db.commit()
+            self.rehydrated += 1
+        except StaleDataError:
+            # Someone else rehydrated or wrote it first
+            db.rollback()
+            self.conflicts += 1
+        self.rehydration.record(time.perf_counter() - start, ok=True)
+        return db.query(Conversation).filter(Conversation.id == conversation_id).first()
+
+    def storage_stats(self, db: Session) -> Dict[str, Any]:
+        """Sizes of the hot and cold tiers."""
+        hot_count, hot_bytes = db.query(
+            func.count(Conversation.id), func.coalesce(func.sum(func.length(Conversation.conversation_log)), 0)
+        ).filter(Conversation.archived_at.is_(None)).one()
+        cold_count, cold_raw, cold_compressed = db.query(
+            func.count(ConversationArchive.conversation_id),
+            func.coalesce(func.sum(ConversationArchive.raw_bytes), 0),
+            func.coalesce(func.sum(ConversationArchive.compressed_bytes), 0),
+        ).one()
+        return {
+            "hot": {"conversations": hot_count, "log_bytes": hot_bytes},
+            "cold": {
+                "conversations": cold_count,
+                "raw_bytes": cold_raw,
+                "compressed_bytes": cold_compressed,
+                "compression_ratio": cold_raw / cold_compressed if cold_compressed else None,
+            },
+            "rehydration": self._rehydration_stats(),
+        }
+
+    def _rehydration_stats(self) -> Dict[str, Any]:
+        latency = self.rehydration.stats()
+        return {"count": latency["requests"], **{key: latency[key] for key in ("p50_ms", "p95_ms", "p99_ms")}}
+
+    def start(self) -> None:
+        if self._task or not settings.CONVERSATION_ARCHIVE_ENABLED:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await run_in_threadpool(self.archive_idle)
+            except Exception:
+                # Retry on the next interval
+                pass
+            await asyncio.sleep(settings.CONVERSATION_ARCHIVE_INTERVAL_SECONDS)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "archived": self.archived,
+            "rehydrated": self.rehydrated,
+            "conflicts": self.conflicts,
+            "rehydration": self._rehydration_stats(),
+        }
+
+
+conversation_archiver = ConversationArchiver()
+
+metrics.register("conversation_archive", conversation_archiver.stats)
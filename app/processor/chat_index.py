@@ -0,0 +1,181 @@
+import logging
+import queue
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+
+from app.core import metrics
+from app.core.config import settings
+from app.db.database import engine, read_engine
+
+logger = logging.getLogger(__name__)
+
+# Full-text index of chat messages, the SQLite FTS5 table created and backfilled by migration 0006
+_insert_message = text(
+    "INSERT INTO chat_message_fts (message, user_id, conversation_id, turn_id, by, created) "
+    "VALUES (:message, :user_id, :conversation_id, :turn_id, :by, :created)"
+)
+_delete_conversation = text("DELETE FROM chat_message_fts WHERE conversation_id = :conversation_id")
+_search = text(
+    "SELECT conversation_id, turn_id, by, created, "
+    "snippet(chat_message_fts, 0, :open, :close, '…', :tokens) AS snippet, bm25(chat_message_fts) AS rank "
+    "FROM chat_message_fts WHERE chat_message_fts MATCH :query AND user_id = :user_id "
+    "ORDER BY rank LIMIT :limit"
+)
+
+_STOP = object()
+
+
+def _match_query(query: str) -> str:
+    """Quote each term so user input is never parsed as FTS syntax."""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+
+class ChatIndexer:
+    """Index chat messages for full-text search from a background thread.
+
+    Requests only enqueue messages, so indexing never adds latency to sending a message.
+    The worker writes queued operations in batches, one transaction per batch.
+    """
+
+    def __init__(self, batch_size: int, max_queue: int):
+        self.batch_size = batch_size
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self.available = False
+        self.indexed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    def start(self) -> None:
+        """Start the worker if the database has the index."""
+        if self._thread:
+            return
+        if engine.dialect.name != "sqlite":
+            # The index is an FTS5 table
+            self.available = False
+            return
+        with read_engine.connect() as connection:
+            # Missing on SQLite builds without FTS5, which the migration skips
+            self.available = connection.execute(
+                text("SELECT 1 FROM sqlite_master WHERE name = 'chat_message_fts'")
+            ).first() is not None
+        if not self.available:
+            return
+        self._thread = threading.Thread(target=self._run, name="chat-indexer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Drain queued operations and stop the worker."""
+        if not self._thread:
+            return
+        # Nothing drains the queue from here on, so stop accepting work
+        self.available = False
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+        self._thread = None
+
+    def add_messages(self, user_id: int, conversation_id: str, messages: Sequence[Dict[str, Any]], block: bool = False) -> None:
+        """Queue messages for indexing. Bulk callers off the event loop may block for backpressure."""
+        self._enqueue(("add", user_id, conversation_id, list(messages)), block)
+
+    def delete_conversation(self, conversation_id: str) -> None:
+        self._enqueue(("delete", conversation_id))
+
+    def replace_conversation(self, user_id: int, conversation_id: str, messages: Sequence[Dict[str, Any]]) -> None:
+        """Queue reindexing a conversation whose log was replaced, dropping its old messages."""
+        self._enqueue(("replace", user_id, conversation_id, list(messages)))
+
+    def _enqueue(self, operation: Tuple, block: bool = False) -> None:
+        if not self.available:
+            return
+        try:
+            self._queue.put(operation, block=block)
+        except queue.Full:
+            # Shed indexing work rather than block the request
+            self.dropped += 1
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            operations = [self._queue.get()]
+            while len(operations) < self.batch_size:
+                try:
+                    operations.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if _STOP in operations:
+                operations = [operation for operation in operations if operation is not _STOP]
+                stopping = True
+            if operations:
+                self._write(operations)
+
+    def _write(self, operations: List[Tuple]) -> None:
+        try:
+            with engine.begin() as connection:
+                for operation in operations:
+                    if operation[0] == "delete":
+                        connection.execute(_delete_conversation, {"conversation_id": operation[1]})
+                        continue
+                    kind, user_id, conversation_id, messages = operation
+                    if kind == "replace":
+                        connection.execute(_delete_conversation, {"conversation_id": conversation_id})
+                    rows = [
+                        {
+                            "message": message.get("message") or "",
+                            "user_id": user_id,
+                            "conversation_id": conversation_id,
+                            "turn_id": message.get("turnId"),
+                            "by": message.get("by"),
+                            "created": message.get("created"),
+                        }
+                        for message in messages
+                        if message.get("message")
+                    ]
+                    if rows:
+                        connection.execute(_insert_message, rows)
+                        self.indexed += len(rows)
+            self.batches += 1
+        except Exception:
+            # Keep the worker alive, search misses these messages until they are reindexed
+            self.failed += len(operations)
+            logger.exception("Failed to index %d chat index operations", len(operations))
+
+    def search(self, user_id: int, query: str, limit: int) -> List[Dict[str, Any]]:
+        """Search a user's chat messages, best matches first, with highlighted snippets."""
+        match = _match_query(query)
+        if not match:
+            return []
+        with read_engine.connect() as connection:
+            rows = connection.execute(_search, {
+                "query": match,
+                "user_id": user_id,
+                "limit": limit,
+                "open": settings.CHAT_SEARCH_HIGHLIGHT_OPEN,
+                "close": settings.CHAT_SEARCH_HIGHLIGHT_CLOSE,
+                "tokens": settings.CHAT_SEARCH_SNIPPET_TOKENS,
+            })
+            return [dict(row._mapping) for row in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "available": self.available,
+            "queued": self._queue.qsize(),
+            "indexed": self.indexed,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+chat_indexer = ChatIndexer(
+    batch_size=settings.CHAT_INDEX_BATCH_SIZE,
+    max_queue=settings.CHAT_INDEX_MAX_QUEUE,
+)
+
+metrics.register("chat_index", chat_indexer.stats)
@@ -0,0 +1,233 @@
+import asyncio
+import multiprocessing
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Set
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.core import metrics
+from app.core.config import settings
+from app.processor import sandbox_worker
+from app.processor.model_clients import LatencyTracker
+
+
+class CodeSandboxUnavailableError(Exception):
+    """Raised when the code sandbox is disabled or has no worker to run a snippet."""
+
+
+@dataclass(eq=False)
+class _Worker:
+    process: Any
+    conn: Any
+    executions: int = 0
+
+    def kill(self) -> None:
+        self.conn.close()
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=1)
+
+
+@dataclass
+class CodeResult:
+    code: str
+    success: bool
+    std_out: str = ""
+    std_err: str = ""
+    output: Optional[str] = None
+    error: Optional[str] = None
+    duration: float = 0.0
+
+    def as_context(self) -> Dict[str, Any]:
+        """Entry for ChatMessage.codeContext."""
+        return {
+            "code": self.code,
+            "results": {
+                "success": self.success,
+                "std_out": self.std_out,
+                "std_err": self.std_err,
+                "output": self.output,
+                "error": self.error,
+            },
+        }
+
+
+def _start_method() -> str:
+    # Fork a clean server process rather than the app, which holds threads and connections
+    return "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+class CodeSandboxPool:
+    """Pool of pre-started, resource limited Python workers for running code snippets.
+
+    Workers run under CPU time and address space rlimits and are confined by the kernel before
+    their first snippet, see sandbox_worker._confine: read-only access to the Python libraries
+    and nothing else, no capabilities, and no new processes, signals to other processes or
+    sockets. A worker that cannot be confined refuses to start. Workers are killed if a snippet
+    runs past the wall-clock timeout. A worker is replaced after
+    max_executions snippets or after any snippet that hit a limit, with the replacement
+    started in the background so requests rarely wait for a cold start.
+    """
+
+    def __init__(self, size: int, max_executions: int):
+        self.size = size
+        self.max_executions = max_executions
+        self._context = multiprocessing.get_context(_start_method())
+        self._idle: Optional["asyncio.Queue[_Worker]"] = None
+        self._workers: Set[_Worker] = set()
+        self._spawning: Set["asyncio.Task[None]"] = set()
+        self.execution = LatencyTracker()
+        self.cold_start = LatencyTracker()
+        self.waiting = 0
+        self.cold_starts = 0
+        self.recycled = 0
+        self.timeouts = 0
+
+    def _spawn(self) -> _Worker:
+        """Start a worker and wait until its limits are in place. Blocking."""
+        start = time.perf_counter()
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=sandbox_worker.serve,
+            args=(
+                child_conn,
+                settings.CODE_SANDBOX_MEMORY_MB * 1024 * 1024,
+                settings.CODE_SANDBOX_CPU_SECONDS,
+                settings.CODE_SANDBOX_MAX_OUTPUT_CHARS,
+            ),
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        worker = _Worker(process=process, conn=parent_conn)
+        if not parent_conn.poll(settings.CODE_SANDBOX_START_TIMEOUT_SECONDS):
+            worker.kill()
+            self.cold_start.record(time.perf_counter() - start, ok=False)
+            raise CodeSandboxUnavailableError("Code sandbox worker did not start")
+        try:
+            ready = parent_conn.recv()
+        except (EOFError, OSError):
+            ready = {"ready": False, "error": "exited while starting"}
+        if not ready.get("ready"):
+            worker.kill()
+            self.cold_start.record(time.perf_counter() - start, ok=False)
+            raise CodeSandboxUnavailableError(f"Code sandbox worker could not be confined: {ready.get('error')}")
+        self.cold_start.record(time.perf_counter() - start, ok=True)
+        self.cold_starts += 1
+        return worker
+
+    async def _add_worker(self) -> None:
+        try:
+            worker = await run_in_threadpool(self._spawn)
+        except Exception:
+            # The next recycle or request retries
+            return
+        if self._idle is None:
+            # Stopped while starting
+            worker.kill()
+            return
+        self._workers.add(worker)
+        self._idle.put_nowait(worker)
+
+    def _replenish(self) -> None:
+        if self._idle is None:
+            return
+        while len(self._workers) + len(self._spawning) < self.size:
+            task = asyncio.create_task(self._add_worker())
+            self._spawning.add(task)
+            task.add_done_callback(self._spawning.discard)
+
+    def start(self) -> None:
+        """Pre-start the workers in the background."""
+        if self._idle is not None or self.size <= 0:
+            return
+        self._idle = asyncio.Queue()
+        self._replenish()
+
+    async def stop(self) -> None:
+        idle, self._idle = self._idle, None
+        if idle is None:
+            return
+        for task in list(self._spawning):
+            await task
+        for worker in list(self._workers):
+            worker.kill()
+        self._workers.clear()
+
+    def _retire(self, worker: _Worker) -> None:
+        self._workers.discard(worker)
+        worker.kill()
+        self.recycled += 1
+        self._replenish()
+
+    def _run_on(self, worker: _Worker, code: str) -> Dict[str, Any]:
+        """Send a snippet to a worker and wait for the result. Blocking."""
+        worker.conn.send({"code": code})
+        if not worker.conn.poll(settings.CODE_SANDBOX_TIMEOUT_SECONDS):
+            error = f"Timed out after {settings.CODE_SANDBOX_TIMEOUT_SECONDS}s"
+            return {"success": False, "error": error, "recycle": True, "timed_out": True}
+        return worker.conn.recv()
+
+    async def _execute_on(self, worker: _Worker, code: str) -> CodeResult:
+        start = time.perf_counter()
+        result: Dict[str, Any] = {"success": False, "error": "Code sandbox worker exited", "recycle": True}
+        try:
+            result = await run_in_threadpool(self._run_on, worker, code)
+        except (EOFError, OSError):
+            pass
+        finally:
+            worker.executions += 1
+            if result.get("timed_out"):
+                self.timeouts += 1
+            if result.get("recycle") or worker.executions >= self.max_executions or self._idle is None:
+                self._retire(worker)
+            else:
+                self._idle.put_nowait(worker)
+            self.execution.record(time.perf_counter() - start, ok=bool(result.get("success")))
+        return CodeResult(
+            code=code,
+            success=bool(result.get("success")),
+            std_out=result.get("std_out", ""),
+            std_err=result.get("std_err", ""),
+            output=result.get("output"),
+            error=result.get("error"),
+            duration=result.get("duration", time.perf_counter() - start),
+        )
+
+    async def execute(self, code: str) -> CodeResult:
+        """Run a snippet on the next free worker. Raises CodeSandboxUnavailableError if disabled."""
+        if self.size <= 0:
+            raise CodeSandboxUnavailableError("Code sandbox is disabled")
+        # Started lazily outside the app lifespan, e.g. in scripts
+        self.start()
+        self._replenish()
+        self.waiting += 1
+        try:
+            worker = await self._idle.get()
+        finally:
+            self.waiting -= 1
+        # Hand the worker back to the pool even if the caller gives up waiting
+        return await asyncio.shield(asyncio.ensure_future(self._execute_on(worker, code)))
+
+    def _latency_stats(self, tracker: LatencyTracker) -> Dict[str, Any]:
+        latency = tracker.stats()
+        return {key: latency[key] for key in ("requests", "errors", "p50_ms", "p95_ms", "p99_ms")}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "workers": len(self._workers),
+            "idle": self._idle.qsize() if self._idle else 0,
+            "queue_depth": self.waiting,
+            "cold_starts": self.cold_starts,
+            "recycled": self.recycled,
+            "timeouts": self.timeouts,
+            "cold_start": self._latency_stats(self.cold_start),
+            "execution": self._latency_stats(self.execution),
+        }
+
+
+code_sandbox = CodeSandboxPool(size=settings.CODE_SANDBOX_WORKERS, max_executions=settings.CODE_SANDBOX_MAX_EXECUTIONS)
+
+metrics.register("code_sandbox", code_sandbox.stats)
@@ -0,0 +1,50 @@
+from typing import List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.singleflight import SingleFlight
+from app.db.database import ReadSessionLocal
+from app.db.loading import eager
+from app.models.content import Entry
+from app.schemas.content import Entry as EntrySchema
+
+_search_flight = SingleFlight("content_search")
+
+
+def search_entries(user_id: int, query: str, limit: int, file_type: Optional[str] = None) -> List[EntrySchema]:
+    """Run keyword search in its own session, so shared results outlive any one request."""
+    db = ReadSessionLocal()
+    try:
+        # Get all entries for the user
+        query_obj = db.query(Entry).options(*eager()).filter(Entry.user_id == user_id)
+        
+        # Filter by file type if specified
+        if file_type:
+            query_obj = query_obj.filter(Entry.file_type == file_type)
+        
+        entries = query_obj.all()
+        
+        # Simple keyword search (for lightweight version)
+        matches = []
+        for entry in entries:
+            if query.lower() in entry.raw.lower() or query.lower() in entry.compiled.lower():
+                matches.append(entry)
+                if len(matches) >= limit:
+                    break
+        
+        if not matches:
+            return []
+        
+        # Load the dates of the matches only, in one query instead of one per entry
+        db.query(Entry).options(*eager(Entry.dates)).filter(Entry.id.in_([entry.id for entry in matches])).all()
+        return [EntrySchema.model_validate(entry, from_attributes=True) for entry in matches]
+    finally:
+        db.close()
+
+
+async def asearch_entries(user_id: int, query: str, limit: int, file_type: Optional[str] = None) -> List[EntrySchema]:
+    """Search entries off the event loop, coalescing identical concurrent searches."""
+    return await _search_flight.do(
+        (user_id, query, limit, file_type),
+        lambda: run_in_threadpool(search_entries, user_id, query, limit, file_type),
+    )
@@ -0,0 +1,107 @@
+from typing import Any, Dict, List, Optional, Union
+
+import httpx
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.core.config import settings
+from app.core.config_cache import CachedChatModel
+from app.models.ai_models import ChatModel
+from app.models.conversation import Agent, Conversation
+from app.processor.archive import conversation_archiver
+from app.processor.model_clients import ModelApiError, model_clients
+from app.processor.model_router import chat_model_router
+from app.processor.scheduler import llm_scheduler
+
+# Number of previous chat messages included in the prompt
+MAX_HISTORY_MESSAGES = 10
+
+LIGHTWEIGHT_RESPONSE = "This is a lightweight version of Khoj. For full AI chat functionality, please install the complete version with Gemini API integration."
+
+
+class ConversationConflictError(Exception):
+    """Raised when a conversation keeps changing underneath an append."""
+
+
+def format_chat_history(chat: List[Dict[str, Any]], max_messages: int = MAX_HISTORY_MESSAGES) -> str:
+    """Format the most recent chat messages as prompt context."""
+    recent = chat[-max_messages:] if max_messages else []
+    return "\n".join(f"{message.get('by', 'user')}: {message.get('message', '')}" for message in recent)
+
+
+def build_prompt(query: str, chat_history: str = "", personality: Optional[str] = None, references: str = "") -> str:
+    """Assemble the prompt sent to the chat model."""
+    parts = []
+    if personality:
+        parts.append(f"system: {personality}")
+    if chat_history:
+        parts.append(chat_history)
+    if references:
+        parts.append(f"references:\n{references}")
+    parts.append(f"user: {query}")
+    return "\n".join(parts)
+
+
+async def generate_response(
+    prompt: str,
+    agent: Optional[Agent] = None,
+    chat_model: Optional[Union[ChatModel, CachedChatModel]] = None,
+    user_id: Optional[int] = None,
+    user_tier: str = "free",
+) -> str:
+    """Generate an AI response for the assembled prompt."""
+    chat_model = chat_model or (agent.chat_model if agent else None)
+    ai_model_api = chat_model.ai_model_api if chat_model else None
+
+    # Call OpenAI compatible model APIs through the pooled client
+    if ai_model_api and ai_model_api.api_base_url and chat_model.model_type == "openai":
+        client = model_clients.get(ai_model_api)
+        async with llm_scheduler.slot(client.name, user_id, user_tier):
+            with chat_model_router.track(chat_model.id):
+                response = await client.post(
+                    "chat/completions",
+                    json={"model": chat_model.name, "messages": [{"role": "user", "content": prompt}]},
+                    hedge=True,
+                )
+                try:
+                    response.raise_for_status()
+                    return response.json()["choices"][0]["message"]["content"]
+                except (httpx.HTTPStatusError, KeyError, IndexError, ValueError) as e:
+                    raise ModelApiError(f"Invalid response from model API {client.name}") from e
+
+    # Simplified for lightweight version
+    ai_response = LIGHTWEIGHT_RESPONSE
+
+    if agent and agent.personality:
+        ai_response = f"Agent ({agent.name}): {ai_response}"
+
+    return ai_response
+
+
+def append_chat_messages(db: Session, conversation_id: str, messages: List[Dict[str, Any]]) -> Optional[Conversation]:
+    """Append messages to a conversation log with optimistic concurrency.
+
+    The commit only succeeds if the conversation version is unchanged since it was read.
+    On conflict the latest log is reloaded and the messages are appended to it again, so
+    concurrent exchanges are ordered by commit instead of overwriting each other.
+    Returns None if the conversation no longer exists.
+    """
+    for _ in range(settings.CONVERSATION_APPEND_MAX_RETRIES + 1):
+        conversation = db.query(Conversation).filter(Conversation.id == conversation_id).first()
+        if conversation is None:
+            return None
+        if conversation.archived_at is not None:
+            conversation = conversation_archiver.rehydrate(db, conversation)
+            if conversation is None:
+                return None
+
+        conversation_log = dict(conversation.conversation_log or {})
+        conversation_log["chat"] = list(conversation_log.get("chat", [])) + messages
+        conversation.conversation_log = conversation_log
+        try:
+            db.commit()
+            return conversation
+        except StaleDataError:
+            db.rollback()
+
+    raise ConversationConflictError(f"Could not append to conversation {conversation_id}")
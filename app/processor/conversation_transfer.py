@@ -0,0 +1,198 @@
+import datetime
+import json
+import time
+import uuid
+import zlib
+from typing import Any, AsyncIterable, Dict, Iterator, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert, select
+
+from app.core.config import settings
+from app.db.database import ReadSessionLocal, SessionLocal
+from app.models.conversation import Agent, Conversation
+from app.processor.archive import load_archived_log
+from app.processor.chat_index import chat_indexer
+from app.schemas.conversation import ImportReport
+
+# Export format: one JSON object per line. Each conversation line is followed by one line
+# per chat message, so neither side has to hold more than one conversation in memory.
+#   {"type": "conversation", "id": ..., "slug": ..., "title": ..., "agent_slug": ..., ...}
+#   {"type": "message", "conversation_id": ..., "message": {...}}
+
+
+def _export_lines(user_id: int) -> Iterator[bytes]:
+    # A reader, so a long export does not hold the single writer connection
+    db = ReadSessionLocal()
+    try:
+        agent_slugs = dict(db.query(Agent.id, Agent.slug).all())
+        result = db.execute(
+            select(Conversation)
+            .where(Conversation.user_id == user_id)
+            .order_by(Conversation.created_at, Conversation.id)
+            .execution_options(yield_per=settings.CONVERSATION_EXPORT_BATCH_SIZE)
+        ).scalars()
+        for conversation in result:
+            log = conversation.conversation_log or {}
+            if conversation.archived_at is not None:
+                log = load_archived_log(db, conversation.id) or log
+            header = {
+                "type": "conversation",
+                "id": conversation.id,
+                "slug": conversation.slug,
+                "title": conversation.title,
+                "agent_slug": agent_slugs.get(conversation.agent_id),
+                "file_filters": conversation.file_filters or [],
+                "conversation_log": {key: value for key, value in log.items() if key != "chat"},
+                "created_at": conversation.created_at.isoformat() if conversation.created_at else None,
+                "updated_at": conversation.updated_at.isoformat() if conversation.updated_at else None,
+            }
+            yield json.dumps(header, ensure_ascii=False).encode("utf-8") + b"\n"
+            for message in log.get("chat", []):
+                line = {"type": "message", "conversation_id": conversation.id, "message": message}
+                yield json.dumps(line, ensure_ascii=False).encode("utf-8") + b"\n"
+            # Keep the identity map from growing with the export
+            db.expunge(conversation)
+    finally:
+        db.close()
+
+
+def export_conversations(user_id: int, compress: bool = False) -> Iterator[bytes]:
+    """Stream a user's conversations as NDJSON chunks, optionally gzip-compressed."""
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    buffer = bytearray()
+    for line in _export_lines(user_id):
+        buffer += line
+        if len(buffer) >= settings.CONVERSATION_EXPORT_CHUNK_BYTES:
+            chunk = bytes(buffer)
+            buffer.clear()
+            chunk = compressor.compress(chunk) if compressor else chunk
+            if chunk:
+                yield chunk
+    chunk = bytes(buffer)
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+
+async def _iter_lines(body: AsyncIterable[bytes]) -> AsyncIterable[bytes]:
+    """Split a request body into lines, decompressing gzip detected by magic bytes."""
+    compressed: Optional[bool] = None
+    decompressor = None
+    pending = bytearray()
+    async for chunk in body:
+        if compressed is None:
+            if not chunk:
+                continue
+            compressed = chunk[:2] == b"\x1f\x8b"
+            decompressor = zlib.decompressobj(wbits=31) if compressed else None
+        if decompressor:
+            try:
+                chunk = decompressor.decompress(chunk)
+            except zlib.error as e:
+                raise ValueError(f"Corrupt gzip stream: {e}")
+        pending += chunk
+        start = 0
+        while True:
+            end = pending.find(b"\n", start)
+            if end == -1:
+                break
+            yield bytes(pending[start:end])
+            start = end + 1
+        del pending[:start]
+        if len(pending) > settings.CONVERSATION_IMPORT_MAX_LINE_BYTES:
+            raise ValueError("Import line exceeds maximum size")
+    if decompressor:
+        pending += decompressor.flush()
+    if pending:
+        yield bytes(pending)
+
+
+def _parse_datetime(value: Optional[str]) -> datetime.datetime:
+    return datetime.datetime.fromisoformat(value) if value else datetime.datetime.utcnow()
+
+
+def _write_batch(user_id: int, batch: List[Dict[str, Any]]) -> int:
+    """Insert a batch of conversations in one transaction. Returns the number of ids reassigned."""
+    db = SessionLocal()
+    try:
+        ids = [row["id"] for row in batch]
+        taken = set(db.scalars(select(Conversation.id).where(Conversation.id.in_(ids))))
+        slugs = {row["agent_slug"] for row in batch} - {None}
+        agent_ids = dict(db.query(Agent.slug, Agent.id).filter(Agent.slug.in_(slugs)).all()) if slugs else {}
+
+        reassigned = 0
+        for row in batch:
+            if row["id"] in taken:
+                # Imported into an instance that already has this conversation, or twice in one file
+                row["id"] = str(uuid.uuid4())
+                reassigned += 1
+            taken.add(row["id"])
+            row["user_id"] = user_id
+            row["agent_id"] = agent_ids.get(row.pop("agent_slug"))
+        db.execute(insert(Conversation), batch)
+        db.commit()
+        for row in batch:
+            chat_indexer.add_messages(user_id, row["id"], row["conversation_log"]["chat"], block=True)
+        return reassigned
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+async def import_conversations(user_id: int, body: AsyncIterable[bytes]) -> ImportReport:
+    """Ingest an export stream in batched transactions and report throughput."""
+    start = time.perf_counter()
+    report = ImportReport()
+    batch: List[Dict[str, Any]] = []
+    batch_messages = 0
+    current: Optional[Dict[str, Any]] = None
+
+    async def flush() -> None:
+        nonlocal batch, batch_messages
+        if batch:
+            report.reassigned_ids += await run_in_threadpool(_write_batch, user_id, batch)
+            batch, batch_messages = [], 0
+
+    async for line in _iter_lines(body):
+        report.bytes += len(line) + 1
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if not isinstance(record, dict):
+            raise ValueError("Import line is not a JSON object")
+        if record.get("type") == "conversation":
+            if batch_messages >= settings.CONVERSATION_IMPORT_BATCH_MESSAGES or len(batch) >= settings.CONVERSATION_IMPORT_BATCH_SIZE:
+                await flush()
+            current = {
+                "id": record.get("id") or str(uuid.uuid4()),
+                "slug": record.get("slug"),
+                "title": record.get("title"),
+                "agent_slug": record.get("agent_slug"),
+                "file_filters": record.get("file_filters") or [],
+                "conversation_log": {**(record.get("conversation_log") or {}), "chat": []},
+                "version": 1,
+                "created_at": _parse_datetime(record.get("created_at")),
+                "updated_at": _parse_datetime(record.get("updated_at")),
+            }
+            batch.append(current)
+            report.conversations += 1
+        elif record.get("type") == "message":
+            if current is None or record.get("conversation_id") not in (None, current["id"]):
+                raise ValueError("Message line does not follow its conversation")
+            current["conversation_log"]["chat"].append(record["message"])
+            batch_messages += 1
+            report.messages += 1
+        else:
+            raise ValueError(f"Unknown record type: {record.get('type')}")
+    await flush()
+
+    report.seconds = time.perf_counter() - start
+    if report.seconds:
+        report.conversations_per_second = report.conversations / report.seconds
+        report.messages_per_second = report.messages / report.seconds
+        report.megabytes_per_second = report.bytes / report.seconds / (1024 * 1024)
+    return report
@@ -0,0 +1,40 @@
+import hashlib
+import math
+import re
+from typing import List, Sequence
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.singleflight import SingleFlight
+
+# Dimension of the hashed bag-of-words vectors used in the lightweight version
+EMBEDDING_DIMENSIONS = 256
+
+_token_pattern = re.compile(r"\w+")
+
+_embedding_flight = SingleFlight("query_embedding")
+
+
+def embed_query(text: str, dimensions: int = EMBEDDING_DIMENSIONS) -> List[float]:
+    """Embed text as a normalized hashed bag-of-words vector (lightweight version without a bi-encoder)."""
+    vector = [0.0] * dimensions
+    for token in _token_pattern.findall(text.lower()):
+        digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+        index = int.from_bytes(digest[:4], "little") % dimensions
+        sign = 1.0 if digest[4] & 1 else -1.0
+        vector[index] += sign
+
+    norm = math.sqrt(sum(value * value for value in vector))
+    if norm:
+        vector = [value / norm for value in vector]
+    return vector
+
+
+async def aembed_query(text: str) -> List[float]:
+    """Embed a query off the event loop, coalescing identical concurrent queries."""
+    return await _embedding_flight.do(text, lambda: run_in_threadpool(embed_query, text))
+
+
+def cosine_similarity(a: Sequence[float], b: Sequence[float]) -> float:
+    """Cosine similarity of two normalized vectors."""
+    return sum(x * y for x, y in zip(a, b))
@@ -0,0 +1,351 @@
+import asyncio
+import importlib.util
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple, Union
+
+import httpx
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.config_cache import CachedAiModelApi
+from app.models.ai_models import AiModelApi
+
+# HTTP/2 needs the optional h2 package
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class ModelApiError(Exception):
+    """Raised when a model API request fails after all retries."""
+
+
+class CircuitOpenError(ModelApiError):
+    """Raised when a provider's circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Fail fast after repeated failures, then let a single probe through after a cool-down."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def allow(self) -> bool:
+        """Check whether a request may be sent."""
+        with self._lock:
+            if self.state == self.OPEN and self._clock() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return self.state == self.CLOSED
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = self._clock()
+
+    def release_probe(self) -> None:
+        """Reopen after a probe ended without an outcome, e.g. cancelled, so a later one can go through."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+                self.opened_at = self._clock()
+
+
+class LatencyTracker:
+    """Rolling window of request latencies and outcomes for a provider."""
+
+    def __init__(self, window: int = 256):
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.hedges = 0
+        self.short_circuited = 0
+
+    def record(self, latency: float, ok: bool) -> None:
+        with self._lock:
+            self.requests += 1
+            self._outcomes.append(ok)
+            if ok:
+                self._latencies.append(latency)
+            else:
+                self.errors += 1
+
+    def count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        """Latency percentile in seconds over the window, if any samples exist."""
+        with self._lock:
+            samples = sorted(self._latencies)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(percentile / 100 * (len(samples) - 1))))
+        return samples[index]
+
+    @property
+    def samples(self) -> int:
+        """Number of successful requests in the window."""
+        return len(self._latencies)
+
+    @property
+    def observations(self) -> int:
+        """Number of requests in the window, successful or not."""
+        return len(self._outcomes)
+
+    @property
+    def error_rate(self) -> float:
+        with self._lock:
+            outcomes = list(self._outcomes)
+        return outcomes.count(False) / len(outcomes) if outcomes else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "error_rate": self.error_rate,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "short_circuited": self.short_circuited,
+            "p50_ms": _to_ms(self.percentile(50)),
+            "p95_ms": _to_ms(self.percentile(95)),
+            "p99_ms": _to_ms(self.percentile(99)),
+        }
+
+
+def _to_ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+class ModelApiClient:
+    """Long-lived HTTP client for one AI model API with retries, hedging and circuit breaking."""
+
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        api_key: Optional[str] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.name = name
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            http2=settings.MODEL_API_HTTP2 and HTTP2_AVAILABLE and transport is None,
+            timeout=httpx.Timeout(settings.MODEL_API_TIMEOUT_SECONDS, connect=settings.MODEL_API_CONNECT_TIMEOUT_SECONDS),
+            limits=httpx.Limits(
+                max_connections=settings.MODEL_API_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.MODEL_API_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.MODEL_API_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+            transport=transport,
+        )
+        self.breaker = CircuitBreaker(
+            failure_threshold=settings.MODEL_API_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=settings.MODEL_API_BREAKER_RESET_SECONDS,
+        )
+        self.latency = LatencyTracker()
+        self.in_flight = 0
+        self.retired = False
+        self._closing: Optional["asyncio.Task[None]"] = None
+
+    async def request(self, method: str, url: str, hedge: bool = False, **kwargs) -> httpx.Response:
+        """Send a request, retrying transient failures with jittered exponential backoff."""
+        if not self.breaker.allow():
+            self.latency.count("short_circuited")
+            raise CircuitOpenError(f"Circuit open for model API {self.name}")
+
+        self.in_flight += 1
+        try:
+            return await self._send_with_retries(method, url, hedge, **kwargs)
+        except BaseException:
+            # Cancelled or failed without an outcome, which must not leave a probe pending forever
+            self.breaker.release_probe()
+            raise
+        finally:
+            self.in_flight -= 1
+            if self.retired and not self.in_flight:
+                self._close_soon()
+
+    async def _send_with_retries(self, method: str, url: str, hedge: bool, **kwargs) -> httpx.Response:
+        attempts = settings.MODEL_API_MAX_RETRIES + 1
+        last_error: Optional[Exception] = None
+        tried = 0
+        for attempt in range(attempts):
+            if attempt:
+                if self.breaker.state == CircuitBreaker.OPEN:
+                    break
+                self.latency.count("retries")
+                await asyncio.sleep(self._backoff(attempt))
+            tried += 1
+            try:
+                if hedge and settings.MODEL_API_HEDGING_ENABLED:
+                    response = await self._hedged_send(method, url, **kwargs)
+                else:
+                    response = await self._timed_send(method, url, **kwargs)
+            except httpx.TransportError as e:
+                last_error = e
+                self.breaker.record_failure()
+                continue
+
+            if response.status_code in RETRYABLE_STATUS_CODES:
+                last_error = ModelApiError(f"Model API {self.name} returned {response.status_code}")
+                self.breaker.record_failure()
+                continue
+
+            self.breaker.record_success()
+            return response
+
+        raise ModelApiError(f"Model API {self.name} request failed after {tried} attempts") from last_error
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def _timed_send(self, method: str, url: str, **kwargs) -> httpx.Response:
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.TransportError:
+            self.latency.record(time.perf_counter() - start, ok=False)
+            raise
+        self.latency.record(time.perf_counter() - start, ok=response.status_code not in RETRYABLE_STATUS_CODES)
+        return response
+
+    async def _hedged_send(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Send a duplicate request if the first is slower than the provider's p95, and keep the winner."""
+        delay = self._hedge_delay()
+        primary = asyncio.ensure_future(self._timed_send(method, url, **kwargs))
+        if delay is None:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        self.latency.count("hedges")
+        hedged = asyncio.ensure_future(self._timed_send(method, url, **kwargs))
+        pending = {primary, hedged}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            # Both attempts failed, surface the primary's error
+            return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _hedge_delay(self) -> Optional[float]:
+        if self.latency.samples < settings.MODEL_API_HEDGING_MIN_SAMPLES:
+            return None
+        p95 = self.latency.percentile(95)
+        return max(p95, settings.MODEL_API_HEDGING_MIN_DELAY_SECONDS)
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        """Full-jitter exponential backoff."""
+        ceiling = min(settings.MODEL_API_BACKOFF_MAX_SECONDS, settings.MODEL_API_BACKOFF_BASE_SECONDS * 2 ** (attempt - 1))
+        return random.uniform(0, ceiling)
+
+    def retire(self) -> None:
+        """Close the client once the requests in flight finish, after the registry replaced it."""
+        self.retired = True
+        if not self.in_flight:
+            self._close_soon()
+
+    def _close_soon(self) -> None:
+        if self._closing is not None:
+            return
+        try:
+            self._closing = asyncio.get_running_loop().create_task(self.aclose())
+        except RuntimeError:
+            # No event loop in this thread, ModelClientRegistry.aclose closes it at shutdown
+            pass
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"circuit": self.breaker.state, **self.latency.stats()}
+
+
+class ModelClientRegistry:
+    """One long-lived client per AiModelApi row, rebuilt when its URL or key changes."""
+
+    def __init__(self):
+        self._clients: Dict[int, Tuple[Tuple[Optional[str], Optional[str]], ModelApiClient]] = {}
+        self._lock = threading.Lock()
+        self._retired: List[ModelApiClient] = []
+
+    def get(
+        self,
+        ai_model_api: Union[AiModelApi, CachedAiModelApi],
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> ModelApiClient:
+        """Get the pooled client for an AI model API."""
+        fingerprint = (ai_model_api.api_base_url, ai_model_api.api_key)
+        with self._lock:
+            existing = self._clients.get(ai_model_api.id)
+            if existing and existing[0] == fingerprint:
+                return existing[1]
+            if existing:
+                # Requests in flight keep the old client until they finish
+                self._retired = [retired for retired in self._retired if not retired.client.is_closed]
+                self._retired.append(existing[1])
+                existing[1].retire()
+            client = ModelApiClient(
+                name=ai_model_api.name or str(ai_model_api.id),
+                base_url=ai_model_api.api_base_url or "",
+                api_key=ai_model_api.api_key,
+                transport=transport,
+            )
+            self._clients[ai_model_api.id] = (fingerprint, client)
+            return client
+
+    def get_by_id(self, ai_model_api_id: int) -> Optional[ModelApiClient]:
+        existing = self._clients.get(ai_model_api_id)
+        return existing[1] if existing else None
+
+    async def aclose(self) -> None:
+        """Close every pooled client."""
+        with self._lock:
+            clients = [client for _, client in self._clients.values()] + self._retired
+            self._clients.clear()
+            self._retired = []
+        for client in clients:
+            if not client.client.is_closed:
+                await client.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {client.name: client.stats() for _, client in list(self._clients.values())}
+
+
+model_clients = ModelClientRegistry()
+
+metrics.register("model_clients", model_clients.stats)
@@ -0,0 +1,168 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.config_cache import CachedChatModel, ConfigSnapshot
+from app.models.conversation import Agent
+from app.models.user import Subscription
+from app.processor.model_clients import CircuitBreaker, LatencyTracker, model_clients
+
+
+@dataclass(frozen=True)
+class RoutingDecision:
+    """Chat model picked for a request, with the reason for auditing."""
+    chat_model: CachedChatModel
+    reason: str
+    fallback: Optional[CachedChatModel] = None
+
+    def as_train_of_thought(self) -> Dict[str, str]:
+        return {"type": "routing", "data": f"Routed to {self.chat_model.name}: {self.reason}"}
+
+    def fallback_elsewhere(self) -> Optional[CachedChatModel]:
+        """Fallback model on another provider, since the chosen provider's queue is shared with its other models."""
+        if self.fallback is None or self.fallback.ai_model_api_id == self.chat_model.ai_model_api_id:
+            return None
+        return self.fallback
+
+
+def get_user_tier(db: Session, user_id: int) -> str:
+    """Price tier a user is entitled to, from their subscription."""
+    subscription = db.query(Subscription).filter(Subscription.user_id == user_id).first()
+    if subscription and subscription.type in ("standard", "trial"):
+        return "standard"
+    return "free"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for prompt size checks."""
+    return len(text) // settings.CHAT_ROUTER_CHARS_PER_TOKEN + 1
+
+
+class ChatModelRouter:
+    """Pick a chat model per request from prompt size, user tier and live model health.
+
+    Candidates are the agent's model (if any) or the server's advanced model, falling back
+    to the server's default model when the preferred one does not fit the prompt, is not
+    available on the user's tier, or is slow, failing or overloaded.
+    """
+
+    def __init__(self):
+        self._trackers: Dict[int, LatencyTracker] = {}
+        self._in_flight: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def tracker(self, chat_model_id: int) -> LatencyTracker:
+        with self._lock:
+            if chat_model_id not in self._trackers:
+                self._trackers[chat_model_id] = LatencyTracker()
+            return self._trackers[chat_model_id]
+
+    def route(
+        self, config: ConfigSnapshot, prompt: str, user_tier: str, agent: Optional[Agent] = None
+    ) -> Optional[RoutingDecision]:
+        """Choose the chat model for a prompt from a config snapshot. Returns None when no chat model is configured."""
+        server_settings = config.server_chat_settings
+        default = server_settings.chat_default if server_settings else None
+        advanced = server_settings.chat_advanced if server_settings else None
+        agent_model = config.chat_models.get(agent.chat_model_id) if agent and agent.chat_model_id else None
+
+        if agent_model:
+            preferred, reason = agent_model, "agent model"
+        elif advanced and (user_tier == "standard" or advanced.price_tier == "free"):
+            preferred, reason = advanced, "advanced model"
+        elif default:
+            preferred, reason = default, "default model"
+        else:
+            return None
+
+        candidates = [preferred] + [model for model in (default, advanced) if model and model.id != preferred.id]
+        candidates = [model for model in candidates if user_tier == "standard" or model.price_tier == "free"] or [preferred]
+
+        # Prefer models whose context window fits the prompt
+        prompt_tokens = estimate_tokens(prompt)
+        fitting = [model for model in candidates if self._fits(model, prompt_tokens, user_tier)]
+        if not fitting:
+            largest = max(candidates, key=lambda model: self._max_prompt_size(model, user_tier) or 0)
+            return RoutingDecision(largest, f"prompt of ~{prompt_tokens} tokens exceeds every model, using largest context")
+        if fitting[0].id != preferred.id:
+            reason = f"prompt of ~{prompt_tokens} tokens exceeds {preferred.name} context"
+
+        # Fall back from degraded models to the first healthy one
+        problems = []
+        for index, model in enumerate(fitting):
+            problem = self._degraded(model)
+            if not problem:
+                if problems:
+                    reason = f"{problems[0]}, falling back"
+                fallback = fitting[index + 1] if index + 1 < len(fitting) else None
+                return RoutingDecision(model, reason, fallback)
+            problems.append(f"{model.name} {problem}")
+
+        return RoutingDecision(fitting[-1], "all models degraded, using fallback")
+
+    @contextmanager
+    def track(self, chat_model_id: int) -> Iterator[None]:
+        """Record latency, outcome and in-flight count of a generation."""
+        with self._lock:
+            self._in_flight[chat_model_id] = self._in_flight.get(chat_model_id, 0) + 1
+        start = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.tracker(chat_model_id).record(time.perf_counter() - start, ok)
+            with self._lock:
+                self._in_flight[chat_model_id] -= 1
+
+    @staticmethod
+    def _max_prompt_size(model: CachedChatModel, user_tier: str) -> Optional[int]:
+        if user_tier == "standard" and model.subscribed_max_prompt_size:
+            return model.subscribed_max_prompt_size
+        return model.max_prompt_size
+
+    def _fits(self, model: CachedChatModel, prompt_tokens: int, user_tier: str) -> bool:
+        max_prompt_size = self._max_prompt_size(model, user_tier)
+        return max_prompt_size is None or prompt_tokens <= max_prompt_size
+
+    def _degraded(self, model: CachedChatModel) -> Optional[str]:
+        """Describe why a model is degraded, or None if it is healthy."""
+        client = model_clients.get_by_id(model.ai_model_api_id) if model.ai_model_api_id else None
+        if client and client.breaker.state == CircuitBreaker.OPEN:
+            return "circuit open"
+
+        if self._in_flight.get(model.id, 0) >= settings.CHAT_ROUTER_MAX_IN_FLIGHT:
+            return "overloaded"
+
+        tracker = self._trackers.get(model.id)
+        if not tracker or tracker.observations < settings.CHAT_ROUTER_MIN_SAMPLES:
+            return None
+        # Keep probing a degraded model with a trickle of traffic so it can recover
+        if random.random() < settings.CHAT_ROUTER_PROBE_RATE:
+            return None
+        if tracker.error_rate > settings.CHAT_ROUTER_MAX_ERROR_RATE:
+            return f"error rate {tracker.error_rate:.0%}"
+        p95 = tracker.percentile(95)
+        if p95 is not None and p95 > settings.CHAT_ROUTER_LATENCY_SLO_SECONDS:
+            return f"p95 latency {p95:.1f}s over SLO"
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            model_ids: List[int] = list(self._trackers)
+        return {
+            str(model_id): {"in_flight": self._in_flight.get(model_id, 0), **self._trackers[model_id].stats()}
+            for model_id in model_ids
+        }
+
+
+chat_model_router = ChatModelRouter()
+
+metrics.register("chat_model_router", chat_model_router.stats)
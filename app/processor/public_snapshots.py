@@ -0,0 +1,131 @@
+import datetime
+import gzip
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+
+from app.core import metrics
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.singleflight import SingleFlight
+from app.db.database import AsyncReadSessionLocal, ReadSessionLocal, SessionLocal
+from app.models.conversation import PublicConversation
+from app.schemas.conversation import PublicConversationSnapshot
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """Rendered public conversation, stored gzip-compressed."""
+    body: bytes
+    etag: str
+
+    @property
+    def gzip_etag(self) -> str:
+        # The compressed representation differs byte-wise, so it needs its own strong validator
+        return f'"{self.etag.strip(chr(34))}-gzip"'
+
+    def decompressed(self) -> bytes:
+        return gzip.decompress(self.body)
+
+
+def render_snapshot(public_conversation: PublicConversation) -> Snapshot:
+    """Serialize a public conversation once into compressed JSON with a content hash ETag."""
+    data = PublicConversationSnapshot.model_validate(public_conversation, from_attributes=True).model_dump(mode="json")
+    raw = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    etag = f'"{hashlib.sha256(raw).hexdigest()[:32]}"'
+    # Fixed mtime keeps the compressed bytes deterministic for the same content
+    return Snapshot(body=gzip.compress(raw, mtime=0), etag=etag)
+
+
+def materialize_snapshot(public_conversation: PublicConversation) -> Snapshot:
+    """Render the snapshot onto the row. The caller commits, then invalidates the cached copy."""
+    # Stamp timestamps here so the snapshot matches what is written
+    now = datetime.datetime.utcnow()
+    public_conversation.created_at = public_conversation.created_at or now
+    public_conversation.updated_at = now
+    snapshot = render_snapshot(public_conversation)
+    public_conversation.snapshot = snapshot.body
+    public_conversation.snapshot_etag = snapshot.etag
+    return snapshot
+
+
+class PublicSnapshotStore:
+    """In-process byte cache of public conversation snapshots, keyed by slug.
+
+    Views are served from memory after an indexed lookup of the row's ETag, so an unshare
+    or reshare on any worker takes effect at once; a miss reads only the materialized
+    snapshot columns, rendering and persisting the snapshot for rows shared before it existed.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._flight = SingleFlight("public_snapshot")
+        # Bumped on invalidation, so a load that raced an unshare is not cached
+        self._generation = 0
+
+    def load(self, slug: str) -> Optional[Snapshot]:
+        """Read a snapshot from the database in its own session."""
+        db = ReadSessionLocal()
+        try:
+            row = db.query(
+                PublicConversation.id, PublicConversation.snapshot, PublicConversation.snapshot_etag
+            ).filter(PublicConversation.slug == slug).first()
+        finally:
+            db.close()
+        if not row:
+            return None
+        if row.snapshot and row.snapshot_etag:
+            return Snapshot(body=row.snapshot, etag=row.snapshot_etag)
+
+        # Shared before snapshots existed, the only case that needs the writer
+        db = SessionLocal()
+        try:
+            public_conversation = db.query(PublicConversation).filter(PublicConversation.id == row.id).first()
+            if public_conversation is None:
+                return None
+            snapshot = materialize_snapshot(public_conversation)
+            db.commit()
+            return snapshot
+        finally:
+            db.close()
+
+    async def current_etag(self, slug: str) -> Optional[str]:
+        """ETag of the stored snapshot, or None if the conversation is no longer shared."""
+        async with AsyncReadSessionLocal() as db:
+            return (await db.execute(
+                select(PublicConversation.snapshot_etag).where(PublicConversation.slug == slug)
+            )).scalar()
+
+    async def get(self, slug: str) -> Optional[Snapshot]:
+        """Get a snapshot, loading it at most once for concurrent misses."""
+        snapshot = self._cache.get(slug)
+        if snapshot is not None:
+            if await self.current_etag(slug) == snapshot.etag:
+                return snapshot
+            # Unshared or changed on another worker
+            self._cache.pop(slug)
+        generation = self._generation
+        snapshot = await self._flight.do(slug, lambda: run_in_threadpool(self.load, slug))
+        if snapshot is not None and generation == self._generation:
+            self._cache.set(slug, snapshot)
+        return snapshot
+
+    def invalidate(self, slug: Optional[str]) -> None:
+        if slug:
+            self._generation += 1
+            self._cache.pop(slug)
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+
+public_snapshots = PublicSnapshotStore(
+    maxsize=settings.PUBLIC_SNAPSHOT_CACHE_MAX_ENTRIES,
+    ttl=settings.PUBLIC_SNAPSHOT_CACHE_TTL_SECONDS,
+)
+
+metrics.register("public_snapshots", public_snapshots.stats)
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from app.core import metrics
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.conversation import Agent
+from app.processor.embeddings import cosine_similarity, embed_query
+
+
+def _digest(*parts: Any) -> str:
+    return hashlib.sha256(json.dumps(parts, default=str).encode()).hexdigest()
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    """AI response stored in the response cache."""
+    response: str
+    agent_id: Optional[int]
+    namespace: str
+
+
+@dataclass(frozen=True)
+class _SemanticEntry:
+    context: str
+    embedding: Tuple[float, ...]
+    cached: CachedResponse
+
+
+class ResponseCache:
+    """Two-level cache of chat model responses.
+
+    The exact level is keyed by a hash of (agent, chat model, personality, assembled prompt).
+    The optional semantic level matches the query embedding against earlier queries asked
+    of the same agent, chat model and personality with the same chat history and tool references.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        semantic_enabled: bool = False,
+        semantic_threshold: float = 0.95,
+        semantic_maxsize: int = 512,
+    ):
+        self.exact = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.semantic = TTLCache(maxsize=semantic_maxsize, ttl=ttl)
+        self.semantic_enabled = semantic_enabled
+        self.semantic_threshold = semantic_threshold
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    @staticmethod
+    def namespace(agent_id: Optional[int], chat_model_id: Optional[int], personality: Optional[str]) -> str:
+        """Cache namespace of an agent's chat model and personality, since responses may name the agent."""
+        return _digest(agent_id, chat_model_id, personality)
+
+    def key(self, agent_id: Optional[int], chat_model_id: Optional[int], personality: Optional[str], prompt: str) -> str:
+        """Exact-match key for a prompt."""
+        return _digest(self.namespace(agent_id, chat_model_id, personality), prompt)
+
+    @staticmethod
+    def is_cacheable(agent: Optional[Agent]) -> bool:
+        """Check whether responses for this agent may be served from cache."""
+        if not settings.RESPONSE_CACHE_ENABLED:
+            return False
+        return agent is None or agent.cache_responses is not False
+
+    def lookup(
+        self,
+        agent_id: Optional[int],
+        chat_model_id: Optional[int],
+        personality: Optional[str],
+        prompt: str,
+        query: str,
+        chat_history: str = "",
+        embedding: Optional[Sequence[float]] = None,
+        references: str = "",
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """Look up a cached response, returning it with the cache level that matched."""
+        namespace = self.namespace(agent_id, chat_model_id, personality)
+        cached = self.exact.get(_digest(namespace, prompt))
+        if cached is not None:
+            self._count("exact_hits")
+            return cached.response, "exact"
+
+        if self.semantic_enabled:
+            # A similar query answered from other tool references is not the same question
+            context = _digest(namespace, chat_history, references)
+            embedding = embedding or embed_query(query)
+            best_key, best_score = None, self.semantic_threshold
+            for key, entry in self.semantic.items():
+                if entry.context != context:
+                    continue
+                score = cosine_similarity(embedding, entry.embedding)
+                if score >= best_score:
+                    best_key, best_score = key, score
+            if best_key is not None:
+                entry = self.semantic.get(best_key)
+                if entry is not None:
+                    self._count("semantic_hits")
+                    return entry.cached.response, "semantic"
+
+        self._count("misses")
+        return None, None
+
+    def store(
+        self,
+        agent_id: Optional[int],
+        chat_model_id: Optional[int],
+        personality: Optional[str],
+        prompt: str,
+        query: str,
+        response: str,
+        chat_history: str = "",
+        embedding: Optional[Sequence[float]] = None,
+        references: str = "",
+    ) -> None:
+        """Store a generated response in both cache levels."""
+        namespace = self.namespace(agent_id, chat_model_id, personality)
+        cached = CachedResponse(response=response, agent_id=agent_id, namespace=namespace)
+        key = _digest(namespace, prompt)
+        self.exact.set(key, cached)
+
+        if self.semantic_enabled:
+            self.semantic.set(key, _SemanticEntry(
+                context=_digest(namespace, chat_history, references),
+                embedding=tuple(embedding or embed_query(query)),
+                cached=cached,
+            ))
+
+    def record_bypass(self) -> None:
+        """Count a request that skipped the cache because its agent opted out."""
+        self._count("bypassed")
+
+    def invalidate_agent(self, agent_id: int) -> int:
+        """Drop responses generated for an agent."""
+        def matches(_key, value) -> bool:
+            cached = value.cached if isinstance(value, _SemanticEntry) else value
+            return cached.agent_id == agent_id
+
+        return self.exact.pop_where(matches) + self.semantic.pop_where(matches)
+
+    def clear(self) -> None:
+        self.exact.clear()
+        self.semantic.clear()
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit-rate metrics across both cache levels."""
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "lookups": lookups,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+            "exact": self.exact.stats(),
+            "semantic": self.semantic.stats(),
+        }
+
+
+response_cache = ResponseCache(
+    maxsize=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    ttl=settings.RESPONSE_CACHE_TTL_SECONDS,
+    semantic_enabled=settings.RESPONSE_CACHE_SEMANTIC_ENABLED,
+    semantic_threshold=settings.RESPONSE_CACHE_SEMANTIC_THRESHOLD,
+    semantic_maxsize=settings.RESPONSE_CACHE_SEMANTIC_MAX_ENTRIES,
+)
+
+metrics.register("response_cache", response_cache.stats)
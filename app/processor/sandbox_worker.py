@@ -0,0 +1,265 @@
+import ast
+import builtins
+import contextlib
+import ctypes
+import errno
+import io
+import math
+import os
+import platform
+import resource
+import signal
+import struct
+import sys
+import sysconfig
+import time
+import traceback
+from typing import Any, Dict, List
+
+# Kept free of app imports, so sandbox workers start quickly and hold no app state
+
+
+class CpuTimeExceeded(BaseException):
+    """Raised in the worker when a snippet uses up its CPU time."""
+
+
+def _on_cpu_limit(signum, frame):
+    raise CpuTimeExceeded()
+
+
+# Linux ABI constants for _confine, see landlock(7), seccomp(2) and capabilities(7)
+_PR_SET_NO_NEW_PRIVS = 38
+_LINUX_CAPABILITY_VERSION_3 = 0x20080522
+_LANDLOCK_CREATE_RULESET_VERSION = 1
+_LANDLOCK_RULE_PATH_BENEATH = 1
+_LANDLOCK_ACCESS_FS_READ = (1 << 2) | (1 << 3)  # READ_FILE, READ_DIR
+_LANDLOCK_SCOPE_ALL = 0b11  # Abstract unix sockets and signals, ABI 6
+_SYSCALL_LANDLOCK_CREATE_RULESET, _SYSCALL_LANDLOCK_ADD_RULE, _SYSCALL_LANDLOCK_RESTRICT_SELF = 444, 445, 446
+_SECCOMP_SET_MODE_FILTER = 1
+_SECCOMP_FILTER_FLAG_TSYNC = 1
+_SECCOMP_RET_KILL_PROCESS = 0x80000000
+_SECCOMP_RET_ERRNO = 0x00050000
+_SECCOMP_RET_ALLOW = 0x7FFF0000
+_BPF_LD_W_ABS, _BPF_JEQ, _BPF_JGE, _BPF_JSET, _BPF_RET = 0x20, 0x15, 0x35, 0x45, 0x06
+_CLONE_THREAD = 0x00010000
+_X32_SYSCALL_BIT = 0x40000000
+
+# Audit architecture, seccomp syscall number and the syscalls the filter refuses, per machine
+_SYSCALLS: Dict[str, Dict[str, Any]] = {
+    "x86_64": {
+        "arch": 0xC000003E,
+        "seccomp": 317,
+        "clone": 56, "clone3": 435, "fork": 57, "vfork": 58, "execve": 59, "execveat": 322,
+        "kill": 62, "tkill": 200, "tgkill": 234, "rt_sigqueueinfo": 129, "rt_tgsigqueueinfo": 297,
+        "pidfd_open": 434, "pidfd_send_signal": 424, "pidfd_getfd": 438,
+        "ptrace": 101, "process_vm_readv": 310, "process_vm_writev": 311,
+        "socket": 41, "socketpair": 53, "unshare": 272, "setns": 308, "io_uring_setup": 425,
+        "bpf": 321, "perf_event_open": 298, "userfaultfd": 323, "keyctl": 250, "add_key": 248, "request_key": 249,
+    },
+    "aarch64": {
+        "arch": 0xC00000B7,
+        "seccomp": 277,
+        "clone": 220, "clone3": 435, "execve": 221, "execveat": 281,
+        "kill": 129, "tkill": 130, "tgkill": 131, "rt_sigqueueinfo": 138, "rt_tgsigqueueinfo": 240,
+        "pidfd_open": 434, "pidfd_send_signal": 424, "pidfd_getfd": 438,
+        "ptrace": 117, "process_vm_readv": 270, "process_vm_writev": 271,
+        "socket": 198, "socketpair": 199, "unshare": 97, "setns": 268, "io_uring_setup": 425,
+        "bpf": 280, "perf_event_open": 241, "userfaultfd": 282, "keyctl": 219, "add_key": 217, "request_key": 218,
+    },
+}
+_REFUSED_SYSCALLS = (
+    "fork", "vfork", "execve", "execveat",
+    "rt_sigqueueinfo", "rt_tgsigqueueinfo", "pidfd_open", "pidfd_send_signal", "pidfd_getfd",
+    "ptrace", "process_vm_readv", "process_vm_writev",
+    "socket", "socketpair", "unshare", "setns", "io_uring_setup",
+    "bpf", "perf_event_open", "userfaultfd", "keyctl", "add_key", "request_key",
+)
+# Shared libraries extension modules such as _ssl and zlib link against
+_SYSTEM_LIBRARY_DIRS = ("/lib", "/lib64", "/usr/lib", "/usr/lib64")
+
+
+class _SockFprog(ctypes.Structure):
+    _fields_ = [("len", ctypes.c_ushort), ("filter", ctypes.c_void_p)]
+
+
+class SandboxConfinementError(OSError):
+    """Raised in the worker when the kernel cannot confine it. The worker then refuses snippets."""
+
+
+def _libc_call(result: int) -> int:
+    if result < 0:
+        error = ctypes.get_errno()
+        raise SandboxConfinementError(error, os.strerror(error))
+    return result
+
+
+def _readable_paths() -> List[str]:
+    paths = {sysconfig.get_path(name) for name in ("stdlib", "platstdlib", "purelib", "platlib")}
+    paths.update(_SYSTEM_LIBRARY_DIRS)
+    return sorted(path for path in paths if path and os.path.isdir(path))
+
+
+def _restrict_filesystem(libc) -> None:
+    """Landlock: read only the Python libraries, write nothing, signal nothing outside the worker."""
+    abi = libc.syscall(_SYSCALL_LANDLOCK_CREATE_RULESET, None, 0, _LANDLOCK_CREATE_RULESET_VERSION)
+    if abi < 1:
+        raise SandboxConfinementError("Landlock is not available, the code sandbox needs Linux 5.13 or newer")
+    # Every filesystem access right this ABI knows is handled, so anything not granted below is denied
+    handled_fs = (1 << {1: 13, 2: 14, 3: 15, 4: 15}.get(abi, 16)) - 1
+    handled_net = 0b11 if abi >= 4 else 0  # TCP bind and connect
+    scoped = _LANDLOCK_SCOPE_ALL if abi >= 6 else 0
+    attr = ctypes.create_string_buffer(struct.pack("<QQQ", handled_fs, handled_net, scoped))
+    ruleset = _libc_call(libc.syscall(_SYSCALL_LANDLOCK_CREATE_RULESET, attr, len(attr.raw), 0))
+    try:
+        for path in _readable_paths():
+            fd = os.open(path, os.O_PATH | os.O_CLOEXEC)
+            try:
+                rule = ctypes.create_string_buffer(struct.pack("<Qi", _LANDLOCK_ACCESS_FS_READ, fd))
+                _libc_call(libc.syscall(_SYSCALL_LANDLOCK_ADD_RULE, ruleset, _LANDLOCK_RULE_PATH_BENEATH, rule, 0))
+            finally:
+                os.close(fd)
+        _libc_call(libc.syscall(_SYSCALL_LANDLOCK_RESTRICT_SELF, ruleset, 0))
+    finally:
+        os.close(ruleset)
+
+
+def _drop_capabilities(libc) -> None:
+    """Clear every capability, so a worker started as root no longer bypasses file permissions."""
+    header = ctypes.create_string_buffer(struct.pack("<Ii", _LINUX_CAPABILITY_VERSION_3, 0))
+    data = ctypes.create_string_buffer(24)  # Effective, permitted and inheritable sets, two words each
+    _libc_call(libc.capset(header, data))
+
+
+def _filter_syscalls(libc) -> None:
+    """Seccomp: refuse starting processes, signalling other processes, tracing, sockets and namespaces."""
+    syscalls = _SYSCALLS.get(platform.machine())
+    if syscalls is None:
+        raise SandboxConfinementError(f"No seccomp filter for {platform.machine()}")
+    refused = _SECCOMP_RET_ERRNO | errno.EPERM
+    arg0 = 16  # offsetof(struct seccomp_data, args[0]), the low word on little endian machines
+
+    def statement(code: int, k: int) -> bytes:
+        return struct.pack("<HBBI", code, 0, 0, k)
+
+    def jump(code: int, k: int, if_true: int, if_false: int) -> bytes:
+        return struct.pack("<HBBI", code, if_true, if_false, k)
+
+    def allow_if(name: str, code: int, k: int) -> List[bytes]:
+        # Allowed when the first argument passes the check, refused otherwise
+        return [
+            jump(_BPF_JEQ, syscalls[name], 0, 4),
+            statement(_BPF_LD_W_ABS, arg0),
+            jump(code, k, 0, 1),
+            statement(_BPF_RET, _SECCOMP_RET_ALLOW),
+            statement(_BPF_RET, refused),
+        ]
+
+    pid = os.getpid()
+    program = [
+        statement(_BPF_LD_W_ABS, 4),
+        jump(_BPF_JEQ, syscalls["arch"], 1, 0),
+        statement(_BPF_RET, _SECCOMP_RET_KILL_PROCESS),
+        statement(_BPF_LD_W_ABS, 0),
+    ]
+    if platform.machine() == "x86_64":
+        program += [jump(_BPF_JGE, _X32_SYSCALL_BIT, 0, 1), statement(_BPF_RET, refused)]
+    # Threads are allowed, new processes are not. clone3 reports ENOSYS so libc falls back to clone
+    program += allow_if("clone", _BPF_JSET, _CLONE_THREAD)
+    program += [jump(_BPF_JEQ, syscalls["clone3"], 0, 1), statement(_BPF_RET, _SECCOMP_RET_ERRNO | errno.ENOSYS)]
+    # Signals only to the worker itself, e.g. signal.raise_signal. Not to its parent, siblings or the app
+    for name in ("kill", "tkill", "tgkill"):
+        program += allow_if(name, _BPF_JEQ, pid)
+    for name in _REFUSED_SYSCALLS:
+        if name in syscalls:
+            program += [jump(_BPF_JEQ, syscalls[name], 0, 1), statement(_BPF_RET, refused)]
+    program.append(statement(_BPF_RET, _SECCOMP_RET_ALLOW))
+
+    filters = ctypes.create_string_buffer(b"".join(program))
+    fprog = _SockFprog(len(program), ctypes.cast(filters, ctypes.c_void_p))
+    _libc_call(libc.syscall(syscalls["seccomp"], _SECCOMP_SET_MODE_FILTER, _SECCOMP_FILTER_FLAG_TSYNC, ctypes.byref(fprog)))
+
+
+def _confine() -> None:
+    """Confine the worker before it runs any snippet. Irreversible, and inherited by any thread it starts.
+
+    Enforced by the kernel rather than by patching Python, so neither ctypes nor _posixsubprocess
+    get around it. Raises SandboxConfinementError if the kernel lacks Landlock or seccomp.
+    """
+    if sys.platform != "linux":
+        raise SandboxConfinementError("The code sandbox needs Linux")
+    libc = ctypes.CDLL(None, use_errno=True)
+    _libc_call(libc.prctl(_PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0))
+    _restrict_filesystem(libc)
+    _drop_capabilities(libc)
+    _filter_syscalls(libc)
+
+
+def _apply_limits(memory_bytes: int) -> None:
+    resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+    signal.signal(signal.SIGXCPU, _on_cpu_limit)
+
+
+def _set_cpu_budget(cpu_seconds: int) -> None:
+    """Allow cpu_seconds more CPU time. RLIMIT_CPU counts the worker's whole lifetime."""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = math.ceil(usage.ru_utime + usage.ru_stime) + cpu_seconds
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def run_snippet(code: str, cpu_seconds: int, max_output_chars: int) -> Dict[str, Any]:
+    """Run a snippet, returning its output. The value of a trailing expression is returned too."""
+    stdout, stderr = io.StringIO(), io.StringIO()
+    namespace: Dict[str, Any] = {"__name__": "__sandbox__", "__builtins__": builtins}
+    result: Dict[str, Any] = {"success": False, "output": None, "error": None, "recycle": False}
+    start = time.perf_counter()
+    try:
+        tree = ast.parse(code, mode="exec")
+        last = tree.body.pop() if tree.body and isinstance(tree.body[-1], ast.Expr) else None
+        _set_cpu_budget(cpu_seconds)
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            exec(compile(tree, "<snippet>", "exec"), namespace)
+            if last is not None:
+                value = eval(compile(ast.Expression(last.value), "<snippet>", "eval"), namespace)
+                if value is not None:
+                    result["output"] = repr(value)[:max_output_chars]
+        result["success"] = True
+    except CpuTimeExceeded:
+        result["error"] = f"CPU time limit of {cpu_seconds}s exceeded"
+        result["recycle"] = True
+    except MemoryError:
+        result["error"] = "Memory limit exceeded"
+        result["recycle"] = True
+    except SyntaxError as e:
+        result["error"] = f"SyntaxError: {e}"
+    except BaseException as e:
+        result["error"] = traceback.format_exc(limit=-3)[-max_output_chars:]
+        # Exits and interrupts leave the interpreter in an unknown state, start the next snippet fresh
+        result["recycle"] = not isinstance(e, Exception)
+    finally:
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+    result["std_out"] = stdout.getvalue()[:max_output_chars]
+    result["std_err"] = stderr.getvalue()[:max_output_chars]
+    result["duration"] = time.perf_counter() - start
+    return result
+
+
+def serve(conn, memory_bytes: int, cpu_seconds: int, max_output_chars: int) -> None:
+    """Worker loop: apply limits and confine the worker, then run snippets sent over the pipe until it closes."""
+    _apply_limits(memory_bytes)
+    try:
+        _confine()
+    except OSError as e:
+        conn.send({"ready": False, "error": str(e)})
+        return
+    conn.send({"ready": True})
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            return
+        result = run_snippet(request["code"], cpu_seconds, max_output_chars)
+        conn.send(result)
+        if result["recycle"]:
+            return
@@ -0,0 +1,188 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List
+
+from app.core import metrics
+from app.core.config import settings
+from app.processor.model_clients import LatencyTracker
+
+
+class SchedulerOverloadedError(Exception):
+    """Raised when a model call is shed instead of queued."""
+
+
+class QueueTimeoutError(SchedulerOverloadedError):
+    """Raised when a model call waits in the queue longer than its tier's SLO."""
+
+
+class _Waiter:
+    __slots__ = ("finish", "seq", "start", "user_id", "tier", "future", "enqueued_at")
+
+    def __init__(self, finish: float, seq: int, start: float, user_id: Any, tier: str, future: "asyncio.Future[None]"):
+        self.finish = finish
+        self.seq = seq
+        self.start = start
+        self.user_id = user_id
+        self.tier = tier
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.finish, self.seq) < (other.finish, other.seq)
+
+
+class LLMScheduler:
+    """Admission control in front of model calls.
+
+    Concurrency is bounded per provider and per price tier. Waiting calls are served in
+    weighted fair order across users: each user's calls get virtual finish tags spaced by
+    1 / tier weight, so a heavy user cannot starve others and standard users get a larger
+    share than free users. Free-tier calls have a shorter queue and queue-time SLO, so they
+    are shed first under load.
+    """
+
+    def __init__(
+        self,
+        provider_concurrency: int,
+        tier_concurrency: Dict[str, int],
+        tier_weights: Dict[str, float],
+        tier_queue_slo: Dict[str, float],
+        tier_max_queue: Dict[str, int],
+    ):
+        self.provider_concurrency = provider_concurrency
+        self.tier_concurrency = tier_concurrency
+        self.tier_weights = tier_weights
+        self.tier_queue_slo = tier_queue_slo
+        self.tier_max_queue = tier_max_queue
+        self._queues: Dict[str, List[_Waiter]] = defaultdict(list)
+        self._provider_active: Dict[str, int] = defaultdict(int)
+        self._tier_active: Dict[str, int] = defaultdict(int)
+        self._tier_queued: Dict[str, int] = defaultdict(int)
+        self._virtual_time: Dict[str, float] = defaultdict(float)
+        self._user_finish: Dict[str, Dict[Any, float]] = defaultdict(dict)
+        self._seq = itertools.count()
+        self.queue_wait = LatencyTracker()
+        self.admitted: Dict[str, int] = defaultdict(int)
+        self.shed: Dict[str, int] = defaultdict(int)
+        self.timed_out: Dict[str, int] = defaultdict(int)
+
+    @asynccontextmanager
+    async def slot(self, provider: str, user_id: Any, tier: str) -> AsyncIterator[None]:
+        """Hold a concurrency slot for one model call."""
+        await self.acquire(provider, user_id, tier)
+        try:
+            yield
+        finally:
+            self.release(provider, tier)
+
+    async def acquire(self, provider: str, user_id: Any, tier: str) -> None:
+        """Wait for a slot, or raise SchedulerOverloadedError if the call is shed."""
+        if not self._queues.get(provider) and self._has_capacity(provider, tier):
+            self._grant(provider, tier, wait=0.0)
+            return
+
+        if self._tier_queued[tier] >= self.tier_max_queue.get(tier, 0):
+            self.shed[tier] += 1
+            raise SchedulerOverloadedError(f"Queue for {tier} tier is full")
+
+        weight = self.tier_weights.get(tier, 1.0)
+        start = max(self._virtual_time[provider], self._user_finish[provider].get(user_id, 0.0))
+        finish = start + 1.0 / weight
+        waiter = _Waiter(finish, next(self._seq), start, user_id, tier, asyncio.get_running_loop().create_future())
+        self._user_finish[provider][user_id] = finish
+        heapq.heappush(self._queues[provider], waiter)
+        self._tier_queued[tier] += 1
+        self._dispatch(provider)
+
+        try:
+            await asyncio.wait({waiter.future}, timeout=self.tier_queue_slo.get(tier))
+        except asyncio.CancelledError:
+            self._abandon(provider, waiter)
+            raise
+
+        if not waiter.future.done():
+            self._abandon(provider, waiter)
+            self.timed_out[tier] += 1
+            raise QueueTimeoutError(f"Queue time for {tier} tier exceeded its SLO")
+
+    def release(self, provider: str, tier: str) -> None:
+        """Free a slot and hand it to the next waiter in fair order."""
+        self._provider_active[provider] -= 1
+        self._tier_active[tier] -= 1
+        # A tier slot may unblock waiters on any provider
+        for queued_provider in list(self._queues):
+            self._dispatch(queued_provider)
+
+    def _abandon(self, provider: str, waiter: _Waiter) -> None:
+        if waiter.future.done() and not waiter.future.cancelled():
+            # Granted just as the waiter gave up, give the slot back
+            self.release(provider, waiter.tier)
+            return
+        waiter.future.cancel()
+        self._tier_queued[waiter.tier] -= 1
+        self._dispatch(provider)
+
+    def _has_capacity(self, provider: str, tier: str) -> bool:
+        return (
+            self._provider_active[provider] < self.provider_concurrency
+            and self._tier_active[tier] < self.tier_concurrency.get(tier, self.provider_concurrency)
+        )
+
+    def _grant(self, provider: str, tier: str, wait: float) -> None:
+        self._provider_active[provider] += 1
+        self._tier_active[tier] += 1
+        self.admitted[tier] += 1
+        self.queue_wait.record(wait, ok=True)
+
+    def _dispatch(self, provider: str) -> None:
+        queue = self._queues[provider]
+        blocked: List[_Waiter] = []
+        while queue and self._provider_active[provider] < self.provider_concurrency:
+            waiter = heapq.heappop(queue)
+            if waiter.future.done():
+                continue
+            if not self._has_capacity(provider, waiter.tier):
+                blocked.append(waiter)
+                continue
+            self._tier_queued[waiter.tier] -= 1
+            self._virtual_time[provider] = waiter.start
+            self._grant(provider, waiter.tier, wait=time.perf_counter() - waiter.enqueued_at)
+            waiter.future.set_result(None)
+        for waiter in blocked:
+            heapq.heappush(queue, waiter)
+        if not queue:
+            # Backlog drained, fairness tags start over with the next backlog
+            self._queues.pop(provider, None)
+            self._user_finish.pop(provider, None)
+            self._virtual_time.pop(provider, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Live queue depth and admission counters."""
+        return {
+            "queued": {
+                provider: sum(1 for waiter in queue if not waiter.future.done())
+                for provider, queue in self._queues.items()
+            },
+            "queued_by_tier": dict(self._tier_queued),
+            "active_by_provider": dict(self._provider_active),
+            "active_by_tier": dict(self._tier_active),
+            "admitted": dict(self.admitted),
+            "shed": dict(self.shed),
+            "timed_out": dict(self.timed_out),
+            "queue_wait": self.queue_wait.stats(),
+        }
+
+
+llm_scheduler = LLMScheduler(
+    provider_concurrency=settings.LLM_SCHEDULER_PROVIDER_CONCURRENCY,
+    tier_concurrency={"free": settings.LLM_SCHEDULER_FREE_CONCURRENCY, "standard": settings.LLM_SCHEDULER_STANDARD_CONCURRENCY},
+    tier_weights={"free": 1.0, "standard": settings.LLM_SCHEDULER_STANDARD_WEIGHT},
+    tier_queue_slo={"free": settings.LLM_SCHEDULER_FREE_QUEUE_SLO_SECONDS, "standard": settings.LLM_SCHEDULER_STANDARD_QUEUE_SLO_SECONDS},
+    tier_max_queue={"free": settings.LLM_SCHEDULER_FREE_MAX_QUEUE, "standard": settings.LLM_SCHEDULER_STANDARD_MAX_QUEUE},
+)
+
+metrics.register("llm_scheduler", llm_scheduler.stats)
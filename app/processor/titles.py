@@ -0,0 +1,202 @@
+import asyncio
+import json
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import case, func, or_, update
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.config_cache import config_cache
+from app.db.database import SessionLocal
+from app.models.conversation import Conversation
+from app.processor.conversation import generate_response
+from app.processor.model_clients import ModelApiError
+from app.processor.scheduler import SchedulerOverloadedError
+
+_word_pattern = re.compile(r"[\w'-]+")
+_slug_pattern = re.compile(r"[^a-z0-9]+")
+
+
+@dataclass(frozen=True)
+class TitleRequest:
+    """First exchange of a conversation that still needs a title."""
+    conversation_id: str
+    query: str
+    response: str
+
+
+def fallback_title(query: str) -> str:
+    """Title from the first words of the query, used when no model is available."""
+    words = _word_pattern.findall(query)[:settings.TITLE_MAX_WORDS]
+    title = " ".join(words)
+    return title[:1].upper() + title[1:] if title else "New conversation"
+
+
+def slugify(title: str, conversation_id: str) -> str:
+    slug = _slug_pattern.sub("-", title.lower()).strip("-")[:60].rstrip("-") or "conversation"
+    return f"{slug}-{conversation_id[:8]}"
+
+
+def build_title_prompt(requests: List[TitleRequest]) -> str:
+    """One prompt asking for the titles of several conversations at once."""
+    limit = settings.TITLE_EXCERPT_CHARS
+    exchanges = "\n\n".join(
+        f"{index}.\nuser: {request.query[:limit]}\nassistant: {request.response[:limit]}"
+        for index, request in enumerate(requests, start=1)
+    )
+    return (
+        f"Write a short title of at most {settings.TITLE_MAX_WORDS} words for each conversation below. "
+        f"Reply with only a JSON array of {len(requests)} strings, in the same order.\n\n{exchanges}"
+    )
+
+
+def parse_titles(text: str, count: int) -> List[str]:
+    """Parse the model's JSON array of titles. Raises ValueError if it does not match the batch."""
+    start, end = text.find("["), text.rfind("]")
+    if start == -1 or end < start:
+        raise ValueError("No JSON array in title response")
+    titles = json.loads(text[start:end + 1])
+    if not isinstance(titles, list) or len(titles) != count or not all(isinstance(title, str) for title in titles):
+        raise ValueError("Title response does not match the batch")
+    return [" ".join(title.split())[:120] for title in titles]
+
+
+def _write_titles(titles: Dict[str, str]) -> int:
+    """Set titles and generated slugs on conversations still untitled. Returns rows updated."""
+    db = SessionLocal()
+    try:
+        updated = 0
+        for conversation_id, title in titles.items():
+            slug = slugify(title, conversation_id)
+            result = db.execute(
+                update(Conversation)
+                .where(
+                    Conversation.id == conversation_id,
+                    or_(Conversation.title.is_(None), Conversation.title == ""),
+                )
+                .values(
+                    title=title,
+                    # Keep slugs the user chose, replace the random placeholder
+                    slug=case(
+                        (or_(Conversation.slug.is_(None), Conversation.slug.like("conversation-%")), slug),
+                        else_=Conversation.slug,
+                    ),
+                    updated_at=func.now(),
+                    version=Conversation.version + 1,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            updated += result.rowcount
+        db.commit()
+        return updated
+    finally:
+        db.close()
+
+
+class TitleGenerator:
+    """Background queue that titles new conversations after their first exchange.
+
+    Requests are batched for a short linger window so several conversations share one
+    model call. When no model is configured or the call fails, titles fall back to the
+    first words of the query.
+    """
+
+    def __init__(self, batch_size: int, linger: float, max_queue: int):
+        self.batch_size = batch_size
+        self.linger = linger
+        self.max_queue = max_queue
+        self._queue: Optional["asyncio.Queue[TitleRequest]"] = None
+        self._task: Optional["asyncio.Task[None]"] = None
+        self.generated = 0
+        self.fallbacks = 0
+        self.batches = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        if self._task or not settings.TITLE_GENERATION_ENABLED:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task, self._queue = None, None
+
+    def enqueue(self, request: TitleRequest) -> None:
+        if self._queue is None:
+            return
+        try:
+            self._queue.put_nowait(request)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def _next_batch(self) -> List[TitleRequest]:
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.linger
+        while len(batch) < self.batch_size:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            try:
+                titles = await self._generate(batch)
+                await run_in_threadpool(
+                    _write_titles, {request.conversation_id: title for request, title in zip(batch, titles)}
+                )
+                self.batches += 1
+            except Exception:
+                # Titles are best effort, keep the worker alive
+                self.failed += len(batch)
+
+    async def _generate(self, batch: List[TitleRequest]) -> List[str]:
+        server_settings = (await config_cache.aget()).server_chat_settings
+        chat_model = server_settings.chat_default if server_settings else None
+        ai_model_api = chat_model.ai_model_api if chat_model else None
+        if ai_model_api and ai_model_api.api_base_url and chat_model.model_type == "openai":
+            try:
+                # Lowest priority tier, so titling is shed before user traffic
+                response = await generate_response(build_title_prompt(batch), chat_model=chat_model, user_tier="free")
+                titles = parse_titles(response, len(batch))
+                self.generated += len(batch)
+                return titles
+            except (ModelApiError, SchedulerOverloadedError, ValueError):
+                pass
+        self.fallbacks += len(batch)
+        return [fallback_title(request.query) for request in batch]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "batches": self.batches,
+            "generated": self.generated,
+            "fallbacks": self.fallbacks,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+title_generator = TitleGenerator(
+    batch_size=settings.TITLE_BATCH_SIZE,
+    linger=settings.TITLE_BATCH_LINGER_SECONDS,
+    max_queue=settings.TITLE_QUEUE_MAX_SIZE,
+)
+
+metrics.register("title_generator", title_generator.stats)
@@ -0,0 +1,180 @@
+import asyncio
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Sequence
+
+from app.core import metrics
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.processor.code_sandbox import code_sandbox
+from app.processor.content_search import asearch_entries
+from app.processor.web_scraper import web_scraper
+from app.schemas.conversation import InputTool
+
+_url_pattern = re.compile(r"https?://[^\s<>\"']+")
+_code_block_pattern = re.compile(r"```(?:python|py)?[ \t]*\n(.*?)```", re.DOTALL)
+
+
+@dataclass
+class ToolOutput:
+    """Context gathered by one tool. Tools write into it as they go, so it holds partial results on timeout."""
+    tool: str
+    context: List[Dict[str, str]] = field(default_factory=list)
+    online_context: Dict[str, Any] = field(default_factory=dict)
+    code_context: Dict[str, Any] = field(default_factory=dict)
+    latency: float = 0.0
+    timed_out: bool = False
+    error: Optional[str] = None
+
+    def as_train_of_thought(self) -> Dict[str, str]:
+        found = len(self.context) + len(self.online_context) + len(self.code_context)
+        status = "timed out, partial results" if self.timed_out else f"failed: {self.error}" if self.error else "done"
+        return {"type": "tool", "data": f"{self.tool}: {status}, {found} results in {self.latency * 1000:.0f} ms"}
+
+
+@dataclass(frozen=True)
+class ToolResults:
+    """Merged output of every tool run for a chat turn."""
+    outputs: List[ToolOutput]
+    reused: bool = False
+
+    @property
+    def context(self) -> List[Dict[str, str]]:
+        return [item for output in self.outputs for item in output.context]
+
+    @property
+    def online_context(self) -> Dict[str, Any]:
+        merged: Dict[str, Any] = {}
+        for output in self.outputs:
+            merged.update(output.online_context)
+        return merged
+
+    @property
+    def code_context(self) -> Dict[str, Any]:
+        merged: Dict[str, Any] = {}
+        for output in self.outputs:
+            merged.update(output.code_context)
+        return merged
+
+    def as_prompt_context(self) -> str:
+        """Format gathered context for the prompt."""
+        parts = [f"# {item['file']}\n{item['compiled']}" for item in self.context]
+        for value in self.online_context.values():
+            pages = value.get("webpages", [])
+            for page in pages:
+                parts.append(f"# {page['link']}\n{page['snippet']}")
+            if not pages:
+                parts.extend(f"# {result['link']}\n{result['snippet']}" for result in value.get("organic", []))
+        for value in self.code_context.values():
+            results = value["results"]
+            output = "\n".join(filter(None, [results["std_out"], results["output"], results["error"]]))
+            parts.append(f"# Code\n{value['code']}\n# Output\n{output}")
+        return "\n\n".join(parts)
+
+    def as_train_of_thought(self) -> List[Dict[str, str]]:
+        if self.reused:
+            return [{"type": "tool", "data": "Reused tool results from this turn"}]
+        return [output.as_train_of_thought() for output in self.outputs]
+
+
+ToolFunction = Callable[[str, int, ToolOutput], Awaitable[None]]
+
+
+async def search_notes(query: str, user_id: int, output: ToolOutput) -> None:
+    """Search the user's indexed notes."""
+    entries = await asearch_entries(user_id, query, settings.NOTES_TOOL_MAX_RESULTS)
+    for entry in entries:
+        output.context.append({"compiled": entry.compiled, "file": entry.file_name or entry.file_path or ""})
+
+
+async def _read_pages(urls: Sequence[str], query: str, output: ToolOutput, key: Optional[str] = None) -> None:
+    """Read pages concurrently, adding each to the output as soon as it is read."""
+
+    async def read(url: str) -> None:
+        page = await web_scraper.read(url)
+        if page is None:
+            return
+        webpage = {"link": url, "query": query, "snippet": page.content[:settings.WEBPAGE_TOOL_MAX_CHARS]}
+        output.online_context.setdefault(key or url, {}).setdefault("webpages", []).append(webpage)
+
+    await asyncio.gather(*[read(url) for url in urls], return_exceptions=True)
+
+
+async def search_online(query: str, user_id: int, output: ToolOutput) -> None:
+    """Search the web for the query and read the top results."""
+    results = await web_scraper.search(query)
+    if not results:
+        return
+    output.online_context[query] = {"organic": results}
+    await _read_pages([result["link"] for result in results[:settings.WEB_SEARCH_MAX_PAGES]], query, output, key=query)
+
+
+async def read_webpages(query: str, user_id: int, output: ToolOutput) -> None:
+    """Read the webpages linked in the query concurrently."""
+    urls = list(dict.fromkeys(_url_pattern.findall(query)))[:settings.WEBPAGE_TOOL_MAX_URLS]
+    await _read_pages(urls, query, output)
+
+
+async def run_code(query: str, user_id: int, output: ToolOutput) -> None:
+    """Run the Python code blocks in the query in the code sandbox."""
+    snippets = [code for code in _code_block_pattern.findall(query) if code.strip()][:settings.CODE_TOOL_MAX_SNIPPETS]
+    for index, code in enumerate(snippets, start=1):
+        result = await code_sandbox.execute(code)
+        output.code_context[f"snippet_{index}"] = result.as_context()
+
+
+TOOLS: Dict[str, ToolFunction] = {
+    InputTool.NOTES.value: search_notes,
+    InputTool.ONLINE.value: search_online,
+    InputTool.WEBPAGE.value: read_webpages,
+    InputTool.CODE.value: run_code,
+}
+
+# Tool results per chat turn, so regenerating an answer does not re-run retrieval
+_tool_results_cache = TTLCache(maxsize=settings.TOOL_RESULTS_CACHE_MAX_ENTRIES, ttl=settings.TOOL_RESULTS_CACHE_TTL_SECONDS)
+
+
+async def _run_tool(name: str, tool: ToolFunction, query: str, user_id: int, deadline: float) -> ToolOutput:
+    output = ToolOutput(tool=name)
+    loop = asyncio.get_running_loop()
+    timeout = max(0.0, min(settings.TOOL_TIMEOUT_SECONDS, deadline - loop.time()))
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(tool(query, user_id, output), timeout)
+    except asyncio.TimeoutError:
+        output.timed_out = True
+    except Exception as e:
+        # A failing tool should not fail the chat turn
+        output.error = str(e) or type(e).__name__
+    output.latency = time.perf_counter() - start
+    return output
+
+
+async def run_tools(tools: Sequence[str], query: str, user_id: int, turn_key: Hashable) -> ToolResults:
+    """Run the enabled tools concurrently under a shared deadline.
+
+    Complete results are cached by turn_key, which identifies one chat turn, so only a
+    regeneration of that turn reuses them. Partial results of timed out or failed tools
+    are never reused.
+    """
+    enabled = [name for name in dict.fromkeys(tools) if name in TOOLS]
+    cache_key = (turn_key, query, tuple(sorted(enabled)))
+    cached = _tool_results_cache.get(cache_key)
+    if cached is not None:
+        return ToolResults(outputs=cached.outputs, reused=True)
+
+    deadline = asyncio.get_running_loop().time() + settings.TOOLS_DEADLINE_SECONDS
+    outputs = await asyncio.gather(*[_run_tool(name, TOOLS[name], query, user_id, deadline) for name in enabled])
+    results = ToolResults(outputs=list(outputs))
+    if not any(output.error or output.timed_out for output in outputs):
+        _tool_results_cache.set(cache_key, results)
+    return results
+
+
+async def aclose() -> None:
+    """Close the web scraper's connections and workers."""
+    await web_scraper.aclose()
+
+
+metrics.register("tool_results_cache", _tool_results_cache.stats)
@@ -0,0 +1,295 @@
+import asyncio
+import ipaddress
+import multiprocessing
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote, urljoin, urlsplit, urlunsplit
+
+import httpx
+from fastapi.concurrency import run_in_threadpool
+
+from app.core import metrics
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.config_cache import ConfigSnapshot, config_cache
+from app.core.singleflight import SingleFlight
+from app.processor.html_text import extract_readable_text
+from app.processor.model_clients import LatencyTracker
+from app.schemas.integration import WebScraperType
+
+
+class ScrapeError(Exception):
+    """Raised when a scraper cannot read a page."""
+
+
+@dataclass(frozen=True)
+class ScraperConfig:
+    """Snapshot of a configured web scraper."""
+    name: str
+    type: str
+    api_url: Optional[str] = None
+    api_key: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class WebPage:
+    url: str
+    title: Optional[str]
+    content: str
+    scraper: str
+
+
+DIRECT_SCRAPER = ScraperConfig(name="Direct", type=WebScraperType.DIRECT)
+
+
+def load_scrapers(config: ConfigSnapshot) -> List[ScraperConfig]:
+    """Configured scrapers, lowest priority number first. Falls back to fetching pages directly."""
+    return [
+        ScraperConfig(name=scraper.name or scraper.type, type=scraper.type, api_url=scraper.api_url, api_key=scraper.api_key)
+        for scraper in config.web_scrapers
+    ] or [DIRECT_SCRAPER]
+
+
+def _auth_headers(config: ScraperConfig) -> Dict[str, str]:
+    return {"Authorization": f"Bearer {config.api_key}"} if config.api_key else {}
+
+
+def _is_public(address: str) -> bool:
+    try:
+        return ipaddress.ip_address(address).is_global
+    except ValueError:
+        # e.g. scoped IPv6 addresses
+        return False
+
+
+class WebScraperPipeline:
+    """Read web pages through the configured scrapers.
+
+    Scrapers are tried in priority order, each under its own timeout. A failure moves on to
+    the next scraper immediately, and a slow scraper is hedged by starting the next one after
+    a delay, keeping whichever answers first. HTML is reduced to readable text in a worker
+    pool, and pages are cached by URL.
+    """
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pages = TTLCache(maxsize=settings.WEB_PAGE_CACHE_MAX_ENTRIES, ttl=settings.WEB_PAGE_CACHE_TTL_SECONDS)
+        self._flight = SingleFlight("web_page")
+        self._latency: Dict[str, LatencyTracker] = {}
+        self.hedges = 0
+        self.failures = 0
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=settings.WEB_SCRAPER_TIMEOUT_SECONDS,
+                headers={"User-Agent": "Mozilla/5.0 (compatible; Khoj)"},
+            )
+        return self._client
+
+    async def scrapers(self) -> List[ScraperConfig]:
+        return load_scrapers(await config_cache.aget())
+
+    async def extract(self, html: str) -> Tuple[Optional[str], str]:
+        """Extract readable text off the event loop."""
+        if settings.WEB_EXTRACT_WORKERS <= 0:
+            return await run_in_threadpool(extract_readable_text, html, settings.WEB_PAGE_MAX_CHARS)
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=settings.WEB_EXTRACT_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, extract_readable_text, html, settings.WEB_PAGE_MAX_CHARS)
+
+    async def read(self, url: str) -> Optional[WebPage]:
+        """Read a page, from cache when fresh. Returns None if every scraper failed."""
+        page = self._pages.get(url)
+        if page is not None:
+            return page
+        try:
+            page = await self._flight.do(url, lambda: self._scrape(url))
+        except ScrapeError:
+            self.failures += 1
+            return None
+        self._pages.set(url, page)
+        return page
+
+    async def _scrape(self, url: str) -> WebPage:
+        remaining = list(await self.scrapers())
+        pending: Dict["asyncio.Task[WebPage]", ScraperConfig] = {}
+        errors: List[str] = []
+
+        def launch() -> None:
+            config = remaining.pop(0)
+            pending[asyncio.create_task(self._scrape_with(config, url))] = config
+
+        launch()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=settings.WEB_SCRAPER_HEDGE_DELAY_SECONDS if remaining else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    # The current scrapers are slow, race the next one against them
+                    self.hedges += 1
+                    launch()
+                    continue
+                for task in done:
+                    config = pending.pop(task)
+                    if task.exception() is None:
+                        return task.result()
+                    errors.append(f"{config.name}: {task.exception()}")
+                    if remaining:
+                        launch()
+            raise ScrapeError(f"Could not read {url}: {'; '.join(errors)}")
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _scrape_with(self, config: ScraperConfig, url: str) -> WebPage:
+        tracker = self._latency.setdefault(config.name, LatencyTracker())
+        start: Optional[float] = time.perf_counter()
+        ok = False
+        try:
+            page = await asyncio.wait_for(self._fetch(config, url), settings.WEB_SCRAPER_TIMEOUT_SECONDS)
+            ok = True
+            return page
+        except asyncio.TimeoutError:
+            raise ScrapeError("timed out")
+        except httpx.HTTPError as e:
+            raise ScrapeError(str(e) or type(e).__name__)
+        except asyncio.CancelledError:
+            # Lost a hedged race, not a failure of this scraper
+            start = None
+            raise
+        finally:
+            if start is not None:
+                tracker.record(time.perf_counter() - start, ok)
+
+    async def _fetch(self, config: ScraperConfig, url: str) -> WebPage:
+        client = self._get_client()
+        if config.type == WebScraperType.JINA:
+            response = await client.get(f"{config.api_url or 'https://r.jina.ai/'}{url}", headers=_auth_headers(config))
+            response.raise_for_status()
+            content = response.text
+        elif config.type == WebScraperType.FIRECRAWL:
+            response = await client.post(
+                f"{(config.api_url or 'https://api.firecrawl.dev').rstrip('/')}/v1/scrape",
+                json={"url": url, "formats": ["markdown"], "onlyMainContent": True},
+                headers=_auth_headers(config),
+            )
+            response.raise_for_status()
+            content = response.json().get("data", {}).get("markdown") or ""
+        elif config.type == WebScraperType.OLOSTEP:
+            response = await client.get(
+                config.api_url or "https://agent.olostep.com/olostep-p2p-incomingAPI",
+                params={"url": url, "saveMarkdown": True, "removeImages": True, "fastLane": True},
+                headers=_auth_headers(config),
+            )
+            response.raise_for_status()
+            content = response.json().get("markdown_content") or ""
+        else:
+            return await self._fetch_direct(url)
+
+        if not content.strip():
+            raise ScrapeError("empty page")
+        return WebPage(url=url, title=None, content=content[:settings.WEB_PAGE_MAX_CHARS], scraper=config.name)
+
+    async def _fetch_direct(self, url: str) -> WebPage:
+        """Fetch and extract a page ourselves, refusing private addresses and oversized bodies."""
+        client = self._get_client()
+        target = url
+        for _ in range(settings.WEB_SCRAPER_MAX_REDIRECTS + 1):
+            request_url, headers, extensions = await self._pin_public(target)
+            async with client.stream(
+                "GET", request_url, headers=headers, extensions=extensions, follow_redirects=False
+            ) as response:
+                if response.is_redirect:
+                    target = urljoin(target, response.headers["location"])
+                    continue
+                response.raise_for_status()
+                body = bytearray()
+                async for chunk in response.aiter_bytes():
+                    body += chunk
+                    if len(body) > settings.WEB_PAGE_MAX_BYTES:
+                        break
+                content_type = response.headers.get("content-type", "")
+                text = bytes(body[:settings.WEB_PAGE_MAX_BYTES]).decode(response.encoding or "utf-8", errors="replace")
+            if "html" in content_type:
+                title, text = await self.extract(text)
+            elif content_type.startswith("text/"):
+                title, text = None, text[:settings.WEB_PAGE_MAX_CHARS]
+            else:
+                raise ScrapeError(f"unsupported content type {content_type or 'unknown'}")
+            if not text.strip():
+                raise ScrapeError("empty page")
+            return WebPage(url=url, title=title, content=text, scraper=DIRECT_SCRAPER.name)
+        raise ScrapeError("too many redirects")
+
+    async def _pin_public(self, url: str) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
+        """Resolve a URL's host, refusing private addresses, and pin the request to the address checked.
+
+        Returns the URL, headers and request extensions to send. The URL names the checked IP
+        address, so the connection cannot be redirected by the name resolving differently a
+        second time (DNS rebinding). The Host header and TLS server name keep the original host.
+        """
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ScrapeError("only http(s) URLs can be read")
+        if settings.WEB_SCRAPER_ALLOW_PRIVATE_URLS:
+            return url, {}, {}
+        infos = await asyncio.get_running_loop().getaddrinfo(
+            parts.hostname, parts.port or (443 if parts.scheme == "https" else 80), type=socket.SOCK_STREAM
+        )
+        addresses = [info[4][0] for info in infos]
+        if not addresses or not all(_is_public(address) for address in addresses):
+            raise ScrapeError("refusing to read a private address")
+
+        host = f"[{addresses[0]}]" if ":" in addresses[0] else addresses[0]
+        pinned = urlunsplit(parts._replace(netloc=host if parts.port is None else f"{host}:{parts.port}"))
+        headers = {"Host": parts.netloc.rpartition("@")[2]}
+        extensions = {"sni_hostname": parts.hostname} if parts.scheme == "https" else {}
+        return pinned, headers, extensions
+
+    async def search(self, query: str) -> List[Dict[str, str]]:
+        """Search the web through a configured Jina scraper. Returns organic results."""
+        config = next((scraper for scraper in await self.scrapers() if scraper.type == WebScraperType.JINA and scraper.api_key), None)
+        if config is None:
+            return []
+        response = await self._get_client().get(
+            f"https://s.jina.ai/{quote(query)}",
+            headers={**_auth_headers(config), "Accept": "application/json", "X-Respond-With": "no-content"},
+        )
+        response.raise_for_status()
+        return [
+            {"title": result.get("title", ""), "link": result["url"], "snippet": result.get("description", "")}
+            for result in response.json().get("data", [])[:settings.WEB_SEARCH_MAX_RESULTS]
+            if result.get("url")
+        ]
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pages": self._pages.stats(),
+            "hedges": self.hedges,
+            "failures": self.failures,
+            "scrapers": {name: tracker.stats() for name, tracker in list(self._latency.items())},
+        }
+
+
+web_scraper = WebScraperPipeline()
+
+metrics.register("web_scraper", web_scraper.stats)
@@ -1,6 +1 @@
-from app.schemas.user import *
-from app.schemas.ai_models import *
-from app.schemas.conversation import *
-from app.schemas.content import *
-from app.schemas.integration import *
-from app.schemas.utility import *
+# Import schemas from their modules, e.g. app.schemas.user, so importing one does not build them all
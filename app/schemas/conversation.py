@@ -67,6 +67,7 @@ class AgentBase(BaseModel):
     style_icon: StyleIcon = StyleIcon.LIGHTBULB
     privacy_level: PrivacyLevel = PrivacyLevel.PRIVATE
     is_hidden: bool = False
+    cache_responses: bool = True
 
 
 class AgentCreate(AgentBase):
@@ -131,6 +132,7 @@ class Conversation(ConversationBase):
     user_id: int
     client_id: Optional[int] = None
     agent_id: Optional[int] = None
+    archived_at: Optional[datetime] = None
     created_at: datetime
     updated_at: datetime
 
@@ -159,9 +161,39 @@ class PublicConversation(PublicConversationBase):
         orm_mode = True
 
 
+class PublicConversationSnapshot(PublicConversationBase):
+    agent_id: Optional[int] = None
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        orm_mode = True
+
+
+class ChatSearchResult(BaseModel):
+    conversation_id: str
+    turn_id: Optional[str] = None
+    by: Optional[str] = None
+    created: Optional[str] = None
+    snippet: str
+
+
+class ImportReport(BaseModel):
+    conversations: int = 0
+    messages: int = 0
+    reassigned_ids: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    conversations_per_second: float = 0.0
+    messages_per_second: float = 0.0
+    megabytes_per_second: float = 0.0
+
+
 class MessageCreate(BaseModel):
     message: str
     command: Optional[str] = None
+    # Regenerate the answer to an earlier turn, reusing that turn's tool results
+    turn_id: Optional[str] = None
 
 
 class UserConversationConfigBase(BaseModel):
@@ -54,7 +54,7 @@ class ApiTokenCreate(BaseModel):
 
 class ApiToken(BaseModel):
     id: int
-    token: str
+    token: Optional[str] = None  # Only returned when the token is created
     name: str
     accessed_at: Optional[datetime] = None
 
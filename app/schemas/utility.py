@@ -1,4 +1,4 @@
-from typing import Optional, List
+from typing import Dict, Optional, List
 from pydantic import BaseModel, Field
 from datetime import datetime
 
@@ -59,6 +59,29 @@ class UserRequests(UserRequestsBase):
         orm_mode = True
 
 
+class UsageCounterBase(BaseModel):
+    slug: str
+    bucket_seconds: int
+    bucket_start: datetime
+    count: int = 0
+
+
+class UsageCounter(UsageCounterBase):
+    id: int
+    user_id: int
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        orm_mode = True
+
+
+class UsageSummary(BaseModel):
+    since: datetime
+    usage: Dict[str, int]
+    quotas: Dict[str, int]
+
+
 class RateLimitRecordBase(BaseModel):
     identifier: str
     slug: str
@@ -70,6 +93,8 @@ class RateLimitRecordCreate(RateLimitRecordBase):
 
 class RateLimitRecord(RateLimitRecordBase):
     id: int
+    window_start: Optional[datetime] = None
+    count: int = 0
     created_at: datetime
     updated_at: datetime
 
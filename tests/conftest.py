@@ -0,0 +1,49 @@
+"""Settings for the test run, applied before the app is first imported, and a migrated database."""
+import os
+import shutil
+import tempfile
+import uuid
+
+_database_dir = tempfile.mkdtemp(prefix="khoj-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_database_dir}/khoj.db"
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ["STARTUP_WARM_UP"] = "false"
+os.environ["USAGE_DAILY_QUOTAS"] = '{"free": {}, "standard": {}}'
+# Fail requests that lazy load their way past the statement budget, see app.db.loading
+os.environ["SQL_STATEMENT_GUARD"] = "raise"
+
+import pytest
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    from app.db.migrate import migrate
+    migrate()
+    yield
+    shutil.rmtree(_database_dir, ignore_errors=True)
+
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def chat_model_id() -> int:
+    """A new chat model, which agents need, visible to the configuration cache."""
+    from app.core.config_cache import config_cache
+    from app.db.database import SessionLocal
+    from app.models.ai_models import ChatModel
+    db = SessionLocal()
+    try:
+        chat_model = ChatModel(name=f"test-{uuid.uuid4().hex[:8]}")
+        db.add(chat_model)
+        db.commit()
+        chat_model_id = chat_model.id
+    finally:
+        db.close()
+    config_cache.invalidate()
+    return chat_model_id
@@ -0,0 +1,94 @@
+"""API tokens: hashed storage, authentication, revocation and access recording, see app.core.api_tokens."""
+import time
+import uuid
+
+import pytest
+
+from app.core.api_tokens import TokenAccessRecorder, TokenRevocations, api_token_cache, hash_api_token
+from app.core.security import get_current_user, validate_api_token
+from app.db.database import SessionLocal
+from app.models.user import KhojApiUser, KhojUser
+
+
+@pytest.fixture
+def api_token(client) -> str:
+    """A new token of a new user, created directly since the endpoints act as user 1."""
+    name = f"token-{uuid.uuid4().hex[:8]}"
+    assert client.post("/api/auth/register", json={"username": name, "password": name, "email": f"{name}@example.com"}).status_code == 200
+    token = uuid.uuid4().hex
+    db = SessionLocal()
+    try:
+        user_id = db.query(KhojUser.id).filter(KhojUser.username == name).scalar()
+        db.add(KhojApiUser(user_id=user_id, token_hash=hash_api_token(token), name=name))
+        db.commit()
+    finally:
+        db.close()
+    return token
+
+
+def _authenticate(token: str):
+    db = SessionLocal()
+    try:
+        return get_current_user(db, token)
+    finally:
+        db.close()
+
+
+def test_only_the_hash_is_stored(client):
+    created = client.post("/api/auth/api-token", json={"name": "hashed"}).json()
+    assert created["token"]
+    db = SessionLocal()
+    try:
+        row = db.get(KhojApiUser, created["id"])
+        assert row.token is None
+        assert row.token_hash == hash_api_token(created["token"])
+    finally:
+        db.close()
+    listed = [token for token in client.get("/api/auth/api-tokens").json() if token["id"] == created["id"]]
+    assert listed == [{**created, "token": None}]
+    assert client.delete(f"/api/auth/api-token/{created['id']}").status_code == 200
+
+
+def test_api_tokens_authenticate(api_token):
+    principal = _authenticate(api_token)
+    assert principal.username.startswith("token-")
+    assert principal.claims["api_token_id"]
+
+
+def test_revocation_reaches_other_workers(api_token):
+    revocations = TokenRevocations(check_interval=60, cache=api_token_cache)
+    revocations.check()
+    db = SessionLocal()
+    try:
+        assert validate_api_token(db, api_token) is not None
+        assert hash_api_token(api_token) in api_token_cache
+    finally:
+        db.close()
+
+    # Revoked by another worker, which only drops its own cached copy
+    db = SessionLocal()
+    try:
+        row = db.query(KhojApiUser).filter(KhojApiUser.token_hash == hash_api_token(api_token)).one()
+        TokenRevocations.revoke(db, row)
+        db.commit()
+    finally:
+        db.close()
+
+    assert revocations.check()
+    assert hash_api_token(api_token) not in api_token_cache
+    assert not revocations.check()
+    db = SessionLocal()
+    try:
+        assert validate_api_token(db, api_token) is None
+    finally:
+        db.close()
+
+
+def test_access_recorder_forgets_idle_tokens():
+    recorder = TokenAccessRecorder(interval=0.05)
+    for token_id in range(10**6, 10**6 + 100):
+        recorder.record(token_id)
+    assert recorder.stats()["tracked"] == 100
+    time.sleep(0.1)
+    recorder.flush()
+    assert recorder.stats()["tracked"] == 0
@@ -0,0 +1,44 @@
+"""Chat history search index, see app.processor.chat_index."""
+import time
+
+from app.processor import chat_index
+from app.processor.chat_index import ChatIndexer, chat_indexer
+
+
+def _search(client, query, conversation_id, timeout=5.0):
+    """Conversation's search hits once the indexer caught up with queued work."""
+    deadline = time.monotonic() + timeout
+    while chat_indexer.stats()["queued"] and time.monotonic() < deadline:
+        time.sleep(0.05)
+    time.sleep(0.2)
+    hits = client.get("/api/chat/search", params={"q": query}).json()
+    return [hit for hit in hits if hit["conversation_id"] == conversation_id]
+
+
+def test_replacing_the_log_reindexes_the_conversation(client):
+    conversation_id = client.post("/api/chat/sessions", json={}).json()["id"]
+    assert client.post(f"/api/chat/sessions/{conversation_id}/message", json={"message": "zebra crossing"}).status_code == 200
+    assert _search(client, "zebra", conversation_id)
+
+    chat = [{"message": "giraffe neck", "by": "user", "created": "2026-01-01T00:00:00", "turnId": "1"}]
+    response = client.put(f"/api/chat/sessions/{conversation_id}", json={"conversation_log": {"chat": chat}})
+    assert response.status_code == 200
+
+    assert _search(client, "zebra", conversation_id) == []
+    assert [hit["turn_id"] for hit in _search(client, "giraffe", conversation_id)] == ["1"]
+
+
+def test_index_is_unavailable_on_other_databases(monkeypatch):
+    monkeypatch.setattr(chat_index.engine.dialect, "name", "postgresql")
+    indexer = ChatIndexer(batch_size=10, max_queue=10)
+    indexer.start()
+    assert not indexer.available
+    indexer.add_messages(1, "conversation", [{"message": "hello"}], block=True)
+
+
+def test_failed_writes_are_counted_and_logged(caplog):
+    indexer = ChatIndexer(batch_size=10, max_queue=10)
+    with caplog.at_level("ERROR", logger=chat_index.__name__):
+        indexer._write([("add", 1, "conversation", ["not a message"])])
+    assert indexer.stats()["failed"] == 1
+    assert "Failed to index" in caplog.text
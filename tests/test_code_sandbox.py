@@ -0,0 +1,67 @@
+import asyncio
+import os
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from app.processor.code_sandbox import CodeResult, CodeSandboxPool
+
+CONFIG_PATH = Path(__file__).resolve().parent.parent / "app" / "core" / "config.py"
+
+
+def _execute(*snippets: str) -> List[CodeResult]:
+    async def run() -> List[CodeResult]:
+        pool = CodeSandboxPool(size=1, max_executions=50)
+        pool.start()
+        try:
+            return [await asyncio.wait_for(pool.execute(code), 30) for code in snippets]
+        finally:
+            await pool.stop()
+
+    return asyncio.run(run())
+
+
+def test_snippets_run_with_the_standard_library():
+    result, threaded = _execute(
+        "import json, statistics, zlib\nprint(json.dumps([1, 2]))\nstatistics.mean([1, 2, 3])",
+        "import threading\nthread = threading.Thread(target=print, args=('from a thread',))\nthread.start()\nthread.join()",
+    )
+    assert result.success, result.error
+    assert result.std_out == "[1, 2]\n"
+    assert result.output == "2"
+    assert threaded.success, threaded.error
+    assert threaded.std_out == "from a thread\n"
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        pytest.param("import subprocess\nsubprocess.run(['id'])", id="subprocess"),
+        pytest.param("import os\nos.fork()", id="fork"),
+        pytest.param("import os\nos.kill(os.getppid(), 0)", id="signal-parent"),
+        pytest.param(f"import os\nos.kill({os.getpid()}, 0)", id="signal-app"),
+        pytest.param("import socket\nsocket.socket()", id="socket"),
+        pytest.param(f"open({str(CONFIG_PATH)!r}).read()", id="read-app-source"),
+    ],
+)
+def test_snippets_are_confined(code):
+    (result,) = _execute(code)
+    assert not result.success
+    assert "PermissionError" in result.error
+
+
+def test_snippets_cannot_write_files(tmp_path):
+    target = tmp_path / "written"
+    (result,) = _execute(f"open({str(target)!r}, 'w').write('escaped')")
+    assert not result.success
+    assert "PermissionError" in result.error
+    assert not target.exists()
+
+
+def test_ctypes_does_not_get_around_the_confinement():
+    (result,) = _execute(
+        f"import ctypes\nlibc = ctypes.CDLL(None)\n(libc.fork(), libc.kill({os.getpid()}, 0))"
+    )
+    assert result.success, result.error
+    assert result.output == "(-1, -1)"
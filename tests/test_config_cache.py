@@ -0,0 +1,90 @@
+"""Configuration cache invalidation, in this worker and across workers, see app.core.config_cache."""
+import uuid
+
+from sqlalchemy import update
+
+from app.core.config_cache import ConfigCache, config_cache, current_version
+from app.db.database import ReadSessionLocal, SessionLocal
+from app.models.ai_models import ChatModel
+
+
+def _version() -> int:
+    db = ReadSessionLocal()
+    try:
+        return current_version(db)
+    finally:
+        db.close()
+
+
+def _add_chat_model() -> int:
+    db = SessionLocal()
+    try:
+        chat_model = ChatModel(name=f"test-{uuid.uuid4().hex[:8]}")
+        db.add(chat_model)
+        db.commit()
+        return chat_model.id
+    finally:
+        db.close()
+
+
+def test_orm_writes_bump_the_version_and_invalidate():
+    before = config_cache.get()
+    chat_model_id = _add_chat_model()
+    assert _version() == before.version + 1
+    snapshot = config_cache.get()
+    assert snapshot.version == before.version + 1
+    assert chat_model_id in snapshot.chat_models
+
+    db = SessionLocal()
+    try:
+        db.delete(db.get(ChatModel, chat_model_id))
+        db.commit()
+    finally:
+        db.close()
+    assert chat_model_id not in config_cache.get().chat_models
+
+
+def test_bulk_updates_invalidate():
+    chat_model_id = _add_chat_model()
+    version = config_cache.get().version
+    renamed = f"renamed-{uuid.uuid4().hex[:8]}"
+    db = SessionLocal()
+    try:
+        db.execute(update(ChatModel).where(ChatModel.id == chat_model_id).values(name=renamed))
+        db.commit()
+    finally:
+        db.close()
+    snapshot = config_cache.get()
+    assert snapshot.version == version + 1
+    assert snapshot.chat_models[chat_model_id].name == renamed
+
+
+def test_rolled_back_writes_leave_the_cache():
+    snapshot = config_cache.get()
+    invalidations = config_cache.invalidations
+    db = SessionLocal()
+    try:
+        db.add(ChatModel(name=f"test-{uuid.uuid4().hex[:8]}"))
+        db.flush()
+        db.rollback()
+        # The next transaction of the session changes no configuration
+        db.commit()
+    finally:
+        db.close()
+    assert config_cache.invalidations == invalidations
+    assert _version() == snapshot.version
+    assert config_cache.get() is snapshot
+
+
+def test_other_workers_converge_through_check():
+    # Another worker's cache, which the commit listeners of this one do not reach
+    other = ConfigCache(check_interval=60, max_age=3600)
+    other.get()
+    assert not other.check()
+
+    chat_model_id = _add_chat_model()
+    assert chat_model_id not in other.get().chat_models
+    assert other.check()
+    assert chat_model_id in other.get().chat_models
+    assert other.get().version == _version()
+    assert not other.check()
@@ -0,0 +1,116 @@
+"""Concurrent appends to conversation logs, see app.processor.conversation.append_chat_messages."""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.main import app
+from app.models.conversation import Conversation
+from app.processor.conversation import append_chat_messages
+
+PARALLEL_SENDS = 300
+
+
+def _version(conversation_id: str) -> int:
+    db = SessionLocal()
+    try:
+        return db.query(Conversation.version).filter(Conversation.id == conversation_id).scalar()
+    finally:
+        db.close()
+
+
+async def _send_in_parallel():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test", timeout=120) as client:
+        conversation_id = (await client.post("/api/chat/sessions", json={})).json()["id"]
+        others = [(await client.post("/api/chat/sessions", json={})).json()["id"] for _ in range(10)]
+        start_version = _version(conversation_id)
+
+        sends = [
+            client.post(f"/api/chat/sessions/{conversation_id}/message", json={"message": f"message {index}"})
+            for index in range(PARALLEL_SENDS)
+        ]
+        sends += [
+            client.post(f"/api/chat/sessions/{other}/message", json={"message": f"other {index}"})
+            for other in others for index in range(5)
+        ]
+        responses = await asyncio.gather(*sends)
+
+        chat = (await client.get(f"/api/chat/sessions/{conversation_id}")).json()["conversation_log"]["chat"]
+        other_chats = [
+            (await client.get(f"/api/chat/sessions/{other}")).json()["conversation_log"]["chat"] for other in others
+        ]
+        return responses, chat, other_chats, start_version, _version(conversation_id)
+
+
+def test_parallel_sends_lose_no_turns(monkeypatch):
+    # Sends that lose the compare-and-swap retry, so they go over the statement budget
+    monkeypatch.setattr(settings, "SQL_STATEMENT_GUARD", "off")
+    responses, chat, other_chats, start_version, end_version = asyncio.run(_send_in_parallel())
+
+    assert [response.status_code for response in responses if response.status_code != 200] == []
+    # Every exchange is kept, as an adjacent user and assistant pair
+    assert len(chat) == 2 * PARALLEL_SENDS
+    assert sorted(message["message"] for message in chat[::2]) == sorted(f"message {index}" for index in range(PARALLEL_SENDS))
+    assert all(user["by"] == "user" and ai["by"] == "assistant" for user, ai in zip(chat[::2], chat[1::2]))
+    assert all(user["turnId"] == ai["turnId"] for user, ai in zip(chat[::2], chat[1::2]))
+    assert [len(other_chat) for other_chat in other_chats] == [10] * len(other_chats)
+    # One version per committed append
+    assert end_version == start_version + PARALLEL_SENDS
+
+
+def test_threaded_appends_take_consecutive_versions():
+    db = SessionLocal()
+    conversation = Conversation(id="threaded-appends", user_id=1, conversation_log={"chat": []}, slug="threaded-appends")
+    db.add(conversation)
+    db.commit()
+    start_version = conversation.version
+    db.close()
+
+    def append(index: int) -> int:
+        db = SessionLocal()
+        try:
+            message = {"message": f"message {index}", "by": "user", "turnId": str(index)}
+            return append_chat_messages(db, "threaded-appends", [message]).version
+        finally:
+            db.close()
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        versions = list(executor.map(append, range(200)))
+
+    assert sorted(versions) == list(range(start_version + 1, start_version + 201))
+    db = SessionLocal()
+    try:
+        chat = db.get(Conversation, "threaded-appends").conversation_log["chat"]
+    finally:
+        db.close()
+    assert sorted(int(message["turnId"]) for message in chat) == list(range(200))
+
+
+def _race_next_flush(conversation_id: str):
+    """Bump the conversation's version right before the next flush, as a concurrent writer would."""
+
+    def bump(session, flush_context, instances):
+        session.connection().execute(
+            update(Conversation).where(Conversation.id == conversation_id).values(version=Conversation.version + 1)
+        )
+
+    event.listen(Session, "before_flush", bump, once=True)
+
+
+def test_update_racing_a_write_conflicts(client):
+    conversation_id = client.post("/api/chat/sessions", json={"title": "before"}).json()["id"]
+    _race_next_flush(conversation_id)
+    response = client.put(f"/api/chat/sessions/{conversation_id}", json={"title": "after"})
+    assert response.status_code == 409
+    assert client.get(f"/api/chat/sessions/{conversation_id}").json()["title"] == "before"
+
+
+def test_delete_racing_a_write_retries(client):
+    conversation_id = client.post("/api/chat/sessions", json={}).json()["id"]
+    _race_next_flush(conversation_id)
+    assert client.delete(f"/api/chat/sessions/{conversation_id}").status_code == 200
+    assert client.get(f"/api/chat/sessions/{conversation_id}").status_code == 404
@@ -0,0 +1,119 @@
+"""Export and import round trip, see app.processor.conversation_transfer.
+
+The synthetic history is EXPORT_ROUND_TRIP_BYTES long, 8 MB by default. Run it at 1 GB with
+EXPORT_ROUND_TRIP_BYTES=1000000000 python -m pytest tests/test_conversation_transfer.py
+"""
+import asyncio
+import hashlib
+import json
+import os
+import uuid
+import zlib
+
+import pytest
+
+from app.core.config import settings
+from app.processor.conversation_transfer import export_conversations, import_conversations
+
+ROUND_TRIP_BYTES = int(os.getenv("EXPORT_ROUND_TRIP_BYTES", 8 * 1024 * 1024))
+MESSAGES_PER_CONVERSATION = 50
+MESSAGE_TEXT = "lorem ipsum dolor sit amet " * 40
+
+
+class History:
+    """Synthetic export stream, fingerprinting the messages it yields."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.prefix = uuid.uuid4().hex[:8]
+        self.digest = hashlib.sha256()
+        self.conversations = 0
+        self.messages = 0
+
+    async def stream(self):
+        sent = 0
+        while sent < self.size:
+            conversation_id = f"{self.prefix}-{self.conversations:08d}"
+            lines = [{"type": "conversation", "id": conversation_id, "slug": conversation_id, "created_at": "2026-01-01T00:00:00"}]
+            for index in range(MESSAGES_PER_CONVERSATION):
+                message = {"message": MESSAGE_TEXT, "by": "user" if index % 2 == 0 else "assistant", "turnId": str(index // 2)}
+                lines.append({"type": "message", "conversation_id": conversation_id, "message": message})
+                self.digest.update(json.dumps(message, sort_keys=True).encode())
+            chunk = b"".join(json.dumps(line).encode() + b"\n" for line in lines)
+            sent += len(chunk)
+            self.conversations += 1
+            self.messages += MESSAGES_PER_CONVERSATION
+            yield chunk
+
+
+def _exported(user_id: int, compress: bool):
+    """Export a user's history. Returns its message fingerprint, counts, largest chunk and the stream."""
+    digest = hashlib.sha256()
+    conversations = messages = largest_chunk = 0
+    decompressor = zlib.decompressobj(wbits=31) if compress else None
+    pending = b""
+    for chunk in export_conversations(user_id, compress):
+        largest_chunk = max(largest_chunk, len(chunk))
+        data = decompressor.decompress(chunk) if decompressor else chunk
+        *lines, pending = (pending + data).split(b"\n")
+        for line in lines:
+            record = json.loads(line)
+            if record["type"] == "conversation":
+                conversations += 1
+            else:
+                messages += 1
+                digest.update(json.dumps(record["message"], sort_keys=True).encode())
+    assert pending == b""
+    return digest.hexdigest(), conversations, messages, largest_chunk
+
+
+async def _chunks(user_id: int, compress: bool):
+    for chunk in export_conversations(user_id, compress):
+        yield chunk
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_export_import_round_trip(client, compress):
+    source_user, target_user = (2, 3) if not compress else (4, 5)
+    history = History(ROUND_TRIP_BYTES)
+    report = asyncio.run(import_conversations(source_user, history.stream()))
+    assert (report.conversations, report.messages) == (history.conversations, history.messages)
+
+    digest, conversations, messages, largest_chunk = _exported(source_user, compress)
+    assert (digest, conversations, messages) == (history.digest.hexdigest(), history.conversations, history.messages)
+    # Streamed in bounded chunks whatever the size of the history, at most one line past the chunk size
+    assert largest_chunk <= settings.CONVERSATION_EXPORT_CHUNK_BYTES + 4096
+
+    # Importing the export again, here into another user, reassigns the ids already taken
+    report = asyncio.run(import_conversations(target_user, _chunks(source_user, compress)))
+    assert (report.conversations, report.messages, report.reassigned_ids) == (
+        history.conversations, history.messages, history.conversations
+    )
+    assert _exported(target_user, compress)[:3] == (digest, conversations, messages)
+
+
+async def _lines(*records):
+    yield b"".join(json.dumps(record).encode() + b"\n" for record in records)
+
+
+def test_duplicate_ids_in_one_file_are_reassigned(client):
+    conversation_id = f"duplicate-{uuid.uuid4().hex[:8]}"
+    message = {"message": "hello", "by": "user"}
+    records = [
+        {"type": "conversation", "id": conversation_id},
+        {"type": "message", "conversation_id": conversation_id, "message": message},
+    ] * 2
+    report = asyncio.run(import_conversations(6, _lines(*records)))
+    assert (report.conversations, report.messages, report.reassigned_ids) == (2, 2, 1)
+    assert _exported(6, False)[1:3] == (2, 2)
+
+
+@pytest.mark.parametrize("line", [b"[1, 2]", b'"conversation"', b"null", b"{not json"])
+def test_invalid_lines_are_rejected(client, line):
+    async def body():
+        yield line + b"\n"
+
+    with pytest.raises(ValueError):
+        asyncio.run(import_conversations(7, body()))
+    response = client.post("/api/chat/import", content=line + b"\n")
+    assert response.status_code == 400
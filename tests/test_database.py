@@ -0,0 +1,185 @@
+"""Writer queue and read-only pool, see the SQLite production mode in app.db.database."""
+import asyncio
+import gzip
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import select, update
+
+from app.db.database import (
+    AsyncReadSessionLocal,
+    AsyncSessionLocal,
+    ReadSessionLocal,
+    SessionLocal,
+    async_engine,
+    async_read_engine,
+    engine,
+    read_engine,
+    writer_queue,
+)
+from app.models.conversation import Conversation, PublicConversation
+from app.processor.conversation_transfer import export_conversations
+from app.processor.public_snapshots import PublicSnapshotStore
+
+WRITER_THREADS = 16
+WRITER_TASKS = 16
+WRITES_PER_THREAD = 25
+# Well under SQLITE_WRITE_QUEUE_TIMEOUT_SECONDS, which a read queued behind the writer would wait
+READ_TIMEOUT_SECONDS = 5
+
+
+def _add_conversation(**values) -> str:
+    conversation_id = f"db-{uuid.uuid4().hex[:8]}"
+    db = SessionLocal()
+    try:
+        db.add(Conversation(id=conversation_id, user_id=1, slug=conversation_id, conversation_log={"chat": []}, **values))
+        db.commit()
+    finally:
+        db.close()
+    return conversation_id
+
+
+def _read_version(conversation_id: str) -> int:
+    db = ReadSessionLocal()
+    try:
+        return db.execute(select(Conversation.version).where(Conversation.id == conversation_id)).scalar_one()
+    finally:
+        db.close()
+
+
+def test_production_mode_splits_writer_and_readers():
+    assert engine.pool.size() == 1
+    assert read_engine is not engine
+    assert async_engine.pool.size() == 1
+    assert async_read_engine is not async_engine
+    assert writer_queue is not None
+
+
+def test_concurrent_writers_queue_for_the_writer():
+    conversation_id = _add_conversation()
+    start = _read_version(conversation_id)
+
+    def increment() -> None:
+        # Read, then write in the same transaction. A lost update means two writers overlapped
+        for _ in range(WRITES_PER_THREAD):
+            db = SessionLocal()
+            try:
+                version = db.execute(select(Conversation.version).where(Conversation.id == conversation_id)).scalar_one()
+                db.execute(update(Conversation).where(Conversation.id == conversation_id).values(version=version + 1))
+                db.commit()
+            finally:
+                db.close()
+
+    with ThreadPoolExecutor(WRITER_THREADS) as pool:
+        for future in [pool.submit(increment) for _ in range(WRITER_THREADS)]:
+            future.result()
+
+    assert _read_version(conversation_id) == start + WRITER_THREADS * WRITES_PER_THREAD
+
+
+def test_async_writers_queue_with_sync_writers():
+    conversation_id = _add_conversation()
+    start = _read_version(conversation_id)
+
+    def increment() -> None:
+        for _ in range(WRITES_PER_THREAD):
+            db = SessionLocal()
+            try:
+                version = db.execute(select(Conversation.version).where(Conversation.id == conversation_id)).scalar_one()
+                db.execute(update(Conversation).where(Conversation.id == conversation_id).values(version=version + 1))
+                db.commit()
+            finally:
+                db.close()
+
+    async def aincrement() -> None:
+        for _ in range(WRITES_PER_THREAD):
+            async with AsyncSessionLocal() as db:
+                version = (await db.execute(select(Conversation.version).where(Conversation.id == conversation_id))).scalar_one()
+                await db.execute(update(Conversation).where(Conversation.id == conversation_id).values(version=version + 1))
+                await db.commit()
+
+    async def run() -> None:
+        # The async pool waits on an asyncio queue, which belongs to the first event loop that waited on it
+        await async_engine.dispose()
+        try:
+            await asyncio.gather(*(aincrement() for _ in range(WRITER_TASKS)))
+        finally:
+            await async_engine.dispose()
+
+    # Sync writers in threads and async writers on an event loop at the same time
+    with ThreadPoolExecutor(WRITER_THREADS) as pool:
+        futures = [pool.submit(increment) for _ in range(WRITER_THREADS)]
+        asyncio.run(run())
+        for future in futures:
+            future.result()
+
+    assert _read_version(conversation_id) == start + (WRITER_THREADS + WRITER_TASKS) * WRITES_PER_THREAD
+    assert writer_queue.stats()["waiting"] == 0
+
+
+def test_cancelled_async_writer_leaves_the_queue():
+    writer = SessionLocal()
+    try:
+        writer.execute(update(Conversation).where(Conversation.id == "none").values(title="held"))
+
+        async def run() -> None:
+            async def write() -> None:
+                async with AsyncSessionLocal() as db:
+                    await db.execute(update(Conversation).where(Conversation.id == "none").values(title="async"))
+                    await db.commit()
+
+            task = asyncio.ensure_future(write())
+            await asyncio.sleep(0.1)
+            assert writer_queue.stats()["waiting"] == 1
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        asyncio.run(run())
+        assert writer_queue.stats()["waiting"] == 0
+        writer.commit()
+    finally:
+        writer.close()
+
+    # The turn went back rather than to the cancelled writer
+    assert not writer_queue.stats()["held"]
+
+
+def test_reads_do_not_wait_for_an_open_write():
+    conversation_id = _add_conversation(title="before")
+    slug = f"public-{uuid.uuid4().hex[:8]}"
+    db = SessionLocal()
+    try:
+        db.add(PublicConversation(source_owner_id=1, slug=slug, snapshot=gzip.compress(b"{}"), snapshot_etag='"etag"'))
+        db.commit()
+    finally:
+        db.close()
+
+    def read_title() -> str:
+        db = ReadSessionLocal()
+        try:
+            return db.execute(select(Conversation.title).where(Conversation.id == conversation_id)).scalar_one()
+        finally:
+            db.close()
+
+    writer = SessionLocal()
+    try:
+        # Hold the only writer connection in an uncommitted write
+        writer.execute(update(Conversation).where(Conversation.id == conversation_id).values(title="after"))
+        with ThreadPoolExecutor(3) as pool:
+            title = pool.submit(read_title)
+            export = pool.submit(lambda: b"".join(export_conversations(1)))
+            snapshot = pool.submit(PublicSnapshotStore(maxsize=1, ttl=60).load, slug)
+            assert title.result(timeout=READ_TIMEOUT_SECONDS) == "before"
+            assert conversation_id.encode() in export.result(timeout=READ_TIMEOUT_SECONDS)
+            assert snapshot.result(timeout=READ_TIMEOUT_SECONDS).etag == '"etag"'
+
+            async def aread_title() -> str:
+                async with AsyncReadSessionLocal() as db:
+                    return (await db.execute(select(Conversation.title).where(Conversation.id == conversation_id))).scalar_one()
+
+            async_title = pool.submit(asyncio.run, aread_title())
+            assert async_title.result(timeout=READ_TIMEOUT_SECONDS) == "before"
+        writer.commit()
+    finally:
+        writer.close()
+    assert read_title() == "after"
@@ -0,0 +1,107 @@
+"""Schema creation as a deploy step, see app.db.migrate. Each case runs on its own database file."""
+import hashlib
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+from pathlib import Path
+
+from alembic.script import ScriptDirectory
+
+from app.db.migrate import alembic_config
+
+ROOT = Path(__file__).resolve().parent.parent
+HEAD = ScriptDirectory.from_config(alembic_config()).get_current_head()
+
+
+SCHEMA_MATCHES_MODELS = """
+from alembic.autogenerate import compare_metadata
+from alembic.runtime.migration import MigrationContext
+from app.db.database import Base, engine
+from app.db.migrate import include_name
+with engine.connect() as connection:
+    context = MigrationContext.configure(connection, opts={"include_name": include_name})
+    assert not compare_metadata(context, Base.metadata), compare_metadata(context, Base.metadata)
+"""
+
+
+def _python(database: Path, code: str) -> None:
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{database}"}
+    subprocess.run([sys.executable, "-W", "ignore", "-c", code], cwd=ROOT, env=env, check=True)
+
+
+def _tables(database: Path) -> set:
+    connection = sqlite3.connect(database)
+    try:
+        return {name for (name,) in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    finally:
+        connection.close()
+
+
+def _revision(database: Path) -> str:
+    connection = sqlite3.connect(database)
+    try:
+        return connection.execute("SELECT version_num FROM alembic_version").fetchone()[0]
+    finally:
+        connection.close()
+
+
+def test_importing_the_app_creates_no_tables(tmp_path):
+    database = tmp_path / "import.db"
+    _python(database, "import app.main")
+    assert not database.exists() or not _tables(database)
+
+
+def test_migrate_creates_an_empty_database(tmp_path):
+    database = tmp_path / "empty.db"
+    _python(database, "from app.db.migrate import migrate; migrate()")
+    assert {"users", "conversations", "alembic_version"} <= _tables(database)
+    assert _revision(database) == HEAD
+
+
+def test_migrate_upgrades_a_baseline_database(tmp_path):
+    # The committed khoj.db was made by create_all before migrations existed
+    database = tmp_path / "baseline.db"
+    shutil.copyfile(ROOT / "khoj.db", database)
+    assert "alembic_version" not in _tables(database)
+    connection = sqlite3.connect(database)
+    try:
+        connection.execute(
+            "INSERT INTO conversations (id, user_id, conversation_log, file_filters, created_at, updated_at) "
+            "VALUES ('baseline', 1, ?, '[]', '2026-01-01 00:00:00', '2026-01-01 00:00:00')",
+            ('{"chat": [{"message": "backfilled walrus", "by": "user", "turnId": "1"}]}',),
+        )
+        connection.execute("INSERT INTO api_tokens (user_id, token, name) VALUES (1, 'plaintext', 'baseline')")
+        connection.commit()
+    finally:
+        connection.close()
+    _python(database, "from app.db.migrate import migrate; migrate()")
+    assert _revision(database) == HEAD
+    assert {"conversation_archives", "usage_counters", "chat_message_fts"} <= _tables(database)
+    # Messages stored before the chat search index existed are indexed by the migration
+    connection = sqlite3.connect(database)
+    try:
+        hits = connection.execute("SELECT conversation_id, turn_id FROM chat_message_fts WHERE chat_message_fts MATCH 'walrus'").fetchall()
+        api_tokens = connection.execute("SELECT token, token_hash FROM api_tokens WHERE name = 'baseline'").fetchall()
+    finally:
+        connection.close()
+    assert hits == [("baseline", "1")]
+    # Only the hash of a token is kept
+    assert api_tokens == [(None, hashlib.sha256(b"plaintext").hexdigest())]
+    _python(database, SCHEMA_MATCHES_MODELS)
+    _python(database, "from fastapi.testclient import TestClient\nfrom app.main import app\n"
+                      "assert TestClient(app).get('/api/chat/sessions').status_code == 200")
+    # Migrating again is a no-op
+    _python(database, "from app.db.migrate import migrate; migrate()")
+    assert _revision(database) == HEAD
+
+
+def test_migrate_stamps_a_current_create_all_database(tmp_path):
+    database = tmp_path / "create_all.db"
+    _python(database, "import app.models\nfrom app.db.database import Base, engine\nBase.metadata.create_all(engine)")
+    assert "alembic_version" not in _tables(database)
+    _python(database, "from app.db.migrate import migrate; migrate()")
+    assert _revision(database) == HEAD
+    # Stamped before the revisions create_all does not reproduce, which then run
+    assert "chat_message_fts" in _tables(database)
@@ -0,0 +1,163 @@
+"""Retries, circuit breaking and client replacement against a stub model API, see app.processor.model_clients."""
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.processor.model_clients import (
+    CircuitBreaker,
+    CircuitOpenError,
+    ModelApiClient,
+    ModelApiError,
+    ModelClientRegistry,
+)
+
+RESET_SECONDS = 30.0
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(settings, "MODEL_API_BACKOFF_BASE_SECONDS", 0.0)
+
+
+def _client(handler, clock: Clock) -> ModelApiClient:
+    client = ModelApiClient("stub", "http://model.test", transport=httpx.MockTransport(handler))
+    client.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=RESET_SECONDS, clock=clock)
+    return client
+
+
+def _open(client: ModelApiClient, clock: Clock) -> None:
+    client.breaker.record_failure()
+    assert client.breaker.state == CircuitBreaker.OPEN
+    clock.now += RESET_SECONDS
+
+
+def test_retries_transient_errors():
+    statuses = iter([503, 502, 200])
+
+    async def run():
+        client = ModelApiClient("stub", "http://model.test", transport=httpx.MockTransport(lambda request: httpx.Response(next(statuses))))
+        try:
+            return (await client.post("chat/completions")).status_code, client.latency.retries
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(run()) == (200, 2)
+
+
+def test_open_circuit_fails_fast_until_a_probe_succeeds():
+    clock = Clock()
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200)
+
+    async def run():
+        client = _client(handler, clock)
+        _open(client, clock)
+        clock.now -= 1
+        with pytest.raises(CircuitOpenError):
+            await client.post("chat/completions")
+        assert calls == []
+        clock.now += 1
+        await client.post("chat/completions")
+        await client.aclose()
+        return client.breaker.state
+
+    assert asyncio.run(run()) == CircuitBreaker.CLOSED
+
+
+def test_cancelled_probe_reopens_the_circuit():
+    clock = Clock()
+
+    async def hang(request):
+        await asyncio.sleep(60)
+
+    async def run():
+        client = _client(hang, clock)
+        _open(client, clock)
+        probe = asyncio.ensure_future(client.post("chat/completions"))
+        await asyncio.sleep(0.01)
+        assert client.breaker.state == CircuitBreaker.HALF_OPEN
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        state = client.breaker.state
+        # Another probe goes through after the cool-down
+        clock.now += RESET_SECONDS
+        allowed = client.breaker.allow()
+        await client.aclose()
+        return state, allowed
+
+    assert asyncio.run(run()) == (CircuitBreaker.OPEN, True)
+
+
+def test_probe_failing_without_a_transport_error_reopens_the_circuit():
+    clock = Clock()
+
+    def broken(request):
+        raise ValueError("malformed request")
+
+    async def run():
+        client = _client(broken, clock)
+        _open(client, clock)
+        with pytest.raises(ValueError):
+            await client.post("chat/completions")
+        await client.aclose()
+        return client.breaker.state
+
+    assert asyncio.run(run()) == CircuitBreaker.OPEN
+
+
+def test_replaced_client_closes_when_its_requests_finish():
+    async def run():
+        finish = asyncio.Event()
+
+        async def slow(request):
+            await finish.wait()
+            return httpx.Response(200)
+
+        registry = ModelClientRegistry()
+        transport = httpx.MockTransport(slow)
+        old = registry.get(SimpleNamespace(id=1, name="stub", api_base_url="http://model.test", api_key="old"), transport)
+        in_flight = asyncio.ensure_future(old.post("chat/completions"))
+        await asyncio.sleep(0.01)
+        # The key changed, so the registry builds a new client and retires the old one
+        new = registry.get(SimpleNamespace(id=1, name="stub", api_base_url="http://model.test", api_key="new"), transport)
+        await asyncio.sleep(0.01)
+        closed_in_flight = old.client.is_closed
+        finish.set()
+        status = (await in_flight).status_code
+        await old._closing
+        closed_after = old.client.is_closed
+        new_open = not new.client.is_closed
+        await registry.aclose()
+        return closed_in_flight, status, closed_after, new_open
+
+    assert asyncio.run(run()) == (False, 200, True, True)
+
+
+def test_failed_requests_raise_after_retries(monkeypatch):
+    monkeypatch.setattr(settings, "MODEL_API_MAX_RETRIES", 1)
+
+    async def run():
+        client = ModelApiClient("stub", "http://model.test", transport=httpx.MockTransport(lambda request: httpx.Response(503)))
+        try:
+            with pytest.raises(ModelApiError):
+                await client.post("chat/completions")
+            return client.latency.requests
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(run()) == 2
@@ -0,0 +1,37 @@
+import asyncio
+import os
+import signal
+import uuid
+
+from app.core.password_hashing import PasswordHasher
+
+
+def test_login_checks_the_submitted_user(client):
+    username, other = f"alice-{uuid.uuid4().hex[:8]}", f"bob-{uuid.uuid4().hex[:8]}"
+    for name, password in ((username, "alice-secret"), (other, "bob-secret")):
+        assert client.post("/api/auth/register", json={"username": name, "password": password}).status_code == 200
+
+    def login(name: str, password: str) -> int:
+        return client.post("/api/auth/login", data={"username": name, "password": password}).status_code
+
+    assert login(username, "alice-secret") == 200
+    assert login(other, "bob-secret") == 200
+    assert login(username, "bob-secret") == 401
+    assert login(f"nobody-{uuid.uuid4().hex[:8]}", "alice-secret") == 401
+
+
+def test_hasher_replaces_a_broken_pool():
+    hasher = PasswordHasher(workers=1, max_queue=4)
+
+    async def run() -> None:
+        hashed = await hasher.hash("secret")
+        for process in list(hasher._executor._processes.values()):
+            os.kill(process.pid, signal.SIGKILL)
+        # The first call after the worker died finds the pool broken and retries on a new one
+        assert await hasher.verify("secret", hashed) == (True, None)
+        assert await hasher.verify("wrong", hashed) == (False, None)
+
+    try:
+        asyncio.run(run())
+    finally:
+        hasher.shutdown()
@@ -0,0 +1,71 @@
+"""Shared conversation snapshots, ETag revalidation and unsharing, see app.processor.public_snapshots."""
+import asyncio
+import gzip
+
+import pytest
+from sqlalchemy import delete
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.conversation import PublicConversation
+from app.processor.public_snapshots import PublicSnapshotStore, public_snapshots
+
+
+@pytest.fixture
+def slug(client) -> str:
+    conversation_id = client.post("/api/chat/sessions", json={"title": "shared"}).json()["id"]
+    return client.post("/api/chat/share", params={"conversation_id": conversation_id}).json()["slug"]
+
+
+def test_revalidation_with_the_etag_is_not_modified(client, slug):
+    response = client.get(f"/api/chat/share/{slug}", headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert response.json()["slug"] == slug
+    etag = response.headers["ETag"]
+    assert f"stale-while-revalidate={settings.PUBLIC_SNAPSHOT_STALE_WHILE_REVALIDATE_SECONDS}" in response.headers["Cache-Control"]
+
+    revalidated = client.get(f"/api/chat/share/{slug}", headers={"Accept-Encoding": "identity", "If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["ETag"] == etag
+    assert revalidated.content == b""
+
+    # The compressed representation has its own validator
+    compressed = client.get(f"/api/chat/share/{slug}", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert compressed.status_code == 200
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert compressed.headers["ETag"] != etag
+
+
+def test_unshare_stops_serving_the_snapshot(client, slug):
+    assert client.get(f"/api/chat/share/{slug}").status_code == 200
+    assert client.delete(f"/api/chat/share/{slug}").status_code == 200
+    assert client.get(f"/api/chat/share/{slug}").status_code == 404
+
+
+def test_unshare_on_another_worker_stops_serving_the_snapshot(client, slug):
+    assert client.get(f"/api/chat/share/{slug}").status_code == 200
+    # Deleted outside this worker, so its cached copy was not invalidated
+    db = SessionLocal()
+    try:
+        db.execute(delete(PublicConversation).where(PublicConversation.slug == slug))
+        db.commit()
+    finally:
+        db.close()
+    assert client.get(f"/api/chat/share/{slug}").status_code == 404
+
+
+def test_snapshot_changed_on_another_worker_is_reloaded(slug):
+    store = PublicSnapshotStore(maxsize=4, ttl=60)
+    first = asyncio.run(store.get(slug))
+    db = SessionLocal()
+    try:
+        public_conversation = db.query(PublicConversation).filter(PublicConversation.slug == slug).one()
+        public_conversation.snapshot = gzip.compress(b'{"title":"changed"}')
+        public_conversation.snapshot_etag = '"changed"'
+        db.commit()
+    finally:
+        db.close()
+    second = asyncio.run(store.get(slug))
+    assert first.etag != second.etag == '"changed"'
+    assert second.decompressed() == b'{"title":"changed"}'
+    public_snapshots.invalidate(slug)
@@ -0,0 +1,117 @@
+"""Hot queries use indexes on a migrated database, see app.db.query_plans.
+
+Besides the listed HOT_QUERIES, the statements endpoints and background jobs actually
+run are recorded while they are exercised and explained the same way, so a new filter
+without an index fails here even if nobody adds it to the list.
+"""
+import asyncio
+import datetime
+import time
+import uuid
+
+import pytest
+from sqlalchemy import update
+
+from app.core.api_tokens import token_access_recorder
+from app.core.config_cache import load_snapshot
+from app.core.rate_limit import RateLimiter
+from app.core.usage import UsageAccountant
+from app.db.database import SessionLocal, async_engine, async_read_engine, engine, read_engine
+from app.db.query_plans import capture_statements, full_scans
+from app.models.conversation import Conversation
+from app.processor.archive import conversation_archiver
+
+
+def _scans(statements) -> dict:
+    with engine.connect() as connection:
+        return full_scans(connection, statements)
+
+
+@pytest.fixture
+def recorded():
+    with capture_statements(engine, read_engine, async_engine.sync_engine, async_read_engine.sync_engine) as statements:
+        yield statements
+
+
+def test_hot_queries_use_indexes():
+    with engine.connect() as connection:
+        assert full_scans(connection) == {}
+
+
+def test_endpoint_statements_use_indexes(client, chat_model_id, recorded):
+    name = f"plans-{uuid.uuid4().hex[:8]}"
+    assert client.post("/api/auth/register", json={"username": name, "password": name, "email": f"{name}@example.com"}).status_code == 200
+    client.post("/api/auth/login", data={"username": name, "password": name})
+    token_id = client.post("/api/auth/api-token", json={"name": name}).json()["id"]
+    client.get("/api/auth/api-tokens")
+    client.delete(f"/api/auth/api-token/{token_id}")
+
+    agent_id = client.post("/api/chat/options", json={"name": name, "chat_model_id": chat_model_id}).json()["id"]
+    client.get("/api/chat/options")
+    client.get(f"/api/chat/options/{agent_id}")
+    client.put(f"/api/chat/options/{agent_id}", json={"name": name, "chat_model_id": chat_model_id})
+
+    conversation_id = client.post("/api/chat/sessions", json={"title": name, "agent_id": agent_id}).json()["id"]
+    client.get("/api/chat/sessions")
+    client.get(f"/api/chat/sessions/{conversation_id}")
+    client.put(f"/api/chat/sessions/{conversation_id}", json={"title": name, "agent_id": agent_id})
+    client.post(f"/api/chat/sessions/{conversation_id}/message", json={"message": name})
+    client.get("/api/chat/search", params={"q": name})
+    slug = client.post("/api/chat/share", params={"conversation_id": conversation_id}).json()["slug"]
+    client.get(f"/api/chat/share/{slug}")
+    client.delete(f"/api/chat/share/{slug}")
+    client.get("/api/chat/export")
+    client.delete(f"/api/chat/options/{agent_id}")
+    client.delete(f"/api/chat/sessions/{conversation_id}")
+
+    file_name = f"{name}.md"
+    client.post("/api/content/index", files={"files": (file_name, b"plans", "text/markdown")})
+    client.post("/api/content/search", params={"query": "plans"})
+    client.delete("/api/content/index", params={"file_name": file_name})
+
+    client.post("/api/integrations/notion", json={"token": name, "user_id": 1})
+    client.get("/api/integrations/notion")
+    client.delete("/api/integrations/notion")
+    github_id = client.post("/api/integrations/github", json={"pat_token": name, "user_id": 1}).json()["id"]
+    client.post("/api/integrations/github/repo", json={"name": name, "owner": name, "branch": "main", "github_config_id": github_id})
+    client.get("/api/integrations/github/repos")
+    client.delete("/api/integrations/github")
+    client.get("/api/v1/user/usage")
+
+    assert len(recorded) > 20
+    assert _scans(recorded) == {}
+
+
+def test_job_statements_use_indexes(client, recorded):
+    conversation_id = client.post("/api/chat/sessions", json={}).json()["id"]
+    db = SessionLocal()
+    try:
+        db.execute(update(Conversation).where(Conversation.id == conversation_id).values(updated_at=datetime.datetime(2000, 1, 1)))
+        db.commit()
+    finally:
+        db.close()
+    conversation_archiver.archive_batch(idle_days=365, batch_size=10)
+    client.get(f"/api/chat/sessions/{conversation_id}")
+
+    accountant = UsageAccountant(bucket_seconds=60, flush_interval=60, batch_size=10)
+    accountant.record(1, "plans", now=time.time() - 10 * 86400)
+    accountant.flush()
+    accountant.rollup(retention_hours=1)
+    db = SessionLocal()
+    try:
+        accountant.remaining_quota(db, 1, "free", "chat")
+        accountant.usage(db, 1, datetime.datetime(2000, 1, 1), "plans")
+    finally:
+        db.close()
+
+    limiter = RateLimiter(window=60, limits={"free": {"default": 10}}, backend="memory")
+    limiter.hit("ip:127.0.0.1", "plans", 10)
+    limiter.snapshot(dict(limiter._dirty))
+    limiter.restore()
+    asyncio.run(limiter.ahit("ip:127.0.0.1", "plans", 10))
+
+    token_access_recorder.record(1)
+    token_access_recorder.flush()
+    load_snapshot()
+
+    assert _scans(recorded) == {}
@@ -0,0 +1,81 @@
+"""Sliding window rate limits, see app.core.rate_limit."""
+import asyncio
+import uuid
+from types import MappingProxyType
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.core.rate_limit import RateLimiter, RateLimitMiddleware
+from app.core.security import Principal, principal_cache, token_fingerprint
+
+LIMIT = 3
+WINDOW = 60
+
+
+async def _ok(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+@pytest.fixture
+def limiter(monkeypatch) -> RateLimiter:
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    return RateLimiter(window=WINDOW, limits={"free": {"default": LIMIT}, "standard": {"default": 2 * LIMIT}}, backend="memory")
+
+
+def _statuses(limiter: RateLimiter, headers_per_request) -> list:
+    async def run():
+        transport = httpx.ASGITransport(app=RateLimitMiddleware(_ok, limiter))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [(await client.get("/api/chat/sessions", headers=headers)).status_code for headers in headers_per_request]
+
+    return asyncio.run(run())
+
+
+def test_limits_an_address(limiter):
+    assert _statuses(limiter, [{}] * (LIMIT + 1)) == [200] * LIMIT + [429]
+
+
+def test_unknown_tokens_are_charged_to_the_address(limiter):
+    # A new random token per request must not get a fresh limit each time
+    tokens = [{"Authorization": f"Bearer {uuid.uuid4().hex}"} for _ in range(LIMIT + 1)]
+    assert _statuses(limiter, tokens) == [200] * LIMIT + [429]
+    assert _statuses(limiter, [{}]) == [429]
+
+
+def test_known_tokens_are_limited_per_user_and_tier(limiter):
+    token = uuid.uuid4().hex
+    principal = Principal(id=10**6, uuid=str(uuid.uuid4()), username="limited", is_active=True, tier="standard", claims=MappingProxyType({}))
+    principal_cache.set(token_fingerprint(token), principal)
+    hits = principal_cache.hits
+    try:
+        headers = {"Authorization": f"Bearer {token}"}
+        assert _statuses(limiter, [headers] * (2 * LIMIT + 1)) == [200] * (2 * LIMIT) + [429]
+        # Identified by peeking, which leaves the cache's hit rate to authentication
+        assert principal_cache.hits == hits
+        # The user's requests were not charged to the address
+        assert _statuses(limiter, [{}]) == [200]
+    finally:
+        principal_cache.pop(token_fingerprint(token))
+
+
+def test_previous_window_slides_out(limiter):
+    start = 100 * WINDOW
+    for _ in range(LIMIT):
+        assert limiter.hit("ip:slide", "chat", LIMIT, now=start).allowed
+    assert not limiter.hit("ip:slide", "chat", LIMIT, now=start + WINDOW / 2).allowed
+    # Half the previous window still overlaps at the start of the next, none of it a window later
+    assert limiter.hit("ip:slide", "chat", LIMIT, now=start + WINDOW * 1.9).allowed
+    assert limiter.hit("ip:slide", "chat", LIMIT, now=start + WINDOW * 3).remaining == LIMIT - 1
+
+
+def test_database_backend_shares_limits_between_workers():
+    workers = [RateLimiter(window=WINDOW, limits={}, backend="database") for _ in range(2)]
+    identifier = f"ip:{uuid.uuid4().hex}"
+
+    async def run():
+        return [(await workers[index % 2].ahit(identifier, "chat", LIMIT)).allowed for index in range(LIMIT + 1)]
+
+    assert asyncio.run(run()) == [True] * LIMIT + [False]
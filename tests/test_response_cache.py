@@ -0,0 +1,74 @@
+"""Exact and semantic response caching, see app.processor.response_cache."""
+import uuid
+
+import pytest
+
+from app.processor.embeddings import embed_query
+from app.processor.response_cache import ResponseCache, response_cache
+
+MODEL_ID = 1
+PERSONALITY = "helpful"
+PROMPT = "user: what is the capital of France"
+QUERY = "what is the capital of France"
+
+
+@pytest.fixture
+def cache() -> ResponseCache:
+    return ResponseCache(maxsize=16, ttl=60, semantic_enabled=True, semantic_threshold=0.8)
+
+
+def test_exact_hit_for_the_same_agent(cache):
+    cache.store(7, MODEL_ID, PERSONALITY, PROMPT, QUERY, "Agent (Seven): Paris")
+    assert cache.lookup(7, MODEL_ID, PERSONALITY, PROMPT, QUERY) == ("Agent (Seven): Paris", "exact")
+
+
+def test_agents_sharing_a_model_and_personality_do_not_share_responses(cache):
+    cache.store(7, MODEL_ID, PERSONALITY, PROMPT, QUERY, "Agent (Seven): Paris")
+    assert cache.lookup(8, MODEL_ID, PERSONALITY, PROMPT, QUERY) == (None, None)
+    assert cache.lookup(None, MODEL_ID, PERSONALITY, PROMPT, QUERY) == (None, None)
+
+
+def test_semantic_hit_needs_the_same_history_and_references(cache):
+    similar = "what is the capital city of France"
+    cache.store(7, MODEL_ID, PERSONALITY, PROMPT, QUERY, "Paris", references="# notes.md\nParis")
+
+    def lookup(references):
+        return cache.lookup(7, MODEL_ID, PERSONALITY, f"user: {similar}", similar, embedding=embed_query(similar), references=references)
+
+    assert lookup("# notes.md\nParis") == ("Paris", "semantic")
+    # Other tool references, e.g. a later web search, may call for another answer
+    assert lookup("# notes.md\nLyon") == (None, None)
+    assert lookup("") == (None, None)
+
+
+def test_invalidate_agent_drops_both_levels(cache):
+    cache.store(7, MODEL_ID, PERSONALITY, PROMPT, QUERY, "Paris")
+    cache.store(8, MODEL_ID, PERSONALITY, PROMPT, QUERY, "Paris")
+    assert cache.invalidate_agent(7) == 2
+    assert cache.lookup(7, MODEL_ID, PERSONALITY, PROMPT, QUERY) == (None, None)
+    assert cache.lookup(8, MODEL_ID, PERSONALITY, PROMPT, QUERY) == ("Paris", "exact")
+
+
+def _reply(client, agent_id: int, message: str) -> str:
+    conversation_id = client.post("/api/chat/sessions", json={"agent_id": agent_id}).json()["id"]
+    response = client.post(f"/api/chat/sessions/{conversation_id}/message", json={"message": message})
+    assert response.status_code == 200
+    return response.json()["message"]
+
+
+def test_replies_name_the_agent_asked(client, chat_model_id):
+    response_cache.clear()
+    message = f"hello {uuid.uuid4().hex}"
+    agents = {}
+    for name in ("First", "Second"):
+        agent = {"name": f"{name}-{uuid.uuid4().hex[:6]}", "personality": PERSONALITY, "chat_model_id": chat_model_id}
+        agents[agent["name"]] = client.post("/api/chat/options", json=agent).json()["id"]
+
+    for name, agent_id in agents.items():
+        assert f"({name})" in _reply(client, agent_id, message)
+
+    # A renamed agent stops serving replies in its old name
+    name, agent_id = next(iter(agents.items()))
+    renamed = f"Renamed-{uuid.uuid4().hex[:6]}"
+    client.put(f"/api/chat/options/{agent_id}", json={"name": renamed, "personality": PERSONALITY, "chat_model_id": chat_model_id})
+    assert f"({renamed})" in _reply(client, agent_id, message)
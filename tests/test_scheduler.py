@@ -0,0 +1,127 @@
+"""Admission control in front of model calls, see app.processor.scheduler, against a fake provider."""
+import asyncio
+import uuid
+
+import pytest
+
+from app.api.endpoints import chat
+from app.core.config_cache import CachedChatModel
+from app.processor.model_router import RoutingDecision
+from app.processor.scheduler import LLMScheduler, QueueTimeoutError, SchedulerOverloadedError
+
+PROVIDER = "fake"
+
+
+def _scheduler(**overrides) -> LLMScheduler:
+    options = dict(
+        provider_concurrency=1,
+        tier_concurrency={"free": 1, "standard": 1},
+        tier_weights={"free": 1.0, "standard": 3.0},
+        tier_queue_slo={"free": 5.0, "standard": 5.0},
+        tier_max_queue={"free": 100, "standard": 100},
+    )
+    options.update(overrides)
+    return LLMScheduler(**options)
+
+
+async def _served_order(scheduler: LLMScheduler, calls) -> list:
+    """Queue (user, tier) calls behind a held slot of the fake provider, and return them in the order served."""
+    served = []
+
+    async def call(user_id, tier):
+        async with scheduler.slot(PROVIDER, user_id, tier):
+            served.append((user_id, tier))
+            await asyncio.sleep(0)
+
+    await scheduler.acquire(PROVIDER, "holder", "standard")
+    tasks = []
+    for user_id, tier in calls:
+        tasks.append(asyncio.ensure_future(call(user_id, tier)))
+        await asyncio.sleep(0)
+    scheduler.release(PROVIDER, "standard")
+    await asyncio.gather(*tasks)
+    return served
+
+
+def test_heavy_user_does_not_starve_others():
+    scheduler = _scheduler()
+    calls = [("heavy", "free")] * 10 + [("light", "free")]
+    served = asyncio.run(_served_order(scheduler, calls))
+    assert served.index(("light", "free")) <= 1
+
+
+def test_standard_tier_gets_a_larger_share():
+    scheduler = _scheduler(tier_concurrency={"free": 1, "standard": 1})
+    calls = [("free-user", "free")] * 8 + [("standard-user", "standard")] * 8
+    served = asyncio.run(_served_order(scheduler, calls))
+    # Weight 3 against 1, so about three standard calls per free one while both wait
+    assert [tier for _, tier in served[:8]].count("standard") == 6
+
+
+def test_calls_over_the_queue_slo_time_out():
+    scheduler = _scheduler(tier_queue_slo={"free": 0.05, "standard": 5.0})
+
+    async def run():
+        await scheduler.acquire(PROVIDER, "holder", "standard")
+        with pytest.raises(QueueTimeoutError):
+            await scheduler.acquire(PROVIDER, "waiting", "free")
+        scheduler.release(PROVIDER, "standard")
+        # The abandoned waiter does not keep the slot
+        await asyncio.wait_for(scheduler.acquire(PROVIDER, "next", "free"), 1)
+
+    asyncio.run(run())
+    assert scheduler.stats()["timed_out"] == {"free": 1}
+    assert scheduler.stats()["queued_by_tier"]["free"] == 0
+
+
+def test_full_queue_sheds_calls():
+    scheduler = _scheduler(tier_max_queue={"free": 1, "standard": 100})
+
+    async def call(user_id, tier):
+        async with scheduler.slot(PROVIDER, user_id, tier):
+            await asyncio.sleep(0)
+
+    async def run():
+        await scheduler.acquire(PROVIDER, "holder", "standard")
+        queued = asyncio.ensure_future(call("first", "free"))
+        await asyncio.sleep(0)
+        with pytest.raises(SchedulerOverloadedError):
+            await scheduler.acquire(PROVIDER, "second", "free")
+        # Standard calls have a queue of their own
+        standard = asyncio.ensure_future(call("standard", "standard"))
+        await asyncio.sleep(0)
+        scheduler.release(PROVIDER, "standard")
+        await asyncio.wait_for(asyncio.gather(queued, standard), 1)
+
+    asyncio.run(run())
+    assert scheduler.stats()["shed"] == {"free": 1}
+
+
+def _model(model_id: int, ai_model_api_id: int) -> CachedChatModel:
+    return CachedChatModel(id=model_id, name=f"model-{model_id}", model_type="openai", price_tier="free", ai_model_api_id=ai_model_api_id)
+
+
+@pytest.mark.parametrize("fallback_api_id, status_code", [(1, 503), (2, 200)])
+def test_free_tier_falls_back_only_to_another_provider(client, monkeypatch, fallback_api_id, status_code):
+    primary, fallback = _model(1, 1), _model(2, fallback_api_id)
+    monkeypatch.setattr(chat.chat_model_router, "route", lambda *args: RoutingDecision(primary, "test", fallback))
+    monkeypatch.setattr(chat, "get_user_tier", lambda db, user_id: "free")
+
+    calls = []
+
+    async def generate(prompt, agent, chat_model, user_id, user_tier):
+        calls.append(chat_model.id)
+        if chat_model.ai_model_api_id == primary.ai_model_api_id:
+            raise SchedulerOverloadedError("Queue for free tier is full")
+        return f"from {chat_model.name}"
+
+    monkeypatch.setattr(chat, "generate_response", generate)
+    conversation_id = client.post("/api/chat/sessions", json={}).json()["id"]
+    response = client.post(f"/api/chat/sessions/{conversation_id}/message", json={"message": uuid.uuid4().hex})
+    assert response.status_code == status_code
+    if status_code == 200:
+        assert response.json()["message"] == "from model-2"
+    else:
+        # Not queued again on the provider that just shed it
+        assert calls == [primary.id]
+        assert response.headers["Retry-After"]
@@ -0,0 +1,77 @@
+"""Cached principals and their invalidation, see app.core.security."""
+import uuid
+from types import MappingProxyType
+
+from app.core.cache import TTLCache
+from app.core.security import Principal, principal_cache
+from app.db.database import SessionLocal
+from app.models.user import KhojUser, Subscription
+
+
+def _new_user() -> int:
+    db = SessionLocal()
+    try:
+        user = KhojUser(username=f"principal-{uuid.uuid4().hex[:8]}")
+        db.add(user)
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+
+def _cache_principal(user_id: int) -> str:
+    fingerprint = uuid.uuid4().hex
+    principal_cache.set(fingerprint, Principal(
+        id=user_id, uuid=str(uuid.uuid4()), username="cached", is_active=True, tier="free", claims=MappingProxyType({}),
+    ))
+    return fingerprint
+
+
+def test_principals_are_dropped_when_the_change_commits():
+    user_id = _new_user()
+    fingerprint = _cache_principal(user_id)
+    db = SessionLocal()
+    try:
+        db.get(KhojUser, user_id).is_active = False
+        db.flush()
+        # Not committed yet, so a request in between would read and cache the old row again
+        assert fingerprint in principal_cache
+        db.rollback()
+        assert fingerprint in principal_cache
+        db.commit()
+        assert fingerprint in principal_cache
+
+        db.get(KhojUser, user_id).is_active = False
+        db.commit()
+        assert fingerprint not in principal_cache
+    finally:
+        db.close()
+
+
+def test_new_subscriptions_drop_principals():
+    user_id = _new_user()
+    fingerprint = _cache_principal(user_id)
+    db = SessionLocal()
+    try:
+        db.add(Subscription(user_id=user_id, type="standard"))
+        db.flush()
+        assert fingerprint in principal_cache
+        db.commit()
+        assert fingerprint not in principal_cache
+    finally:
+        db.close()
+
+
+def test_peek_leaves_order_and_counters():
+    now = [0.0]
+    cache = TTLCache(maxsize=2, ttl=10, clock=lambda: now[0])
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.peek("a") == 1
+    assert cache.peek("missing", "default") == "default"
+    assert (cache.hits, cache.misses) == (0, 0)
+    # Still the least recently used, so evicted first
+    cache.set("c", 3)
+    assert "a" not in cache
+    now[0] = 20
+    assert cache.peek("b") is None
@@ -0,0 +1,98 @@
+"""Endpoints stay within SQL_STATEMENT_BUDGET with the guard raising, see app.db.loading.
+
+conftest sets SQL_STATEMENT_GUARD to "raise", so a request that lazy loads its way past the
+budget fails with SqlStatementBudgetError, and one that touches a relationship its query did
+not declare fails on the raiseload. Each endpoint runs over more rows than the budget, where
+one statement per row would show.
+"""
+import datetime
+import uuid
+
+import pytest
+from sqlalchemy import update
+
+from app.core.config import settings
+from app.db.database import SessionLocal, SqlStatementBudgetError
+from app.models.content import Entry, EntryDates
+from app.models.conversation import Conversation
+from app.processor.archive import conversation_archiver
+
+ROWS = settings.SQL_STATEMENT_BUDGET + 5
+
+
+def _archive(conversation_id: str) -> None:
+    db = SessionLocal()
+    try:
+        # Idle long enough for the archiver, which leaves everything the other tests created
+        db.execute(
+            update(Conversation)
+            .where(Conversation.id == conversation_id)
+            .values(updated_at=datetime.datetime(2000, 1, 1))
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+    finally:
+        db.close()
+    assert conversation_archiver.archive_batch(idle_days=365, batch_size=ROWS) >= 1
+
+
+def test_guard_is_raising(client, monkeypatch):
+    assert settings.SQL_STATEMENT_GUARD == "raise"
+    monkeypatch.setattr(settings, "SQL_STATEMENT_BUDGET", 0)
+    with pytest.raises(SqlStatementBudgetError):
+        client.get("/api/chat/sessions")
+
+
+def test_chat_endpoints(client):
+    ids = [client.post("/api/chat/sessions", json={"title": f"guard {index}"}).json()["id"] for index in range(ROWS)]
+    assert len(client.get("/api/chat/sessions").json()) >= ROWS
+    assert client.get(f"/api/chat/sessions/{ids[0]}").status_code == 200
+    assert client.put(f"/api/chat/sessions/{ids[0]}", json={"title": "renamed"}).json()["title"] == "renamed"
+    assert client.get("/api/chat/search", params={"q": "guard"}).status_code == 200
+
+    # Opening, renaming and deleting archived conversations rehydrates them first
+    for conversation_id in ids[1:4]:
+        _archive(conversation_id)
+    assert client.get(f"/api/chat/sessions/{ids[1]}").status_code == 200
+    response = client.put(f"/api/chat/sessions/{ids[2]}", json={"title": "renamed while archived"})
+    assert response.status_code == 200
+    assert response.json()["title"] == "renamed while archived"
+    assert client.delete(f"/api/chat/sessions/{ids[3]}").status_code == 200
+
+
+def test_agents_endpoints(client, chat_model_id):
+    agent_ids = [
+        client.post("/api/chat/options", json={"name": f"Guard {index}", "chat_model_id": chat_model_id}).json()["id"]
+        for index in range(ROWS)
+    ]
+    assert len(client.get("/api/chat/options").json()) >= ROWS
+    assert client.get(f"/api/chat/options/{agent_ids[0]}").status_code == 200
+    update = {"name": "Guard renamed", "chat_model_id": chat_model_id}
+    assert client.put(f"/api/chat/options/{agent_ids[0]}", json=update).status_code == 200
+
+    # Deleting an agent unlinks its conversations
+    for index in range(ROWS):
+        client.post("/api/chat/sessions", json={"title": f"with agent {index}", "agent_id": agent_ids[1]})
+    assert client.delete(f"/api/chat/options/{agent_ids[1]}").status_code == 200
+
+
+def test_search_endpoints(client):
+    file_name = f"guard-{uuid.uuid4().hex[:8]}.md"
+    # Indexing writes one INSERT per chunk, SQLite cannot batch them, so keep the upload small
+    response = client.post("/api/content/index", files={"files": (file_name, b"zebra upload", "text/markdown")})
+    assert response.status_code == 200
+    db = SessionLocal()
+    try:
+        for index in range(ROWS):
+            db.add(Entry(
+                user_id=1, embeddings="[]", raw=f"zebra note {index}", compiled=f"zebra note {index}", file_name=file_name,
+                hashed_value=uuid.uuid4().hex, corpus_id=str(uuid.uuid4()),
+                dates=[EntryDates(date=datetime.date(2026, 1, 1))],
+            ))
+        db.commit()
+    finally:
+        db.close()
+
+    results = client.post("/api/content/search", params={"query": "zebra", "limit": ROWS}).json()
+    assert len(results) == ROWS
+    assert client.delete("/api/content/index", params={"file_name": file_name}).status_code == 204
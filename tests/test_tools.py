@@ -0,0 +1,42 @@
+"""Tool result reuse, see app.processor.tools.run_tools."""
+import asyncio
+import uuid
+
+from app.core.config import settings
+from app.processor import tools
+
+
+def _counting_tool(calls, delay=0.0):
+    async def tool(query, user_id, output):
+        calls.append(query)
+        output.context.append({"compiled": f"result {len(calls)}", "file": "notes.md"})
+        await asyncio.sleep(delay)
+    return tool
+
+
+def test_results_are_reused_only_by_the_same_turn(monkeypatch):
+    calls = []
+    monkeypatch.setitem(tools.TOOLS, "counting", _counting_tool(calls))
+    conversation_id = str(uuid.uuid4())
+
+    first = asyncio.run(tools.run_tools(["counting"], "question", 1, (conversation_id, "turn-1")))
+    regenerated = asyncio.run(tools.run_tools(["counting"], "question", 1, (conversation_id, "turn-1")))
+    later_turn = asyncio.run(tools.run_tools(["counting"], "question", 1, (conversation_id, "turn-2")))
+
+    assert len(calls) == 2
+    assert regenerated.reused and regenerated.context == first.context
+    assert not later_turn.reused and later_turn.context != first.context
+
+
+def test_timed_out_results_are_not_reused(monkeypatch):
+    calls = []
+    monkeypatch.setitem(tools.TOOLS, "slow", _counting_tool(calls, delay=1.0))
+    monkeypatch.setattr(settings, "TOOL_TIMEOUT_SECONDS", 0.05)
+    turn_key = (str(uuid.uuid4()), "turn-1")
+
+    first = asyncio.run(tools.run_tools(["slow"], "question", 1, turn_key))
+    second = asyncio.run(tools.run_tools(["slow"], "question", 1, turn_key))
+
+    assert first.outputs[0].timed_out and first.context
+    assert not second.reused
+    assert len(calls) == 2
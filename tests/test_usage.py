@@ -0,0 +1,150 @@
+"""Usage accounting: write-behind counts, day rollups and daily quotas, see app.core.usage."""
+import asyncio
+import datetime
+import time
+import uuid
+
+import pytest
+
+from app.core import usage as usage_module
+from app.core.config import settings
+from app.core.usage import DAY_SECONDS, UsageAccountant
+from app.db.database import ReadSessionLocal, SessionLocal
+from app.models.utility import UsageCounter
+
+USER_ID = 1
+
+
+@pytest.fixture
+def accountant() -> UsageAccountant:
+    return UsageAccountant(bucket_seconds=60, flush_interval=0.01, batch_size=2)
+
+
+@pytest.fixture
+def slug() -> str:
+    return f"usage-{uuid.uuid4().hex[:8]}"
+
+
+def _usage(accountant: UsageAccountant, slug: str, days: int = 1) -> int:
+    since = datetime.datetime.utcnow() - datetime.timedelta(days=days)
+    db = ReadSessionLocal()
+    try:
+        return accountant.usage(db, USER_ID, since, slug).get(slug, 0)
+    finally:
+        db.close()
+
+
+def _remaining(accountant: UsageAccountant, slug: str):
+    db = ReadSessionLocal()
+    try:
+        return accountant.remaining_quota(db, USER_ID, "free", slug)
+    finally:
+        db.close()
+
+
+def _rows(slug: str):
+    db = SessionLocal()
+    try:
+        return db.query(UsageCounter.bucket_seconds, UsageCounter.count).filter(UsageCounter.slug == slug).all()
+    finally:
+        db.close()
+
+
+def test_flush_writes_counts_in_batches(accountant, slug):
+    now = time.time()
+    for minute in range(3):
+        accountant.record(USER_ID, slug, count=2, now=now - minute * 60)
+    assert accountant.flush() == 3
+    assert sorted(count for _, count in _rows(slug)) == [2, 2, 2]
+    assert accountant.stats()["pending"] == 0
+    assert _usage(accountant, slug) == 6
+
+    # Counts of a bucket already written are added to it
+    accountant.record(USER_ID, slug, now=now)
+    assert accountant.flush() == 1
+    assert _usage(accountant, slug) == 7
+    assert len(_rows(slug)) == 3
+
+
+def test_counts_stay_visible_while_a_flush_commits(accountant, slug, monkeypatch):
+    accountant.record(USER_ID, slug, count=3)
+    seen = []
+    add_counts = usage_module._add_counts
+
+    def add_counts_and_look(db, rows):
+        add_counts(db, rows)
+        # Written but not committed yet, so only the in-memory counts show them
+        seen.append(_usage(accountant, slug))
+
+    monkeypatch.setattr(usage_module, "_add_counts", add_counts_and_look)
+    accountant.flush()
+    assert seen == [3]
+    assert _usage(accountant, slug) == 3
+
+
+def test_failed_flush_keeps_the_counts(accountant, slug, monkeypatch):
+    accountant.record(USER_ID, slug, count=2)
+
+    def fail(db, rows):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(usage_module, "_add_counts", fail)
+    with pytest.raises(RuntimeError):
+        accountant.flush()
+    accountant.record(USER_ID, slug)
+    assert accountant.stats()["failed"] == 1
+    assert _usage(accountant, slug) == 3
+
+    monkeypatch.undo()
+    accountant.flush()
+    assert _rows(slug) == [(60, 3)]
+
+
+def test_rollup_folds_old_buckets_into_days(accountant, slug):
+    # Noon, ten days ago, so the buckets share a day
+    old = (time.time() // DAY_SECONDS - 10) * DAY_SECONDS + DAY_SECONDS / 2
+    for minute in range(5):
+        accountant.record(USER_ID, slug, count=minute + 1, now=old + minute * 60)
+    accountant.record(USER_ID, slug, count=7)
+    accountant.flush()
+
+    # Batches of two buckets, folded into the day bucket each time
+    assert accountant.rollup(retention_hours=1) >= 5
+    assert sorted(_rows(slug)) == [(60, 7), (DAY_SECONDS, 15)]
+    assert _usage(accountant, slug, days=11) == 22
+    assert accountant.rollup(retention_hours=1) == 0
+
+
+def test_remaining_quota_counts_flushed_and_pending(accountant, slug, monkeypatch):
+    monkeypatch.setattr(settings, "USAGE_DAILY_QUOTAS", {"free": {slug: 5}})
+    assert _remaining(accountant, f"{slug}-unlimited") is None
+    assert _remaining(accountant, slug) == 5
+
+    accountant.record(USER_ID, slug, count=2)
+    assert _remaining(accountant, slug) == 3
+    accountant.flush()
+    assert _remaining(accountant, slug) == 3
+
+    # Only the last 24 hours count
+    accountant.record(USER_ID, slug, count=4, now=time.time() - 2 * DAY_SECONDS)
+    assert _remaining(accountant, slug) == 3
+    accountant.record(USER_ID, slug, count=4)
+    assert _remaining(accountant, slug) == 0
+
+
+def test_background_failures_are_logged(accountant, monkeypatch, caplog):
+    def fail():
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(accountant, "flush", fail)
+
+    async def run():
+        accountant.start()
+        await asyncio.sleep(0.1)
+        accountant._task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await accountant._task
+
+    with caplog.at_level("ERROR", logger=usage_module.__name__):
+        asyncio.run(run())
+    assert "Failed to write usage counts" in caplog.text
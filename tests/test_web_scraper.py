@@ -0,0 +1,105 @@
+"""Direct page fetches against a local HTTP stub, see app.processor.web_scraper."""
+import asyncio
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.processor import web_scraper as web_scraper_module
+from app.processor.web_scraper import WebScraperPipeline
+
+
+class _Handler(BaseHTTPRequestHandler):
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.requests.append((self.path, self.headers["Host"]))
+        if self.path == "/redirect":
+            self.send_response(302)
+            self.send_header("Location", "/page")
+            self.end_headers()
+            return
+        body = b"page content"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def stub():
+    _Handler.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_port, _Handler.requests
+    server.shutdown()
+    server.server_close()
+
+
+async def _read(url: str):
+    pipeline = WebScraperPipeline()
+    try:
+        return await pipeline.read(url)
+    finally:
+        await pipeline.aclose()
+
+
+def test_private_addresses_are_refused(stub):
+    port, requests = stub
+    assert asyncio.run(_read(f"http://127.0.0.1:{port}/page")) is None
+    assert asyncio.run(_read(f"http://localhost:{port}/page")) is None
+    assert requests == []
+
+
+def _resolve_stub_as(monkeypatch, port, answers):
+    """Resolve rebind.test to answers in turn, the last one from then on. Returns the lookups made."""
+    resolve = socket.getaddrinfo
+    lookups = []
+
+    def getaddrinfo(host, *args, **kwargs):
+        if host != "rebind.test":
+            return resolve(host, *args, **kwargs)
+        lookups.append(host)
+        address = answers[min(len(lookups), len(answers)) - 1]
+        return [(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP, "", (address, port))]
+
+    monkeypatch.setattr(socket, "getaddrinfo", getaddrinfo)
+    # Let the stub's loopback address pass as public, any other stays private
+    monkeypatch.setattr(web_scraper_module, "_is_public", lambda address: address == "127.0.0.1")
+    return lookups
+
+
+def test_fetch_is_pinned_to_the_checked_address(stub, monkeypatch):
+    port, requests = stub
+    # Checked as the stub, then rebound to an internal address
+    lookups = _resolve_stub_as(monkeypatch, port, ["127.0.0.1", "10.255.255.1"])
+
+    page = asyncio.run(_read(f"http://rebind.test:{port}/page"))
+
+    assert page is not None and page.content == "page content"
+    assert requests == [("/page", f"rebind.test:{port}")]
+    assert len(lookups) == 1
+
+
+def test_redirects_are_checked_and_pinned_per_hop(stub, monkeypatch):
+    port, requests = stub
+    lookups = _resolve_stub_as(monkeypatch, port, ["127.0.0.1"])
+
+    page = asyncio.run(_read(f"http://rebind.test:{port}/redirect"))
+
+    assert page is not None and page.content == "page content"
+    assert requests == [("/redirect", f"rebind.test:{port}"), ("/page", f"rebind.test:{port}")]
+    assert len(lookups) == 2
+
+
+def test_redirect_to_a_rebound_address_is_refused(stub, monkeypatch):
+    port, requests = stub
+    _resolve_stub_as(monkeypatch, port, ["127.0.0.1", "10.255.255.1"])
+
+    assert asyncio.run(_read(f"http://rebind.test:{port}/redirect")) is None
+    assert requests == [("/redirect", f"rebind.test:{port}")]